@@ -2,12 +2,15 @@
 Real-Time Emergency Call System
 FastAPI REST API - With Quality Metrics
 """
-from fastapi import FastAPI, UploadFile, File, HTTPException
+from fastapi import FastAPI, UploadFile, File, HTTPException, Request, Response, Depends
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.background import BackgroundTask
 from pydantic import BaseModel
 from app.services.pipeline import pipeline
-from app.services.database import init_db, get_db
+from app.services.database import init_db, get_db, save_completed_calls
+from app.services.call_ids import new_call_id
+from app.services.stages import load_stage_results
 from app.services.quality_metrics import quality_calculator
 from app.models.call import EmergencyCall
 from pathlib import Path
@@ -17,8 +20,25 @@ import re
 from datetime import datetime
 from app.language_markers import router as markers_router
 from fastapi import WebSocket, WebSocketDisconnect
-from app.services.realtime_call import RealtimeCallHandler
+from app.services.realtime_call import RealtimeCallHandler, live_session_sweeper
+from app.services.live_protocol import PROTOCOL_V1, PROTOCOL_V2, SUPPORTED_PROTOCOLS
+from app.services.localization import (
+    current_translation, translation_to_dict, get_translation, batch_retry_pending,
+    prefill_list_translations
+)
+from app.models.translation import CallTranslation
+from app.services.outbox import outbox_worker, localization_worker, enqueue_translation
+from app.services.response_cache import response_cache, make_etag, etag_matches, encode_json, LIST_KEY
+from sqlalchemy import func
+from app.services.events import event_bus, format_sse, EVENT_TYPES, URGENCY_RANK
+import asyncio
+from app.services.work_queue import work_queue, BACKGROUND
+from app.services import admission
+from app.services.admission import admit
+from app.services import idempotency
+from app.services.executors import run_in, pools, loop_monitor
 import json
+import time
 
 
 def normalize_urgency_for_ui(urgency_level: str) -> str:
@@ -40,6 +60,12 @@ class TextInput(BaseModel):
     language: str = "en"
     reference_text: str = None  # NEW: Ground truth for manual comparison
 
+class TextBatchInput(BaseModel):
+    items: list[TextInput]
+
+class StageRerunInput(BaseModel):
+    stages: list[str]  # re-run these and everything downstream (see pipeline.STAGE_VERSIONS)
+
 class QualityComparisonInput(BaseModel):
     hypothesis_soap: dict[str, str]
     reference_soap: dict[str, str]
@@ -67,12 +93,41 @@ app.add_middleware(
 
 # Initialize database
 @app.on_event("startup")
-def startup_event():
+async def startup_event():
     init_db()
     os.makedirs("data/audio", exist_ok=True)
+    await outbox_worker.start()
+    await localization_worker.start()
+    await loop_monitor.start()
+    await live_session_sweeper.start()
+    # Whisper loads lazily; load it now so the first call does not wait for it
+    from app.services.transcription import transcription_service, live_transcription_service
+    await asyncio.gather(run_in("asr", transcription_service.load),
+                         run_in("live_asr", live_transcription_service.load))
     print("✓ API server started")
 
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    await outbox_worker.stop()
+    await localization_worker.stop()
+    await loop_monitor.stop()
+    await live_session_sweeper.stop()
+    pools.shutdown()
+
+
+@app.get("/api/system/load")
+def get_system_load():
+    """Admission control, work queue, executor and degraded-mode status"""
+    return {**admission.status(), "executors": pools.stats(), "event_loop": loop_monitor.stats()}
+
+
+@app.get("/api/system/event-loop")
+def get_event_loop_lag():
+    """Event loop lag (healthy=false: something blocks the loop) and executor load"""
+    return {**loop_monitor.stats(), "executors": pools.stats()}
+
+
 @app.get("/")
 def root():
     """API health check"""
@@ -83,9 +138,18 @@ def root():
     }
 
 
+def _save_upload(source, file_path: str) -> None:
+    with open(file_path, "wb") as buffer:
+        shutil.copyfileobj(source, buffer)
+
+
 @app.post("/api/upload")
-async def upload_audio(file: UploadFile = File(...), language: str = "en"):
-    """Upload and process audio file"""
+async def upload_audio(request: Request, file: UploadFile = File(...), language: str = "en",
+                       _slot=Depends(admit("upload"))):
+    """
+    Upload and process audio file. Retries (same Idempotency-Key header, or
+    the same audio within the dedupe window) return the existing call.
+    """
     try:
         allowed_extensions = ['.wav', '.mp3', '.m4a', '.flac', '.ogg']
         file_ext = Path(file.filename).suffix.lower()
@@ -96,37 +160,46 @@ async def upload_audio(file: UploadFile = File(...), language: str = "en"):
                 detail=f"Invalid file type. Allowed: {', '.join(allowed_extensions)}"
             )
         
-        file_path = f"data/audio/{file.filename}"
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        idempotency_key = idempotency.normalize_key(request.headers.get("Idempotency-Key"))
+        digest = await run_in("db", idempotency.audio_hash, file.file, language=language)
         
-        result = pipeline.process_call(file_path, language=language)
-        
-        # AUTO-SYNC: Sync to patient journey database
-        try:
-            from app.services.sync_helper import sync_emergency_call_to_patient_journey
-            from app.models.call import EmergencyCall
-            from app.services.database import get_db
+        async def run():
+            existing = await run_in("db", idempotency.find_existing, digest, idempotency_key)
+            if existing:
+                print(f"↩️ Duplicate upload, returning {existing.call_id}")
+                return _replayed_result(existing)
             
-            with get_db() as db:
-                call_obj = db.query(EmergencyCall).filter(EmergencyCall.call_id == result['call_id']).first()
-                if call_obj:
-                    sync_emergency_call_to_patient_journey(call_obj.id)
-                    print(f"🔄 Auto-synced audio call {result['call_id']} to patient journey")
-        except Exception as sync_error:
-            print(f"⚠️ Sync failed (non-blocking): {sync_error}")
+            file_path = f"data/audio/{file.filename}"
+            await run_in("db", _save_upload, file.file, file_path)
             
-        # Normalize for UI
-        if 'urgency' in result and 'level' in result['urgency']:
-            result['urgency']['level'] = normalize_urgency_for_ui(result['urgency']['level'])
+            # Orchestration waits on Whisper (asr pool) and the priority work queue
+            try:
+                result = await run_in("llm", pipeline.process_call, file_path, language=language,
+                                      content_hash=digest, idempotency_key=idempotency_key)
+            except Exception:
+                # Let a retry run again (no-op unless an unfinished row holds the hash)
+                await run_in("db", idempotency.release, digest)
+                raise
+            # Patient journey sync runs in the outbox worker (queued by save_completed_calls)
             
-        return JSONResponse(content=result)
+            # Normalize for UI
+            if 'urgency' in result and 'level' in result['urgency']:
+                result['urgency']['level'] = normalize_urgency_for_ui(result['urgency']['level'])
+            return result
+        
+        result = await idempotency.in_flight.run_once(digest, idempotency_key, run)
+        return _ingestion_response(result)
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 @app.post("/api/process-text")
-async def process_text(input_data: TextInput):
-    """Process text directly"""
+async def process_text(input_data: TextInput, request: Request, _slot=Depends(admit("process_text"))):
+    """
+    Process text directly. Retries (same Idempotency-Key header, or the
+    same transcript within the dedupe window) return the existing call.
+    """
     try:
         if not input_data.text or len(input_data.text.strip()) < 3:
             raise HTTPException(
@@ -134,36 +207,39 @@ async def process_text(input_data: TextInput):
                 detail="Text is too short to process (minimum 3 characters)"
             )
         
-        result = pipeline.process_text(
-            input_data.text, 
-            patient_name=input_data.patient_name,
-            doctor_name=input_data.doctor_name,
-            disease=input_data.disease,
-            language=input_data.language
-        )
-        print(f"✓ Pipeline processed text: {result['call_id']}")
+        idempotency_key = idempotency.normalize_key(request.headers.get("Idempotency-Key"))
+        digest = _text_hash(input_data)
         
-        # AUTO-SYNC: Sync to patient journey database
-        try:
-            from app.services.sync_helper import sync_emergency_call_to_patient_journey
-            from app.models.call import EmergencyCall
-            from app.services.database import get_db
-            
-            # We need the numeric ID, not the string call_id
-            with get_db() as db:
-                call_obj = db.query(EmergencyCall).filter(EmergencyCall.call_id == result['call_id']).first()
-                if call_obj:
-                    sync_emergency_call_to_patient_journey(call_obj.id)
-                    print(f"🔄 Auto-synced call {result['call_id']} to patient journey")
-        except Exception as sync_error:
-            print(f"⚠️ Sync failed (non-blocking): {sync_error}")
+        async def run():
+            existing = await run_in("db", idempotency.find_existing, digest, idempotency_key)
+            if existing:
+                print(f"↩️ Duplicate text submission, returning {existing.call_id}")
+                return _replayed_result(existing)
             
-        # Normalize for UI
-        if 'urgency' in result and 'level' in result['urgency']:
-            result['urgency']['level'] = normalize_urgency_for_ui(result['urgency']['level'])
+            result = await run_in(
+                "llm",
+                pipeline.process_text,
+                input_data.text, 
+                patient_name=input_data.patient_name,
+                doctor_name=input_data.doctor_name,
+                disease=input_data.disease,
+                language=input_data.language,
+                content_hash=digest,
+                idempotency_key=idempotency_key
+            )
+            print(f"✓ Pipeline processed text: {result['call_id']}")
+            # Patient journey sync runs in the outbox worker (queued with the call)
             
-        return JSONResponse(content=result)
+            # Normalize for UI
+            if 'urgency' in result and 'level' in result['urgency']:
+                result['urgency']['level'] = normalize_urgency_for_ui(result['urgency']['level'])
+            return result
         
+        result = await idempotency.in_flight.run_once(digest, idempotency_key, run)
+        return _ingestion_response(result)
+        
+    except HTTPException:
+        raise
     except Exception as e:
         import traceback
         print(f"❌ Error in /api/process-text: {e}")
@@ -171,19 +247,270 @@ async def process_text(input_data: TextInput):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def _text_hash(input_data: TextInput) -> str:
+    return idempotency.transcript_hash(
+        input_data.text, language=input_data.language, patient_name=input_data.patient_name,
+        doctor_name=input_data.doctor_name, disease=input_data.disease
+    )
+
+
+def _replayed_result(call) -> dict:
+    """Result of an earlier, identical submission (nothing is reprocessed)"""
+    result = pipeline.build_result(call, 0.0)
+    result['urgency']['level'] = normalize_urgency_for_ui(result['urgency']['level'])
+    result['deduplicated'] = True
+    return result
+
+
+def _ingestion_response(result: dict) -> JSONResponse:
+    headers = {"Idempotent-Replayed": "true"} if result.get('deduplicated') else None
+    return JSONResponse(content=result, headers=headers)
+
+
+# Batch text processing: max transcripts per request, transcripts analyzed
+# at once (below WORK_QUEUE_WORKERS so live triage keeps a free worker),
+# rows per write
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "100"))
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "3"))
+BATCH_WRITE_SIZE = int(os.getenv("BATCH_WRITE_SIZE", "20"))
+BATCH_WRITE_DELAY = 0.5  # seconds a finished item waits for others to share its write
+
+
+def _ndjson(line: dict) -> bytes:
+    return (json.dumps(line, ensure_ascii=False) + "\n").encode("utf-8")
+
+
+async def _process_text_batch(items: list, started: float):
+    """
+    Analyze transcripts concurrently and yield one NDJSON line per item as
+    they finish. Finished items are saved together (one transaction per
+    chunk) before their lines are sent, so every returned call_id exists.
+    """
+    semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+    async def analyze(index: int, item: TextInput):
+        async with semaphore:
+            analysis = await run_in(
+                "llm", pipeline.analyze_text, item.text, item.patient_name, item.language
+            )
+        return index, analysis
+
+    # Identical transcripts are analyzed once; ones processed recently are replayed
+    groups = {}
+    for index, item in enumerate(items):
+        if not item.text or len(item.text.strip()) < 3:
+            yield _ndjson({"index": index, "success": False,
+                           "error": "Text is too short to process (minimum 3 characters)"})
+            continue
+        groups.setdefault(_text_hash(item), []).append(index)
+    existing = await run_in("db", idempotency.find_existing_many, list(groups))
+
+    pending = set()
+    for digest, indexes in groups.items():
+        if digest in existing:
+            for index in indexes:
+                yield _ndjson({"index": index, **_replayed_result(existing[digest])})
+            continue
+        task = asyncio.create_task(analyze(indexes[0], items[indexes[0]]))
+        task.indexes = indexes
+        task.digest = digest
+        pending.add(task)
+
+    try:
+        while pending:
+            finished = []
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            finished.extend(done)
+            # Let items finishing close together share one write
+            while pending and len(finished) < BATCH_WRITE_SIZE:
+                done, pending = await asyncio.wait(pending, timeout=BATCH_WRITE_DELAY,
+                                                   return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    break
+                finished.extend(done)
+
+            records, lines = [], []
+            for task in finished:
+                if task.exception() is not None:
+                    print(f"❌ Batch item {task.indexes[0]} failed: {task.exception()}")
+                    lines.extend({"index": index, "success": False, "error": str(task.exception())}
+                                 for index in task.indexes)
+                    continue
+                index, analysis = task.result()
+                item = items[index]
+                records.append((task.indexes, pipeline.text_call_record(
+                    new_call_id("TEXT"), item.text, analysis, item.doctor_name, item.disease, item.language,
+                    content_hash=task.digest
+                )))
+
+            if records:
+                try:
+                    calls = await run_in("db", save_completed_calls, [r for _, r in records])
+                except Exception as e:
+                    print(f"❌ Batch write failed: {e}")
+                    lines.extend({"index": index, "success": False, "error": f"Database write failed: {e}"}
+                                 for indexes, _ in records for index in indexes)
+                else:
+                    for (indexes, _), call in zip(records, calls):
+                        result = pipeline.build_result(call, time.time() - started)
+                        result['urgency']['level'] = normalize_urgency_for_ui(result['urgency']['level'])
+                        lines.append({"index": indexes[0], **result})
+                        lines.extend({"index": index, **result, "deduplicated": True} for index in indexes[1:])
+                    print(f"✓ Batch saved {len(calls)} calls")
+
+            for line in lines:
+                yield _ndjson(line)
+    finally:
+        # Client disconnected: stop work that has not started yet
+        for task in pending:
+            task.cancel()
+
+
+@app.post("/api/process-text/batch")
+async def process_text_batch(input_data: TextBatchInput):
+    """
+    Process up to BATCH_MAX_ITEMS transcripts; streams one JSON line per
+    item ({"index": ..., "success": ..., ...result or error}) as each finishes
+    """
+    if not input_data.items:
+        raise HTTPException(status_code=400, detail="No items to process")
+    if len(input_data.items) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413,
+                            detail=f"Too many items ({len(input_data.items)}), maximum is {BATCH_MAX_ITEMS}")
+
+    # The admission slot is held until the stream ends (not just until the
+    # endpoint returns). 429 / 503 come before anything is streamed; the
+    # response's background task releases the slot even if the client
+    # disconnects before the stream starts.
+    release = await admission.limiters["process_text_batch"].acquire()
+
+    async def stream():
+        try:
+            async for line in _process_text_batch(input_data.items, time.time()):
+                yield line
+        finally:
+            await release()
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson", background=BackgroundTask(release))
+
+
+def _list_fingerprint() -> tuple:
+    """Changes whenever a call is added, deleted, updated or translated"""
+    with get_db() as db:
+        return tuple(db.query(func.count(EmergencyCall.id), func.max(EmergencyCall.updated_at)).one())
+
+
+def _call_version(call_id: str):
+    with get_db() as db:
+        return db.query(EmergencyCall.version).filter(EmergencyCall.call_id == call_id).scalar()
+
+
+def _cached_response(request: Request, key: tuple, current_state, build) -> Response:
+    """
+    Serve a polled endpoint with ETag / 304 and the in-process LRU.
+    current_state() returns the DB state the response depends on; build()
+    creates the response dict. Responses whose state changed while they were
+    built (e.g. a translation was written) or whose translation was deferred
+    are not cached.
+    """
+    state = current_state()
+    etag = make_etag(*key, *state)
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+
+    cached = response_cache.get(key)
+    if cached and cached[0] == etag:
+        return Response(content=cached[1], media_type="application/json",
+                        headers={"ETag": etag, "Cache-Control": "no-cache"})
+
+    response = build()
+    body = encode_json(response)
+    state_after = current_state()
+    if response.get("translation_deferred"):
+        # Incomplete (untranslated) response: never cache or 304 it
+        return Response(content=body, media_type="application/json", headers={"Cache-Control": "no-store"})
+    if state_after != state:
+        return Response(content=body, media_type="application/json",
+                        headers={"ETag": make_etag(*key, *state_after), "Cache-Control": "no-cache"})
+
+    response_cache.put(key, etag, body)
+    return Response(content=body, media_type="application/json",
+                    headers={"ETag": etag, "Cache-Control": "no-cache"})
+
+
 @app.get("/api/calls")
-def list_calls(limit: int = 50, lang: str = None):
-    """List all calls with optional translation"""
+def list_calls(request: Request, limit: int = 50, lang: str = None):
+    """List all calls with optional translation (ETag / 304 aware)"""
+    return _cached_response(
+        request, (LIST_KEY, limit, lang or ""),
+        _list_fingerprint,
+        lambda: _build_call_list(limit, lang)
+    )
+
+
+@app.get("/api/events")
+async def stream_events(request: Request, types: str = None, min_urgency: str = None):
+    """
+    Server-sent events for new and updated calls (replaces dashboard polling).
+    
+    Args:
+        types: Comma-separated event types (default: all of EVENT_TYPES)
+        min_urgency: Only events of calls classified at least this urgent (e.g. HIGH)
+    """
+    wanted = [t.strip() for t in types.split(",") if t.strip()] if types else None
+    if wanted and not set(wanted) <= set(EVENT_TYPES):
+        raise HTTPException(status_code=400, detail=f"Unknown event type. Allowed: {', '.join(EVENT_TYPES)}")
+    if min_urgency and min_urgency.upper() not in URGENCY_RANK:
+        raise HTTPException(status_code=400, detail=f"Unknown urgency level. Allowed: {', '.join(URGENCY_RANK)}")
+    
+    subscription = event_bus.subscribe(types=wanted, min_urgency=min_urgency)
+    
+    async def stream():
+        try:
+            yield "retry: 3000\n\n"
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(subscription.queue.get(), timeout=15)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"  # keeps proxies from closing the idle stream
+                    continue
+                yield format_sse(event)
+        finally:
+            event_bus.unsubscribe(subscription)
+    
+    return StreamingResponse(stream(), media_type="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"
+    })
+
+
+def _build_call_list(limit: int, lang: str = None) -> dict:
     with get_db() as db:
-        calls = db.query(EmergencyCall).order_by(
-            EmergencyCall.created_at.desc()
-        ).limit(limit).all()
+        if lang:
+            # Current translations come with the page in one indexed join
+            rows = db.query(EmergencyCall, CallTranslation).outerjoin(
+                CallTranslation, current_translation(lang)
+            ).order_by(EmergencyCall.created_at.desc()).limit(limit).all()
+        else:
+            rows = [(call_obj, None) for call_obj in db.query(EmergencyCall).order_by(
+                EmergencyCall.created_at.desc()
+            ).limit(limit)]
+        
+        # Rows of this page without a current translation: ONE batched AI call in
+        # the background - this page shows them in the original language
+        if lang:
+            untranslated = [
+                call_obj.call_id for call_obj, translation in rows
+                if translation is None and lang != (call_obj.language or "en")
+                and not batch_retry_pending(call_obj, lang)
+            ]
+            # Optional work: skipped in degraded mode (rows keep the original language)
+            if untranslated and not admission.is_degraded():
+                prefill_list_translations(untranslated, lang)
         
+        translation_deferred = False
         calls_data = []
-        for call_obj in calls:
-            # Parse existing cache
-            cache = json.loads(call_obj.translated_data or "{}")
-            
+        for call_obj, translation in rows:
             # Prepare basic data
             item = {
                 "call_id": call_obj.call_id,
@@ -206,43 +533,8 @@ def list_calls(limit: int = 50, lang: str = None):
 
             # If translation requested
             if lang and lang != item["language"]:
-                # Check cache first with improved validation
-                # Cache version: v2 (includes proper label localization)
-                CACHE_VERSION = "v2"
-                is_valid_cache = False
-                if lang in cache:
-                    cached = cache[lang]
-                    
-                    # Check cache version first
-                    if cached.get("_version") != CACHE_VERSION:
-                        print(f"⚠️  Old cache version for list item {item['call_id']}. Re-translating...")
-                        is_valid_cache = False
-                    else:
-                        obj_text = cached.get("soap_objective") or ""
-                        subj_text = cached.get("soap_subjective") or ""
-                        
-                        # Enhanced detection: Check for language mixing
-                        if lang == "ja":
-                            # Japanese should not contain English labels
-                            has_english_labels = any(label in obj_text for label in ["Name:", "Age:", "Address:", "Phone:", "Blood:"])
-                            has_english_text = any(label in subj_text for label in ["Name:", "Age:", "Address:", "complained", "reported"])
-                            if has_english_labels or has_english_text:
-                                print(f"⚠️  English content in Japanese cache for {item['call_id']}. Re-translating...")
-                            else:
-                                is_valid_cache = True
-                        elif lang == "en":
-                            # English should not contain Japanese labels
-                            has_japanese_chars = bool(re.search(r'[\u3040-\u309F\u30A0-\u30FF\u4E00-\u9FFF]', obj_text + subj_text))
-                            if has_japanese_chars:
-                                print(f"⚠️  Japanese content in English cache for {item['call_id']}. Re-translating...")
-                            else:
-                                is_valid_cache = True
-                        else:
-                            # For other languages, just check if cache exists
-                            is_valid_cache = True
-
-                if is_valid_cache:
-                    cached = cache[lang]
+                if translation:
+                    cached = translation_to_dict(translation)
                     item["original"] = {
                         "soap_subjective": item["soap_subjective"],
                         "transcript": item["transcript"],
@@ -256,24 +548,34 @@ def list_calls(limit: int = 50, lang: str = None):
                     item["soap_assessment"] = cached.get("soap_assessment", item["soap_assessment"])
                     item["soap_plan"] = cached.get("soap_plan", item["soap_plan"])
                 else:
-                    # Old cache or no cache - just show in original language for list view
-                    # Translation will happen when user clicks to view full details
-                    pass  # Keep original data, no translation needed for fast switching
+                    # Translated in the background - show the original language for now
+                    translation_deferred = True
             
             calls_data.append(item)
 
-        # Commit any changes from valid cache hits only
-        db.commit()
-
         return {
             "total": len(calls_data),
-            "calls": calls_data
+            "calls": calls_data,
+            "translation_deferred": translation_deferred
         }
 
 
 @app.get("/api/calls/{call_id}")
-def get_call_details(call_id: str, lang: str = None):
-    """Get specific call details with optional on-the-fly translation"""
+def get_call_details(call_id: str, request: Request, lang: str = None):
+    """Get specific call details with optional translation (misses are queued; ETag / 304 aware)"""
+    def state():
+        version = _call_version(call_id)
+        if version is None:
+            raise HTTPException(status_code=404, detail="Call not found")
+        return (version,)
+
+    return _cached_response(
+        request, (call_id, lang or ""), state,
+        lambda: _build_call_details(call_id, lang)
+    )
+
+
+def _build_call_details(call_id: str, lang: str = None) -> dict:
     with get_db() as db:
         call = db.query(EmergencyCall).filter(
             EmergencyCall.call_id == call_id
@@ -322,123 +624,29 @@ def get_call_details(call_id: str, lang: str = None):
         doctor_name = call.doctor_name
         disease = call.disease
 
-        # Load cache
-        cache = json.loads(call.translated_data or "{}")
-
         # If translation requested and target differs from source
+        translation_deferred = False
         if lang and lang != source_lang:
-            # Enhanced cache validation to prevent language mixing
-            # Cache version: v2 (includes proper label localization)
-            CACHE_VERSION = "v2"
-            is_valid_cache = False
-            if lang in cache:
-                cached = cache[lang]
-                
-                # Check cache version - invalidate old cache
-                if cached.get("_version") != CACHE_VERSION:
-                    print(f"⚠️  Old cache version detected for {call_id}. Re-translating...")
-                    is_valid_cache = False
-                else:
-                    obj_text = cached.get("soap_objective") or ""
-                    subj_text = cached.get("soap_subjective") or ""
-                    assess_text = cached.get("soap_assessment") or ""
-                    plan_text = cached.get("soap_plan") or ""
-                    
-                    # Improved validation for Japanese
-                    if lang == "ja":
-                        # Check for English labels or words that shouldn't be there
-                        english_indicators = ["Name:", "Age:", "Address:", "Phone:", "Blood:", "not provided", "[Not provided]"]
-                        has_english = any(indicator in obj_text or indicator in subj_text or indicator in assess_text or indicator in plan_text for indicator in english_indicators)
-                        if has_english:
-                            print(f"⚠️  English content found in Japanese cache for {call_id}. Re-translating...")
-                        else:
-                            is_valid_cache = True
-                    
-                    # Improved validation for English
-                    elif lang == "en":
-                        # Check for Japanese characters (Hiragana, Katakana, Kanji)
-                        has_japanese = bool(re.search(r'[\u3040-\u309F\u30A0-\u30FF\u4E00-\u9FFF]', obj_text + subj_text + assess_text + plan_text))
-                        if has_japanese:
-                            print(f"⚠️  Japanese content found in English cache for {call_id}. Re-translating...")
-                        else:
-                            is_valid_cache = True
-                    else:
-                        # For other languages
-                        is_valid_cache = True
-
-            if is_valid_cache:
+            # Validity was checked when the translation was written
+            cached = get_translation(db, call, lang) or {}
+            # Check if transcript is in cache too (batched list translations leave it out)
+            if cached and ("transcript" in cached or not call.transcript):
                 print(f"Cache hit: Serving {lang} for call {call_id}")
-                cached = cache[lang]
-                soap["subjective"] = cached.get("soap_subjective", soap["subjective"])
-                soap["objective"] = cached.get("soap_objective", soap["objective"])
-                soap["assessment"] = cached.get("soap_assessment", soap["assessment"])
-                soap["plan"] = cached.get("soap_plan", soap["plan"])
-                urgency["reasoning"] = cached.get("urgency_reasoning", urgency["reasoning"])
-                patient_name = cached.get("patient_name", patient_name)
-                doctor_name = cached.get("doctor_name", doctor_name)
-                disease = cached.get("disease", disease)
-                
-                # Check if transcript is in cache too
-                if "transcript" in cached:
-                    transcript = cached["transcript"]
-                elif transcript:
-                    print(f"Transcript cache miss: Translating transcript for {call_id} to {lang}")
-                    transcript = pipeline.soap_extractor.translate_text(transcript, target_lang)
-                    # Update cache with transcript
-                    cache[lang]["transcript"] = transcript
-                    call.translated_data = json.dumps(cache)
-                    # No need for explicit commit if inside 'with get_db()' that handles it
+                transcript = cached.get("transcript", transcript)
             else:
-                print(f"Cache miss: Localizing call {call_id} from {source_lang} to {target_lang}...")
-                
-                # PREPARE DATA FOR CONSOLIDATED LOCALIZATION
-                # This combines 3 separate AI calls into 1
-                soap_notes = {
-                    "subjective": call.soap_subjective or "",
-                    "objective": call.soap_objective or "",
-                    "assessment": call.soap_assessment or "",
-                    "plan": call.soap_plan or ""
-                }
-                
-                metadata = {
-                    "reasoning": urgency["reasoning"] or "",
-                    "patient_name": patient_name or "",
-                    "doctor_name": doctor_name or "",
-                    "disease": disease or ""
-                }
-                
-                # ONE SINGLE CALL to OpenAI (Re-extraction + Localization + Translation)
-                localized = pipeline.soap_extractor.localize_call_data(
-                    transcript, soap_notes, metadata, target_lang
-                )
-                
-                # UNPACK RESULTS
-                transcript = localized.get("transcript", transcript)
-                soap["subjective"] = localized.get("subjective", soap["subjective"])
-                soap["objective"] = localized.get("objective", soap["objective"])
-                soap["assessment"] = localized.get("assessment", soap["assessment"])
-                soap["plan"] = localized.get("plan", soap["plan"])
-                
-                urgency["reasoning"] = localized.get("reasoning", urgency["reasoning"])
-                patient_name = localized.get("patient_name", patient_name)
-                doctor_name = localized.get("doctor_name", doctor_name)
-                disease = localized.get("disease", disease)
-
-                # Save to cache with version
-                cache[lang] = {
-                    "_version": CACHE_VERSION,
-                    "soap_subjective": soap["subjective"],
-                    "soap_objective": soap["objective"],
-                    "soap_assessment": soap["assessment"],
-                    "soap_plan": soap["plan"],
-                    "urgency_reasoning": urgency["reasoning"],
-                    "patient_name": patient_name,
-                    "doctor_name": doctor_name,
-                    "disease": disease,
-                    "transcript": transcript
-                }
-                call.translated_data = json.dumps(cache)
-                # Session will commit at end of 'with' block
+                # Never translated inline: the localization worker fills it in and
+                # the new call version invalidates this response
+                enqueue_translation(db, call.call_id, lang)
+                translation_deferred = True
+            
+            soap["subjective"] = cached.get("soap_subjective", soap["subjective"])
+            soap["objective"] = cached.get("soap_objective", soap["objective"])
+            soap["assessment"] = cached.get("soap_assessment", soap["assessment"])
+            soap["plan"] = cached.get("soap_plan", soap["plan"])
+            urgency["reasoning"] = cached.get("urgency_reasoning", urgency["reasoning"])
+            patient_name = cached.get("patient_name", patient_name)
+            doctor_name = cached.get("doctor_name", doctor_name)
+            disease = cached.get("disease", disease)
 
         return {
             "call_id": call.call_id,
@@ -452,6 +660,7 @@ def get_call_details(call_id: str, lang: str = None):
             "soap": soap,
             "urgency": urgency,
             "original": original_data if lang and lang != source_lang else None,
+            "translation_deferred": translation_deferred,
             "created_at": call.created_at.isoformat() if call.created_at else None,
             "processed_at": call.processed_at.isoformat() if call.processed_at else None
         }
@@ -591,8 +800,45 @@ def get_quality_metrics(call_id: str):
         }
 
 
+@app.get("/api/calls/{call_id}/stages")
+def get_call_stages(call_id: str):
+    """Stored stage results of a call, with the current stage versions"""
+    if _call_version(call_id) is None:
+        raise HTTPException(status_code=404, detail="Call not found")
+    results = load_stage_results(call_id)
+    versions = pipeline.stages.versions()
+    return {
+        "call_id": call_id,
+        "stages": {
+            name: {
+                "version": result["version"],
+                "current_version": versions.get(name),
+                "stale": result["version"] != versions.get(name),
+                "duration_ms": result["duration_ms"],
+                "created_at": result["created_at"]
+            }
+            for name, result in results.items()
+        },
+        "versions": versions
+    }
+
+
+@app.post("/api/calls/{call_id}/stages/rerun")
+async def rerun_call_stages(call_id: str, input_data: StageRerunInput, _slot=Depends(admit("process_text"))):
+    """Re-run stages of a call (and their downstream stages) from its stored upstream outputs"""
+    if not input_data.stages:
+        raise HTTPException(status_code=400, detail="No stages to re-run")
+    try:
+        report = await run_in("llm", pipeline.rerun_stages, call_id, input_data.stages)
+    except LookupError:
+        raise HTTPException(status_code=404, detail="Call not found")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"call_id": call_id, "stages": report}
+
+
 @app.post("/api/test-live")
-async def test_live_emergency(input_data: TextInput):
+async def test_live_emergency(input_data: TextInput, _slot=Depends(admit("test_live"))):
     """
     Live emergency call testing - process and compare with expected
     Returns system analysis + expected triage for comparison
@@ -607,15 +853,19 @@ async def test_live_emergency(input_data: TextInput):
         from app.services.soap_extractor import soap_extractor
         from app.services.urgency_classifier import urgency_classifier
         
-        # Extract SOAP
-        soap = soap_extractor.extract(input_data.text, target_language=language)
+        # Extract SOAP (test traffic runs in the background lane behind real calls)
+        soap = await asyncio.wrap_future(work_queue.submit(
+            soap_extractor.extract, input_data.text, target_language=language, lane=BACKGROUND
+        ))
         
         # Classify urgency
-        urgency = urgency_classifier.classify(
+        urgency = await asyncio.wrap_future(work_queue.submit(
+            urgency_classifier.classify,
             input_data.text, 
             soap, 
-            language=language
-        )
+            language=language,
+            lane=BACKGROUND
+        ))
         
         # Step 2: Try to find expected values from test data
         expected_urgency = None
@@ -623,35 +873,10 @@ async def test_live_emergency(input_data: TextInput):
         matched_script = None
         
         try:
-            from data.text.evaluated_text_data import EVALUATED_CALLS
-            from data.text.custom_test_scripts import CUSTOM_CALLS
-            from difflib import SequenceMatcher
-            import re
-            
-            def clean_for_match(t):
-                if not t: return ""
-                t = re.sub(r'^(Dispatcher|Caller|通信指令員|通報者):\s*', '', t, flags=re.MULTILINE)
-                t = re.sub(r'\[.*?\]', '', t)
-                t = re.sub(r'[^\w\s]', '', t)
-                return " ".join(t.lower().split())
-            
-            ALL_TEST_CALLS = CUSTOM_CALLS + EVALUATED_CALLS
-            
-            # Smart fuzzy matching
-            best_ratio = 0
-            best_match = None
-            current_clean = clean_for_match(input_data.text)[:300]
-            
-            for eval_call in ALL_TEST_CALLS:
-                ref_clean = clean_for_match(eval_call["text"])[:300]
-                ratio = SequenceMatcher(None, current_clean, ref_clean).ratio()
-                
-                if ratio > best_ratio:
-                    best_ratio = ratio
-                    best_match = eval_call
-            
-            # If >40% match, assume it's this script
-            if best_ratio > 0.4 and best_match:
+            # Fuzzy matching against the test scripts is CPU work: process pool
+            from app.services.test_scripts import match_test_script
+            best_match = await run_in("cpu", match_test_script, input_data.text)
+            if best_match:
                 expected_urgency = best_match.get("expected_urgency", "").upper()
                 expected_soap = best_match.get("expected_soap", {})
                 matched_script = best_match.get("call_id", "Unknown")
@@ -665,7 +890,8 @@ async def test_live_emergency(input_data: TextInput):
             # No more auto-matching for WER to avoid 23800% errors
             if input_data.reference_text:
                 from app.services.quality_metrics import quality_calculator
-                transcription_metrics = quality_calculator.calculate_wer(
+                transcription_metrics = await run_in(
+                    "cpu", quality_calculator.calculate_wer,
                     reference=input_data.reference_text,
                     hypothesis=input_data.text
                 )
@@ -709,29 +935,30 @@ async def calculate_custom_quality(input_data: QualityComparisonInput):
     try:
         from app.services.quality_metrics import quality_calculator
         
-        # 1. Calculate SOAP Metrics (BLEU/CUDA)
-        metrics = quality_calculator.calculate_all_metrics(
+        # 1. Calculate SOAP Metrics (BLEU/CUDA) - CPU work, process pool
+        metrics = await run_in(
+            "cpu", quality_calculator.calculate_all_metrics,
             reference_soap=input_data.reference_soap,
             hypothesis_soap=input_data.hypothesis_soap
         )
         
         # 2. Calculate Transcription Metrics (WER)
-        transcription_metrics = None
+        transcription = None
         if input_data.reference_transcript and input_data.hypothesis_transcript:
-            transcription_metrics = quality_calculator.calculate_wer(
-                reference=input_data.reference_transcript,
-                hypothesis=input_data.hypothesis_transcript
+            reference, hypothesis = input_data.reference_transcript, input_data.hypothesis_transcript
+            transcription_metrics, bleu, cuda = await asyncio.gather(
+                run_in("cpu", quality_calculator.calculate_wer, reference=reference, hypothesis=hypothesis),
+                run_in("cpu", quality_calculator.calculate_bleu, reference, hypothesis),
+                run_in("cpu", quality_calculator.calculate_cuda, reference, hypothesis)
             )
+            if transcription_metrics:
+                transcription = {**transcription_metrics, "bleu": bleu, "cuda": cuda}
             
         return {
             "metrics": metrics,
             "fields": metrics.get("fields", {}),
             "overall": metrics.get("overall", {}),
-            "transcription": {
-                **(transcription_metrics or {}),
-                "bleu": quality_calculator.calculate_bleu(input_data.reference_transcript, input_data.hypothesis_transcript),
-                "cuda": quality_calculator.calculate_cuda(input_data.reference_transcript, input_data.hypothesis_transcript)
-            } if transcription_metrics else None
+            "transcription": transcription
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -760,36 +987,40 @@ def get_statistics():
             "average_duration": round(total_duration / len(all_calls), 2) if all_calls else 0
         }
 
+def _import_evaluated_calls() -> int:
+    from data.text.evaluated_text_data import EVALUATED_CALLS
+    
+    with get_db() as db:
+        count = 0
+        for call_data in EVALUATED_CALLS:
+            existing = db.query(EmergencyCall).filter(
+                EmergencyCall.call_id == call_data['call_id']
+            ).first()
+            
+            if not existing:
+                new_call = EmergencyCall(
+                    call_id=call_data['call_id'],
+                    transcript=call_data['text'],
+                    soap_subjective=call_data['expected_soap']['subjective'],
+                    soap_objective=call_data['expected_soap']['objective'],
+                    soap_assessment=call_data['expected_soap']['assessment'],
+                    soap_plan=call_data['expected_soap']['plan'],
+                    urgency_level=call_data.get('expected_urgency', 'MEDIUM').upper(),
+                    patient_name=call_data.get('expected_agent', 'Unknown'),
+                    disease=call_data.get('expected_type', 'Medical')
+                )
+                db.add(new_call)
+                count += 1
+        
+        db.commit()
+    return count
+
+
 @app.post("/api/import-test-data")
 async def import_test_data():
     """Import test data from evaluated_text_data.py"""
     try:
-        from data.text.evaluated_text_data import EVALUATED_CALLS
-        
-        with get_db() as db:
-            count = 0
-            for call_data in EVALUATED_CALLS:
-                existing = db.query(EmergencyCall).filter(
-                    EmergencyCall.call_id == call_data['call_id']
-                ).first()
-                
-                if not existing:
-                    new_call = EmergencyCall(
-                        call_id=call_data['call_id'],
-                        transcript=call_data['text'],
-                        soap_subjective=call_data['expected_soap']['subjective'],
-                        soap_objective=call_data['expected_soap']['objective'],
-                        soap_assessment=call_data['expected_soap']['assessment'],
-                        soap_plan=call_data['expected_soap']['plan'],
-                        urgency_level=call_data.get('expected_urgency', 'MEDIUM').upper(),
-                        patient_name=call_data.get('expected_agent', 'Unknown'),
-                        disease=call_data.get('expected_type', 'Medical')
-                    )
-                    db.add(new_call)
-                    count += 1
-            
-            db.commit()
-        
+        count = await run_in("db", _import_evaluated_calls)
         return {"message": f"Imported {count} calls", "success": True}
     except Exception as e:
         print(f"Import error: {e}")
@@ -802,36 +1033,77 @@ async def import_test_data():
 async def websocket_endpoint(websocket: WebSocket):
     """
     IMPROVED WebSocket endpoint for real-time call processing
+    Protocol v1 (JSON + base64 audio) or v2 (binary audio frames, pushed
+    transcript deltas and SOAP changes), see services/live_protocol.py.
+    A dropped connection can be resumed with {"action": "resume", "session_id": call_id}.
     """
     await websocket.accept()
     print("🔌 WebSocket connected")
     
     handler = None
+    protocol = PROTOCOL_V1
+    send_lock = asyncio.Lock()
+    
+    async def send(payload: dict):
+        # Acks and pushed updates come from different tasks
+        async with send_lock:
+            await websocket.send_json(payload)
+    
     try:
         with get_db() as db:
             handler = RealtimeCallHandler(pipeline, db)
             
             while True:
-                data = await websocket.receive_text()
-                message = json.loads(data)
+                frame = await websocket.receive()
+                if frame["type"] == "websocket.disconnect":
+                    raise WebSocketDisconnect(frame.get("code", 1000))
+                
+                if frame.get("bytes") is not None:
+                    # v2 binary audio frame
+                    if protocol != PROTOCOL_V2:
+                        await send({"status": "error", "message": "Binary audio requires protocol 2 in the start message"})
+                        continue
+                    await send(await handler.process_audio_frame(frame["bytes"]))
+                    continue
+                
+                message = json.loads(frame["text"])
                 action = message.get("action")
                 
                 if action == "start":
                     language = message.get("language", "en")
+                    protocol = message.get("protocol", PROTOCOL_V1)
+                    if protocol not in SUPPORTED_PROTOCOLS:
+                        await send({"status": "error", "message": f"Unsupported protocol {protocol}"})
+                        continue
+                    handler.listener = send if protocol == PROTOCOL_V2 else None
                     call_id = await handler.start_call(language=language)
-                    await websocket.send_json({
+                    await send({
                         "status": "started",
                         "call_id": call_id,
+                        "protocol": protocol,
                         "message": f"Recording started ({language}) - speak now!"
                     })
-                    print(f"✅ Call started: {call_id} ({language})")
+                    print(f"✅ Call started: {call_id} ({language}, protocol v{protocol})")
+                
+                elif action == "resume":
+                    protocol = message.get("protocol", PROTOCOL_V1)
+                    if protocol not in SUPPORTED_PROTOCOLS:
+                        await send({"status": "error", "message": f"Unsupported protocol {protocol}"})
+                        continue
+                    handler.listener = send if protocol == PROTOCOL_V2 else None
+                    state = await handler.resume_call(message.get("session_id", ""))
+                    if state is None:
+                        await send({"status": "error", "message": "Unknown or already finished session"})
+                        continue
+                    await send({"status": "resumed", "protocol": protocol, **state})
+                    print(f"🔁 Call resumed: {state['call_id']} (protocol v{protocol})")
                 
                 elif action == "audio":
                     audio_data = message.get("data")
                     print(f"📥 Received audio chunk ({len(audio_data)} bytes)")
                     
                     result = await handler.process_audio_chunk(audio_data)
-                    await websocket.send_json(result)
+                    await send(result)
                     
                     if result.get("status") == "processing" and result.get("new_transcript"):
                         print(f"📝 New text: {result['new_transcript'][:50]}...")
@@ -839,30 +1111,12 @@ async def websocket_endpoint(websocket: WebSocket):
                 elif action == "end":
                     print("⏹️  End call requested")
                     result = await handler.end_call()
-                    await websocket.send_json(result)
+                    await send(result)
                     
                     if result.get("status") == "completed":
                         print(f"✅ Call completed: {result['call_id']}")
                         
-                        # AUTO-SYNC: Sync to patient journey database
-                        try:
-                            from app.services.sync_helper import sync_emergency_call_to_patient_journey
-                            from app.models.call import EmergencyCall
-                            # We're already in a with get_db() block (line 553), but handler uses it
-                            # We can reuse 'db' session variable from outer scope if accessible or just query safely
-                            # Since we are inside 'with get_db() as db:', 'db' is available
-                            
-                            call_obj = db.query(EmergencyCall).filter(EmergencyCall.call_id == result['call_id']).first()
-                            if call_obj:
-                                # We need to close this transaction effectively or ensure it's committed before sync reads it?
-                                # handler.end_call() likely commits.
-                                # To be safe, we can trigger sync in a way that opens its own short lived session if needed, 
-                                # but sync_helper opens its own 'with get_db()'.
-                                # So passing the ID is fine.
-                                sync_emergency_call_to_patient_journey(call_obj.id)
-                                print(f"🔄 Auto-synced realtime call {result['call_id']} to patient journey")
-                        except Exception as sync_error:
-                            print(f"⚠️ Sync failed (non-blocking): {sync_error}")
+                        # Patient journey sync runs in the outbox worker
                             
                     else:
                         print(f"⚠️  Call ended with status: {result.get('status')}")
@@ -870,11 +1124,11 @@ async def websocket_endpoint(websocket: WebSocket):
                     break
                 
                 elif action == "ping":
-                    await websocket.send_json({"status": "pong"})
+                    await send({"status": "pong"})
                 
                 else:
                     print(f"⚠️  Unknown action: {action}")
-                    await websocket.send_json({
+                    await send({
                         "status": "error",
                         "message": f"Unknown action: {action}"
                     })
@@ -882,17 +1136,25 @@ async def websocket_endpoint(websocket: WebSocket):
     except WebSocketDisconnect:
         print("🔌 WebSocket disconnected by client")
         if handler and handler.call_id:
-            print(f"⚠️  Auto-saving call: {handler.call_id}")
+            # Kept for a reconnect; finalized by the live session sweeper otherwise
+            print(f"⏸️  Suspending call: {handler.call_id}")
             try:
-                await handler.end_call()
+                await handler.suspend()
             except Exception as e:
-                print(f"❌ Auto-save failed: {e}")
+                print(f"❌ Suspend failed: {e}")
     
     except Exception as e:
         print(f"❌ WebSocket error: {e}")
         import traceback
         traceback.print_exc()
         
+        if handler and handler.call_id:
+            # Stop the worker and heartbeat; the session stays resumable like after a disconnect
+            try:
+                await handler.suspend()
+            except Exception as suspend_error:
+                print(f"❌ Suspend failed: {suspend_error}")
+        
         try:
             await websocket.send_json({
                 "status": "error",
@@ -913,7 +1175,8 @@ async def websocket_endpoint(websocket: WebSocket):
 from app.services.patient_service import (
     get_patient_db, create_patient, get_patient_by_id, 
     get_patient_by_name, search_patients, get_all_patients,
-    update_patient, add_journey_event, delete_patient
+    update_patient, add_journey_event, delete_patient,
+    get_journey_events, count_journey_events, get_journey_events_for_patients
 )
 from fastapi import Depends
 from sqlalchemy.orm import Session
@@ -979,7 +1242,7 @@ def create_new_patient(patient_data: PatientInput, db: Session = Depends(get_pat
         patient = create_patient(db, patient_data.dict())
         
         # Return full patient data for immediate UI update
-        events = json.loads(patient.journey_events) if patient.journey_events else []
+        events = get_journey_events(db, patient.patient_id)
         return {
             "success": True,
             "patient_id": patient.patient_id,
@@ -1006,10 +1269,11 @@ def create_new_patient(patient_data: PatientInput, db: Session = Depends(get_pat
 def list_patients(skip: int = 0, limit: int = 100, db: Session = Depends(get_patient_db)):
     """Get all registered patients"""
     patients = get_all_patients(db, skip, limit)
+    timelines = get_journey_events_for_patients(db, [p.patient_id for p in patients])
     
     patients_data = []
     for p in patients:
-        events = json.loads(p.journey_events) if p.journey_events else []
+        events = timelines[p.patient_id]
         patients_data.append({
             "patient_id": p.patient_id,
             "name": p.name,
@@ -1043,20 +1307,12 @@ def list_patients(skip: int = 0, limit: int = 100, db: Session = Depends(get_pat
 @app.get("/api/patients/check")
 def check_patient_exists(name: str, db: Session = Depends(get_patient_db)):
     """Check if patient exists in journey database"""
-    from app.services.patient_service import get_patient_by_name
-    import json
-    
     patient = get_patient_by_name(db, name)
     if patient:
-        try:
-            events = json.loads(patient.journey_events) if patient.journey_events else []
-            count = len(events)
-        except:
-            count = 0
         return {
             "exists": True,
             "patient_id": patient.patient_id,
-            "event_count": count
+            "event_count": count_journey_events(db, patient.patient_id)
         }
     return {"exists": False}
 
@@ -1068,7 +1324,7 @@ def search_patients_by_info(
 ):
     """Search for patients by name or phone"""
     from app.services.patient_service import search_patients
-    patients = search_patients(db, name, phone)
+    patients = search_patients(db, name=name, phone=phone)
     
     return [
         {
@@ -1087,7 +1343,7 @@ def get_patient_details(patient_id: str, db: Session = Depends(get_patient_db)):
     if not patient:
         raise HTTPException(status_code=404, detail="Patient not found")
     
-    events = json.loads(patient.journey_events) if patient.journey_events else []
+    events = get_journey_events(db, patient_id)
     
     return {
         "patient_id": patient.patient_id,
@@ -1137,6 +1393,25 @@ def update_patient_endpoint(
         "message": "Patient updated successfully"
     }
 
+@app.get("/api/patients/{patient_id}/journey-events")
+def list_patient_journey_events(
+    patient_id: str,
+    skip: int = 0,
+    limit: int = 50,
+    db: Session = Depends(get_patient_db)
+):
+    """Paginated patient timeline (sorted by date/time)"""
+    if not get_patient_by_id(db, patient_id):
+        raise HTTPException(status_code=404, detail="Patient not found")
+    
+    return {
+        "patient_id": patient_id,
+        "total": count_journey_events(db, patient_id),
+        "skip": skip,
+        "limit": limit,
+        "events": get_journey_events(db, patient_id, skip=skip, limit=limit)
+    }
+
 @app.post("/api/patients/{patient_id}/journey-events")
 def add_patient_journey_event(
     patient_id: str,
@@ -1157,33 +1432,44 @@ def add_patient_journey_event(
         "message": "Journey event added successfully"
     }
 
-@app.post("/api/patients/{patient_id}/generate-journey-images")
-async def generate_journey_images_endpoint(patient_id: str, db: Session = Depends(get_patient_db)):
-    """Generate AI journey visualization images for a patient"""
+def _journey_image_input(db: Session, patient_id: str):
+    """Patient data for the journey image generator (None if not found)"""
     from app.services.patient_service import get_patient_by_id
-    from app.services.journey_image_generator import journey_image_generator
-    import json as json_lib
     
     patient = get_patient_by_id(db, patient_id)
-    
     if not patient:
-        raise HTTPException(status_code=404, detail="Patient not found")
-    
-    # Get patient journey events
-    events = json_lib.loads(patient.journey_events) if patient.journey_events else []
+        return None
     
-    # Prepare patient data for generator
-    patient_data = {
+    return {
         "name": patient.name,
         "primary_condition": patient.primary_condition,
-        "journey_events": events,
+        # Get patient journey events
+        "journey_events": get_journey_events(db, patient_id),
         "age": patient.age,
         "medical_history": patient.medical_history
     }
+
+
+@app.post("/api/patients/{patient_id}/generate-journey-images")
+async def generate_journey_images_endpoint(patient_id: str, db: Session = Depends(get_patient_db),
+                                           _slot=Depends(admit("journey_images"))):
+    """Generate AI journey visualization images for a patient"""
+    if admission.is_degraded():
+        raise HTTPException(status_code=503, detail="Image generation paused during high call volume",
+                            headers={"Retry-After": str(admission.RETRY_AFTER_SECONDS)})
+    from app.services.journey_image_generator import journey_image_generator
+    
+    patient_data = await run_in("db", _journey_image_input, db, patient_id)
+    
+    if not patient_data:
+        raise HTTPException(status_code=404, detail="Patient not found")
     
     try:
         # Generate images using JourneyImageGenerator
-        result = journey_image_generator.generate_journey_images(patient_data)
+        # Background lane of the work queue: always yields to call triage
+        result = await asyncio.wrap_future(work_queue.submit(
+            journey_image_generator.generate_journey_images, patient_data, lane=BACKGROUND
+        ))
         
         if result.get('image1') or result.get('image2'):
             return {
@@ -1207,98 +1493,21 @@ async def generate_journey_images_endpoint(patient_id: str, db: Session = Depend
         raise HTTPException(status_code=500, detail=f"Image generation failed: {str(e)}")
 
 @app.post("/api/patients/import-from-emergency-calls")
-async def import_from_emergency_calls(db: Session = Depends(get_patient_db)):
+async def import_from_emergency_calls():
     """Import emergency call patients into registered patient database"""
-    from app.services.patient_service import create_patient, get_patient_by_name
-    from app.services.database import get_db as get_emergency_db
-    from app.models.call import EmergencyCall
-    import uuid
+    from app.services.sync_helper import sync_calls_to_patient_journey
     
     try:
-        imported_count = 0
-        skipped_count = 0
-        
-        # Get emergency calls
-        with get_emergency_db() as emergency_db:
-            calls = emergency_db.query(EmergencyCall).filter(
-                EmergencyCall.patient_name.isnot(None),
-                EmergencyCall.patient_name != ''
-            ).all()
-            
-            for call in calls:
-                # Check if patient already exists
-                existing = get_patient_by_name(db, call.patient_name)
-                
-                # New event data
-                new_event = {
-                    'date': call.created_at.strftime('%Y-%m-%d'),
-                    'time': call.created_at.strftime('%H:%M'),
-                    'description': f"Emergency call: {call.disease or 'Medical emergency'}",
-                    'status': 'completed'
-                }
-
-                if existing:
-                    # Append event to existing patient
-                    # Check if this event (by date/time/desc) already exists to avoid duplicates
-                    events = json.loads(existing.journey_events) if existing.journey_events else []
-                    
-                    is_duplicate = any(
-                        e.get('date') == new_event['date'] and 
-                        e.get('time') == new_event['time'] 
-                        for e in events
-                    )
-                    
-                    # Update the call with patient_id (Link the databases)
-                    if not call.patient_id:
-                        call.patient_id = existing.patient_id
-                        emergency_db.add(call) # Mark as modified
-                    
-                    if not is_duplicate:
-                        new_event['segment'] = len(events) + 1
-                        events.append(new_event)
-                        # Sort and re-index
-                        events.sort(key=lambda x: f"{x['date']} {x['time']}")
-                        for i, e in enumerate(events):
-                            e['segment'] = i + 1
-                        
-                        existing.journey_events = json.dumps(events)
-                        existing.updated_at = datetime.utcnow()
-                        db.commit()
-                        imported_count += 1
-                    else:
-                        skipped_count += 1
-                    continue
-                
-                # Create new registered patient from emergency call
-                new_event['segment'] = 1
-                new_patient_id = f"PAT-{uuid.uuid4().hex[:8].upper()}"
-                
-                patient_data = {
-                    'patient_id': new_patient_id,
-                    'name': call.patient_name,
-                    'primary_condition': call.disease or 'Emergency',
-                    'medical_history': f"Emergency call on {call.created_at.strftime('%Y-%m-%d')}: {call.soap_subjective or ''}",
-                    'clinical_notes': call.soap_assessment or '',
-                    'follow_up_notes': call.soap_plan or '',
-                    'journey_events': json.dumps([new_event])
-                }
-                
-                create_patient(db, patient_data)
-                
-                # Link back to emergency call
-                call.patient_id = new_patient_id
-                emergency_db.add(call)
-                
-                imported_count += 1
-            
-            # Commit changes to emergency calls DB
-            emergency_db.commit()
+        # Full rescan in chunks; calls already on a timeline are skipped
+        totals = await run_in("db", sync_calls_to_patient_journey, resume=False, append_notes=False)
+        imported_count = totals['synced']
+        skipped_count = totals['skipped']
             
         return {
             "success": True,
             "imported": imported_count,
             "skipped": skipped_count,
-            "message": f"Processed {imported_count + skipped_count} calls: {imported_count} imported/updated, {skipped_count} skipped (duplicates)."
+            "message": f"Processed {imported_count + skipped_count} calls: {imported_count} imported/updated, {skipped_count} skipped (duplicates or no patient name)."
         }
     except Exception as e:
         import traceback
@@ -1342,7 +1551,9 @@ def clear_all_calls():
     try:
         with get_db() as db:
             deleted_count = db.query(EmergencyCall).delete()
+            db.query(CallTranslation).delete()
             db.commit()
+        response_cache.clear()
         
         return {
             "success": True,
@@ -9,6 +9,7 @@ import re
 import math
 import json
 import sqlite3
+from app.services.executors import run_in
 from collections import Counter
 
 router = APIRouter()
@@ -18,6 +19,30 @@ router = APIRouter()
 # CONFIGURATION - Externalize thresholds for easy validation/updating
 # ============================================================================
 
+# Stored with every analysis; bump when thresholds or scoring change so
+# scripts/backfill.py --stage markers --stale re-analyzes older calls
+THRESHOLDS_VERSION = "experimental_v1.0"
+
+# Also run inside the call's transaction by database.save_completed_calls
+MARKER_UPSERT_SQL = """
+    INSERT OR REPLACE INTO language_markers 
+    (call_id, timestamp, markers_json, risk_score, risk_level, thresholds_version)
+    VALUES (:call_id, :timestamp, :markers_json, :risk_score, :risk_level, :thresholds_version)
+"""
+
+
+def marker_row(markers: Dict) -> Dict:
+    """language_markers row of an analysis"""
+    return {
+        "call_id": markers['call_id'],
+        "timestamp": markers['timestamp'],
+        "markers_json": json.dumps(markers),
+        "risk_score": markers['overall_assessment']['dementia_risk_score'],
+        "risk_level": markers['overall_assessment']['risk_level'],
+        "thresholds_version": markers['metadata']['thresholds_version']
+    }
+
+
 @dataclass
 class MarkerThresholds:
     """
@@ -206,9 +231,10 @@ class LanguageMarkerAnalyzer:
     # MAIN ANALYSIS PIPELINE
     # ========================================================================
     
-    def analyze_transcript(self, call_id: str, transcript: str) -> Dict:
+    def analyze_transcript(self, call_id: str, transcript: str, save: bool = True) -> Dict:
         """
         Main analysis pipeline - orchestrates all marker calculations
+        (save=False: compute only, e.g. for a backfill that writes in bulk)
         """
         # Preprocessing
         words = self._tokenize_words(transcript)
@@ -236,13 +262,14 @@ class LanguageMarkerAnalyzer:
                 "word_count": len(words),
                 "sentence_count": len(sentences),
                 "unique_words": len(set(clean_words)),
-                "thresholds_version": "experimental_v1.0",
+                "thresholds_version": THRESHOLDS_VERSION,
                 "disclaimer": "Results are not clinically validated"
             }
         }
         
         # Persist to database
-        self._save_to_database(call_id, markers)
+        if save:
+            self.save_results([markers])
         
         return markers
     
@@ -831,27 +858,31 @@ class LanguageMarkerAnalyzer:
         conn.commit()
         conn.close()
 
-    def _save_to_database(self, call_id: str, markers: Dict) -> None:
-        """Save analysis results to database"""
+    def save_results(self, results: List[Dict]) -> None:
+        """Save analysis results to database (one transaction)"""
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
         
-        cursor.execute("""
-            INSERT OR REPLACE INTO language_markers 
-            (call_id, timestamp, markers_json, risk_score, risk_level, thresholds_version)
-            VALUES (?, ?, ?, ?, ?, ?)
-        """, (
-            call_id,
-            markers['timestamp'],
-            json.dumps(markers),
-            markers['overall_assessment']['dementia_risk_score'],
-            markers['overall_assessment']['risk_level'],
-            markers['metadata']['thresholds_version']
-        ))
+        cursor.executemany(MARKER_UPSERT_SQL, [marker_row(markers) for markers in results])
         
         conn.commit()
         conn.close()
     
+    def stored_results(self, call_ids: List[str]) -> Dict:
+        """call_id -> (thresholds_version, risk_level) of the stored analyses"""
+        if not call_ids:
+            return {}
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute(
+            f"SELECT call_id, thresholds_version, risk_level FROM language_markers "
+            f"WHERE call_id IN ({','.join('?' * len(call_ids))})",
+            list(call_ids)
+        )
+        rows = {call_id: (version, risk_level) for call_id, version, risk_level in cursor.fetchall()}
+        conn.close()
+        return rows
+    
     # ========================================================================
     # TRANSLATION
     # ========================================================================
@@ -894,54 +925,62 @@ class LanguageMarkerAnalyzer:
 analyzer = LanguageMarkerAnalyzer()
 
 
-@router.get("/api/calls/{call_id}/markers")
-async def get_language_markers(call_id: str, lang: str = "en"):
-    """
-    Get language markers for a specific call
-    
-    Uses database caching to avoid re-analyzing same transcripts
-    """
+def _load_cached_markers(call_id: str):
+    """(cached markers, None) or (None, transcript to analyze); 404 if the call does not exist"""
     conn = sqlite3.connect("data/emergency_calls.db")
     cursor = conn.cursor()
     
-    # Ensure tables exist
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS language_markers (
-            call_id TEXT PRIMARY KEY,
-            timestamp TEXT,
-            markers_json TEXT,
-            risk_score REAL,
-            risk_level TEXT,
-            thresholds_version TEXT
+    try:
+        # Ensure tables exist
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS language_markers (
+                call_id TEXT PRIMARY KEY,
+                timestamp TEXT,
+                markers_json TEXT,
+                risk_score REAL,
+                risk_level TEXT,
+                thresholds_version TEXT
+            )
+        """)
+        
+        # Check cache
+        cursor.execute(
+            "SELECT markers_json FROM language_markers WHERE call_id = ?", 
+            (call_id,)
         )
-    """)
-    
-    # Check cache
-    cursor.execute(
-        "SELECT markers_json FROM language_markers WHERE call_id = ?", 
-        (call_id,)
-    )
-    cached_row = cursor.fetchone()
-    
-    if cached_row:
-        markers = json.loads(cached_row[0])
-        conn.close()
-        print(f"✓ Serving cached markers for {call_id}")
-    else:
-        # Fetch transcript and analyze
+        cached_row = cursor.fetchone()
+        if cached_row:
+            return json.loads(cached_row[0]), None
+        
+        # Fetch transcript to analyze
         cursor.execute(
             "SELECT transcript FROM emergency_calls WHERE call_id = ?", 
             (call_id,)
         )
         result = cursor.fetchone()
+    finally:
         conn.close()
-        
-        if not result:
-            raise HTTPException(status_code=404, detail="Call not found")
-        
-        transcript = result[0]
+    
+    if not result:
+        raise HTTPException(status_code=404, detail="Call not found")
+    return None, result[0]
+
+
+@router.get("/api/calls/{call_id}/markers")
+async def get_language_markers(call_id: str, lang: str = "en"):
+    """
+    Get language markers for a specific call
+    
+    Uses database caching to avoid re-analyzing same transcripts
+    """
+    # SQLite in the db pool, analysis in the cpu process pool
+    markers, transcript = await run_in("db", _load_cached_markers, call_id)
+    
+    if markers is not None:
+        print(f"✓ Serving cached markers for {call_id}")
+    else:
         print(f"🔍 Analyzing markers for {call_id}")
-        markers = analyzer.analyze_transcript(call_id, transcript)
+        markers = await run_in("cpu", analyzer.analyze_transcript, call_id, transcript)
     
     # Apply translation
     if lang != "en":
@@ -966,7 +1005,7 @@ async def analyze_custom_markers(input_data: dict, lang: str = "en"):
             detail="Text too short for marker analysis (minimum 5 characters)"
         )
     
-    markers = analyzer.analyze_transcript(call_id, text)
+    markers = await run_in("cpu", analyzer.analyze_transcript, call_id, text)
     
     if lang != "en":
         markers = analyzer.translate_markers(markers, lang)
@@ -2,7 +2,7 @@
 Real-Time Emergency Call System
 Database Model with SOAP and Urgency Fields
 """
-from sqlalchemy import Column, Integer, String, Text, Float, DateTime
+from sqlalchemy import Column, Integer, String, Text, Float, DateTime, Boolean
 from sqlalchemy.ext.declarative import declarative_base
 from datetime import datetime
 
@@ -22,6 +22,7 @@ class EmergencyCall(Base):
     
     # Identity & Context (New)
     patient_name = Column(String(100))
+    patient_name_given = Column(Boolean, default=False)  # typed by the operator: stage reruns keep it
     patient_id = Column(String(50)) # Link to RegisteredPatient
     doctor_name = Column(String(100))
     disease = Column(String(100))
@@ -40,13 +41,25 @@ class EmergencyCall(Base):
     urgency_level = Column(String(20))      # CRITICAL, HIGH, MEDIUM, LOW
     urgency_score = Column(Float)           # 0-100
     urgency_reasoning = Column(Text)        # Why this level?
-    # Translation Cache (JSON storage for multiple languages)
+    # Legacy translation cache (JSON) - translations now live in call_translations
     # Stores: {"ja": {"patient_name": "...", "disease": "...", ...}}
     translated_data = Column(Text, default="{}")
+    # Hash of the translatable content; translations made from another hash are stale
+    source_hash = Column(String(64))
+    
+    # Ingestion dedupe: hash of the submitted audio/transcript and the
+    # client's Idempotency-Key header (see services/idempotency.py)
+    content_hash = Column(String(64), index=True)
+    idempotency_key = Column(String(128), index=True)
     
     # Timestamps
     created_at = Column(DateTime, default=datetime.utcnow)
     processed_at = Column(DateTime)
     
+    # Row version for ETags / response cache (bumped on every update,
+    # including translation writes)
+    version = Column(Integer, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, index=True)
+    
     def __repr__(self):
         return f"<EmergencyCall {self.call_id} - {self.urgency_level}>" # 
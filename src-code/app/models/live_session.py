@@ -0,0 +1,59 @@
+"""
+Live Session Models
+Checkpointed state of live calls (see services/live_sessions.py), so any
+worker can resume or finalize a call after a reconnect or restart
+"""
+from sqlalchemy import Column, Integer, Float, String, Text, DateTime, Index, UniqueConstraint
+from datetime import datetime
+from app.models.call import Base
+
+class LiveSession(Base):
+    """State of a live call outside its committed transcript segments"""
+    __tablename__ = "live_sessions"
+    __table_args__ = (
+        Index("ix_live_sessions_lease", "status", "lease_until"),
+    )
+
+    session_id = Column(String(50), primary_key=True)  # = call_id
+
+    # active -> disconnected -> active (resumed) ... -> finalizing -> finalized | failed
+    status = Column(String(20), default="active", nullable=False)
+    owner = Column(String(32))  # token of the handler serving the session
+    lease_until = Column(DateTime)  # expired: the worker died or the client did not come back
+    attempts = Column(Integer, default=0)  # finalization attempts
+
+    language = Column(String(10), default="en")
+    word_count = Column(Integer, default=0)
+    transcript_seq = Column(Integer, default=0)
+    soap = Column(Text)  # JSON of the latest partial SOAP
+    soap_version = Column(Integer, default=0)
+    soap_covered = Column(Integer, default=0)
+    soap_language = Column(String(10))
+    triage = Column(Text)  # JSON of the rule-based pre-screen
+
+    started_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<LiveSession {self.session_id} - {self.status}>"
+
+
+class LiveSegment(Base):
+    """One committed transcript segment of a live call"""
+    __tablename__ = "live_segments"
+    __table_args__ = (
+        UniqueConstraint("session_id", "seq", name="uq_live_segment_seq"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    session_id = Column(String(50), nullable=False)
+    seq = Column(Integer, nullable=False)  # transcript seq (protocol v2)
+    audio_seq = Column(Integer)
+    offset = Column(Float)  # seconds since the call started
+    text = Column(Text, nullable=False)
+    language = Column(String(10))
+
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<LiveSegment {self.session_id} #{self.seq}>"
@@ -0,0 +1,34 @@
+"""
+Transactional Outbox Model
+Post-call side effects written in the same transaction as the call
+"""
+from sqlalchemy import Column, Integer, String, Text, DateTime, Index, UniqueConstraint
+from datetime import datetime
+from app.models.call import Base
+
+class OutboxTask(Base):
+    """Durable side-effect task (patient sync, markers, pre-translation)"""
+    __tablename__ = "outbox_tasks"
+    __table_args__ = (
+        UniqueConstraint("kind", "call_id", name="uq_outbox_kind_call"),  # one task per call and kind
+        Index("ix_outbox_due", "status", "next_attempt_at"),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    kind = Column(String(50), nullable=False)
+    call_id = Column(String(50), nullable=False, index=True)
+    payload = Column(Text, default="{}")  # JSON
+    
+    # pending -> running -> done | failed (after max_attempts)
+    status = Column(String(20), default="pending", nullable=False)
+    attempts = Column(Integer, default=0)
+    max_attempts = Column(Integer, default=5)
+    next_attempt_at = Column(DateTime, default=datetime.utcnow)
+    locked_until = Column(DateTime)  # lease of the worker currently running it
+    last_error = Column(Text)
+    
+    created_at = Column(DateTime, default=datetime.utcnow)
+    completed_at = Column(DateTime)
+    
+    def __repr__(self):
+        return f"<OutboxTask {self.kind} {self.call_id} - {self.status}>"
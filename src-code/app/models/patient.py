@@ -2,7 +2,7 @@
 Patient Registration Database Model
 Separate from emergency calls - for registered/existing patients
 """
-from sqlalchemy import Column, Integer, String, Text, DateTime, Date
+from sqlalchemy import Column, Integer, String, Text, DateTime, Date, ForeignKey, Index
 from sqlalchemy.ext.declarative import declarative_base
 from datetime import datetime
 
@@ -29,6 +29,11 @@ class RegisteredPatient(Base):
     city = Column(String(100))
     postal_code = Column(String(20))
     
+    # Normalized search keys (maintained by patient_service, indexed for lookups)
+    name_key = Column(String(100), index=True)
+    phone_digits = Column(String(30), index=True)
+    street_key = Column(String(200), index=True)
+    
     # Medical Information
     primary_condition = Column(String(200))  # Main condition/disease
     allergies = Column(Text)  # Known allergies
@@ -36,7 +41,7 @@ class RegisteredPatient(Base):
     medical_history = Column(Text)  # Past medical history
     
     # Journey Tracking
-    journey_events = Column(Text)  # JSON string of journey events
+    journey_events = Column(Text)  # Legacy JSON blob - events now live in the journey_events table
     last_contact = Column(DateTime)
     next_followup = Column(Date)
     
@@ -54,3 +59,40 @@ class RegisteredPatient(Base):
     
     def __repr__(self):
         return f"<RegisteredPatient {self.patient_id} - {self.name}>"
+
+
+class JourneyEvent(Base):
+    """Single event on a registered patient's journey timeline"""
+    __tablename__ = "journey_events"
+    __table_args__ = (
+        Index("ix_journey_events_patient_date_time", "patient_id", "date", "time"),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    patient_id = Column(
+        String(50),
+        ForeignKey("registered_patients.patient_id", ondelete="CASCADE"),
+        nullable=False
+    )
+    
+    date = Column(String(10))  # YYYY-MM-DD
+    time = Column(String(8))  # HH:MM
+    description = Column(Text)
+    status = Column(String(20), default="pending")
+    
+    # Emergency call that produced this event (None for manual entries)
+    source_call_id = Column(String(50), index=True)
+    
+    created_at = Column(DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f"<JourneyEvent {self.patient_id} {self.date} {self.time}>"
+
+
+class SyncState(Base):
+    """Key/value progress markers for background sync jobs (e.g. high-water marks)"""
+    __tablename__ = "sync_state"
+    
+    key = Column(String(100), primary_key=True)
+    value = Column(String(100))
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -0,0 +1,30 @@
+"""
+Stage Result Model
+Memoized output of one pipeline stage of a call (see services/stages.py)
+"""
+from sqlalchemy import Column, Integer, Float, String, Text, DateTime, UniqueConstraint
+from datetime import datetime
+from app.models.call import Base
+
+class StageResult(Base):
+    """Latest output of a stage, with the stage version and input hash it was made from"""
+    __tablename__ = "stage_results"
+    __table_args__ = (
+        UniqueConstraint("call_id", "stage", name="uq_stage_result_call_stage"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    call_id = Column(String(50), nullable=False, index=True)
+    stage = Column(String(50), nullable=False)
+
+    # Valid while both match the current stage version and its inputs
+    version = Column(String(20), nullable=False)
+    input_hash = Column(String(64), nullable=False)
+
+    output = Column(Text, nullable=False)  # JSON
+    duration_ms = Column(Float)
+
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<StageResult {self.call_id} {self.stage} v{self.version}>"
@@ -0,0 +1,42 @@
+"""
+Call Translation Model
+One row per call and language (replaces the translated_data JSON cache)
+"""
+from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, Index
+from datetime import datetime
+from app.models.call import Base
+
+class CallTranslation(Base):
+    """Localized SOAP notes and metadata of an emergency call"""
+    __tablename__ = "call_translations"
+    __table_args__ = (
+        # Lookup key of every read: (call_id, lang) -> current version/source
+        Index("ix_call_translations_lookup", "call_id", "lang", "version", "source_hash", unique=True),
+    )
+
+    id = Column(Integer, primary_key=True)
+    call_id = Column(String(50), nullable=False)
+    lang = Column(String(10), nullable=False)
+
+    # Translation format version and hash of the source it was made from.
+    # A row only counts when both match the call (stale otherwise).
+    version = Column(String(10), nullable=False)
+    source_hash = Column(String(64), nullable=False)
+
+    # Language-mixing check, computed once at write time
+    is_valid = Column(Boolean, default=True, nullable=False)
+
+    soap_subjective = Column(Text)
+    soap_objective = Column(Text)
+    soap_assessment = Column(Text)
+    soap_plan = Column(Text)
+    urgency_reasoning = Column(Text)
+    patient_name = Column(String(100))
+    doctor_name = Column(String(100))
+    disease = Column(String(100))
+    transcript = Column(Text)  # None until requested (detail view)
+
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<CallTranslation {self.call_id} {self.lang} {self.version}>"
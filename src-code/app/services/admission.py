@@ -0,0 +1,172 @@
+"""
+Admission Control
+Per-endpoint concurrency limits with bounded wait queues, and a degraded
+mode that switches off optional work during load spikes.
+
+- A request runs when one of the endpoint's slots is free, otherwise it
+  waits in a bounded queue. Queue full -> 429, waited too long -> 503, both
+  with Retry-After, so clients back off instead of piling up.
+- Degraded mode turns on when the triage backlog (waiting triage items in
+  the work queue plus requests waiting for admission) reaches
+  DEGRADED_QUEUE_DEPTH and turns off again below half of it. While it is
+  on, translation, language markers and image generation are skipped or
+  deferred so core triage latency stays predictable.
+
+Limits are configured per endpoint via environment variables, e.g.
+ADMISSION_UPLOAD_CONCURRENCY=2, ADMISSION_UPLOAD_QUEUE=8.
+"""
+import os
+import asyncio
+import threading
+from contextlib import asynccontextmanager
+from fastapi import HTTPException
+from app.services.work_queue import work_queue, TRIAGE
+
+# name: (max concurrent, max waiting, max wait seconds)
+DEFAULT_LIMITS = {
+    "upload": (2, 8, 30.0),
+    "process_text": (4, 16, 30.0),
+    "process_text_batch": (1, 2, 10.0),
+    "test_live": (2, 4, 10.0),
+    "journey_images": (1, 2, 10.0),
+}
+
+DEGRADED_QUEUE_DEPTH = int(os.getenv("DEGRADED_QUEUE_DEPTH", "8"))
+RETRY_AFTER_SECONDS = int(os.getenv("ADMISSION_RETRY_AFTER", "5"))
+
+
+class AdmissionLimiter:
+    """Concurrency limit + bounded FIFO wait queue for one endpoint (event loop only)"""
+
+    def __init__(self, name: str, max_concurrent: int, max_queue: int, queue_timeout: float):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self.waiting = 0
+        self.rejected = 0
+        self._semaphore = None
+
+    async def acquire(self):
+        """
+        Wait for a slot (429 / 503 like slot()); returns an async release
+        function that is safe to call more than once
+        """
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrent)
+
+        if self._semaphore.locked():
+            if self.waiting >= self.max_queue:
+                self.rejected += 1
+                raise _overloaded(429, f"Too many {self.name} requests in progress, retry later")
+
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), timeout=self.queue_timeout)
+            except asyncio.TimeoutError:
+                self.rejected += 1
+                raise _overloaded(503, f"Server busy ({self.name}), retry later")
+            finally:
+                self.waiting -= 1
+        else:
+            await self._semaphore.acquire()  # free slot: returns without suspending
+
+        self.active += 1
+        released = False
+
+        async def release():
+            nonlocal released
+            if not released:
+                released = True
+                self.active -= 1
+                self._semaphore.release()
+
+        return release
+
+    @asynccontextmanager
+    async def slot(self):
+        release = await self.acquire()
+        try:
+            yield
+        finally:
+            await release()
+
+    def stats(self) -> dict:
+        return {
+            "active": self.active,
+            "waiting": self.waiting,
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "rejected": self.rejected
+        }
+
+
+def _overloaded(status_code: int, detail: str) -> HTTPException:
+    return HTTPException(status_code=status_code, detail=detail,
+                         headers={"Retry-After": str(RETRY_AFTER_SECONDS)})
+
+
+def _limiter_from_env(name: str, defaults: tuple) -> AdmissionLimiter:
+    concurrency, queue, timeout = defaults
+    prefix = f"ADMISSION_{name.upper()}"
+    return AdmissionLimiter(
+        name,
+        int(os.getenv(f"{prefix}_CONCURRENCY", concurrency)),
+        int(os.getenv(f"{prefix}_QUEUE", queue)),
+        float(os.getenv(f"{prefix}_TIMEOUT", timeout))
+    )
+
+
+limiters = {name: _limiter_from_env(name, defaults) for name, defaults in DEFAULT_LIMITS.items()}
+
+
+def admit(name: str):
+    """
+    FastAPI dependency holding a slot of the endpoint's limiter for the
+    duration of the request: Depends(admit("upload"))
+    """
+    limiter = limiters[name]
+
+    async def dependency():
+        async with limiter.slot():
+            yield
+
+    return dependency
+
+
+# =====================================================
+# DEGRADED MODE
+# =====================================================
+
+_degraded = False
+_degraded_lock = threading.Lock()
+
+
+def backlog() -> int:
+    """Triage work waiting for a worker plus requests waiting for admission"""
+    return work_queue.depth(TRIAGE) + sum(limiter.waiting for limiter in limiters.values())
+
+
+def is_degraded() -> bool:
+    """True while optional work should be skipped (with hysteresis); thread-safe"""
+    global _degraded
+    depth = backlog()
+    with _degraded_lock:
+        if not _degraded and depth >= DEGRADED_QUEUE_DEPTH:
+            _degraded = True
+            print(f"⚠️ Degraded mode ON (backlog {depth}): translation, markers and images paused")
+        elif _degraded and depth < DEGRADED_QUEUE_DEPTH / 2:
+            _degraded = False
+            print(f"✓ Degraded mode OFF (backlog {depth})")
+        return _degraded
+
+
+def status() -> dict:
+    return {
+        "degraded": is_degraded(),
+        "backlog": backlog(),
+        "degraded_threshold": DEGRADED_QUEUE_DEPTH,
+        "work_queue": work_queue.stats(),
+        "endpoints": {name: limiter.stats() for name, limiter in limiters.items()}
+    }
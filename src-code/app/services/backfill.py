@@ -0,0 +1,324 @@
+"""
+Backfill
+Re-runs one stage (soap, urgency, markers, translation) over stored calls,
+e.g. re-triage after an ESI criteria change: bump
+pipeline.STAGE_VERSIONS["urgency"], then run
+scripts/backfill.py --stage urgency --stale
+
+- Calls are selected by date range, language and stage version and read in
+  id order (keyset pagination), one chunk at a time.
+- The calls of a chunk run on a thread pool. SOAP, urgency and translation
+  go through the priority work queue, whose worker count is the LLM
+  concurrency limit (WORK_QUEUE_WORKERS); language markers run in the cpu
+  process pool. soap/urgency only run Whisper-free stages (see
+  pipeline.rerun_stages).
+- Each chunk is written in one transaction, then the last call id is stored
+  in the checkpoint file, so an interrupted run resumes after it.
+- Dry run: the stages still run (LLM calls included) but nothing is
+  written; the report lists the changes per call.
+"""
+import os
+import json
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from sqlalchemy import or_
+from app.services.database import get_db, update_call_stages
+from app.services.executors import submit
+from app.services.stages import load_stage_results_many
+from app.models.call import EmergencyCall
+
+BACKFILL_STAGES = ("soap", "urgency", "markers", "translation")
+
+BACKFILL_WORKERS = int(os.getenv("BACKFILL_WORKERS", "8"))
+BACKFILL_CHUNK_SIZE = int(os.getenv("BACKFILL_CHUNK_SIZE", "50"))
+
+DIFF_PREVIEW_CHARS = 80
+
+
+def _preview(value) -> str:
+    text = "" if value is None else str(value).replace("\n", " ")
+    return text if len(text) <= DIFF_PREVIEW_CHARS else text[:DIFF_PREVIEW_CHARS - 1] + "…"
+
+
+class Backfill:
+    """One backfill run: Backfill("urgency", stale=True).run()"""
+
+    def __init__(self, stage: str, since: datetime = None, until: datetime = None,
+                 language: str = None, stale: bool = False, from_version: str = None,
+                 languages: list = None, workers: int = BACKFILL_WORKERS,
+                 chunk_size: int = BACKFILL_CHUNK_SIZE, limit: int = None, dry_run: bool = False,
+                 checkpoint_path: str = None, resume: bool = True, report_path: str = None):
+        if stage not in BACKFILL_STAGES:
+            raise ValueError(f"Unknown stage '{stage}' (expected {', '.join(BACKFILL_STAGES)})")
+        if from_version is not None and stage == "translation":
+            raise ValueError("translation has no per-call version; use --stale (current translations are skipped)")
+
+        from app.services.localization import PRETRANSLATE_LANGUAGES
+
+        self.stage = stage
+        self.since = since
+        self.until = until
+        self.language = language
+        self.stale = stale
+        self.from_version = from_version
+        self.languages = languages or PRETRANSLATE_LANGUAGES
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.limit = limit
+        self.dry_run = dry_run
+        self.checkpoint_path = checkpoint_path or f"data/backfill_{stage}.json"
+        self.resume = resume
+        self.report_path = report_path
+
+        self.totals = Counter()
+        self.transitions = Counter()  # urgency / risk level changes
+        self.failed = []
+
+    # =====================================================
+    # SELECTION
+    # =====================================================
+
+    def filters(self) -> dict:
+        """The selection, stored with the checkpoint (a changed selection starts over)"""
+        return {
+            "stage": self.stage,
+            "since": self.since.isoformat() if self.since else None,
+            "until": self.until.isoformat() if self.until else None,
+            "language": self.language,
+            "stale": self.stale,
+            "from_version": self.from_version,
+            "languages": self.languages if self.stage == "translation" else None,
+            "version": self.current_version()
+        }
+
+    def current_version(self) -> str:
+        if self.stage in ("soap", "urgency"):
+            from app.services.pipeline import pipeline
+            return pipeline.stages.by_name[self.stage].version
+        if self.stage == "markers":
+            from app.language_markers import THRESHOLDS_VERSION
+            return THRESHOLDS_VERSION
+        from app.services.localization import CACHE_VERSION
+        return CACHE_VERSION
+
+    def select_calls(self, after_id: int, limit: int) -> list:
+        """Next chunk of calls matching the date and language filters (detached)"""
+        with get_db() as db:
+            query = db.query(EmergencyCall).filter(
+                EmergencyCall.id > after_id,
+                EmergencyCall.transcript.isnot(None)
+            )
+            if self.since:
+                query = query.filter(EmergencyCall.created_at >= self.since)
+            if self.until:
+                query = query.filter(EmergencyCall.created_at < self.until)
+            if self.language:
+                if self.language == "en":
+                    query = query.filter(or_(EmergencyCall.language == "en", EmergencyCall.language.is_(None)))
+                else:
+                    query = query.filter(EmergencyCall.language == self.language)
+            calls = query.order_by(EmergencyCall.id).limit(limit).all()
+            for call in calls:
+                db.expunge(call)
+            return calls
+
+    def stored_versions(self, calls: list) -> dict:
+        """call_id -> version of the stored stage output (None if never run)"""
+        call_ids = [call.call_id for call in calls]
+        if self.stage in ("soap", "urgency"):
+            results = load_stage_results_many(call_ids)
+            return {
+                call_id: results.get(call_id, {}).get(self.stage, {}).get("version")
+                for call_id in call_ids
+            }
+        if self.stage == "markers":
+            from app.language_markers import analyzer
+            stored = analyzer.stored_results(call_ids)
+            return {call_id: stored.get(call_id, (None, None))[0] for call_id in call_ids}
+        return {}
+
+    def wanted(self, calls: list) -> list:
+        """Apply the stage version filters"""
+        if not (self.stale or self.from_version is not None) or self.stage == "translation":
+            return calls
+        versions = self.stored_versions(calls)
+        current = self.current_version()
+        return [
+            call for call in calls
+            if (not self.stale or versions.get(call.call_id) != current)
+            and (self.from_version is None or versions.get(call.call_id) == self.from_version)
+        ]
+
+    # =====================================================
+    # STAGES: compute (worker threads) / write (one transaction per chunk)
+    # =====================================================
+
+    def compute(self, call, context: dict):
+        """Run the stage for one call; returns (update to write, changes) or None"""
+        if self.stage in ("soap", "urgency"):
+            from app.services.pipeline import pipeline
+            columns, stage_results, report = pipeline.plan_rerun(
+                call, [self.stage], context["stage_results"].get(call.call_id)
+            )
+            changes = {
+                column: (getattr(call, column), value)
+                for column, value in columns.items() if getattr(call, column) != value
+            }
+            if not stage_results and not changes:
+                return None
+            return (call.call_id, columns, stage_results), changes
+
+        if self.stage == "markers":
+            from app.language_markers import analyzer
+            if len(call.transcript.strip()) < 5:
+                return None
+            # CPU-bound: cpu process pool (this thread just waits)
+            markers = submit("cpu", analyzer.analyze_transcript, call.call_id, call.transcript, False).result()
+            previous = context["markers"].get(call.call_id, (None, None))[1]
+            current = markers["overall_assessment"]["risk_level"]
+            return markers, ({"risk_level": (previous, current)} if previous != current else {})
+
+        from app.services.localization import get_translation, localize_call, PREFILL_PRIORITY
+        with get_db() as db:
+            missing = [
+                lang for lang in self.languages
+                if lang != (call.language or "en") and not get_translation(db, call, lang)
+            ]
+        if not missing:
+            return None
+        translated = [(lang, localize_call(call, lang, priority=PREFILL_PRIORITY)) for lang in missing]
+        return (call, translated), {f"translation_{lang}": (None, "new") for lang in missing}
+
+    def chunk_context(self, calls: list) -> dict:
+        """Per-chunk lookups shared by the workers (one query each)"""
+        call_ids = [call.call_id for call in calls]
+        if self.stage in ("soap", "urgency"):
+            return {"stage_results": load_stage_results_many(call_ids)}
+        if self.stage == "markers":
+            from app.language_markers import analyzer
+            return {"markers": analyzer.stored_results(call_ids)}
+        return {}
+
+    def write(self, updates: list) -> None:
+        if not updates:
+            return
+        if self.stage in ("soap", "urgency"):
+            update_call_stages(updates)
+        elif self.stage == "markers":
+            from app.language_markers import analyzer
+            analyzer.save_results(updates)
+        else:
+            from app.services.localization import save_translation
+            with get_db() as db:
+                for call, translated in updates:
+                    for lang, cached in translated:
+                        save_translation(db, call, lang, cached)
+
+    # =====================================================
+    # CHECKPOINT
+    # =====================================================
+
+    def load_checkpoint(self) -> int:
+        """Last processed call id (0 = start over)"""
+        if not self.resume or self.dry_run or not os.path.exists(self.checkpoint_path):
+            return 0
+        with open(self.checkpoint_path) as f:
+            state = json.load(f)
+        if state.get("filters") != self.filters():
+            print(f"⚠️ Checkpoint {self.checkpoint_path} is for another selection, starting over")
+            return 0
+        self.totals.update(state.get("totals", {}))
+        self.transitions.update(state.get("transitions", {}))
+        self.failed = state.get("failed", [])
+        print(f"↩️ Resuming after call #{state['last_id']} ({self.totals['processed']} calls done)")
+        return state["last_id"]
+
+    def save_checkpoint(self, last_id: int) -> None:
+        if self.dry_run:
+            return
+        os.makedirs(os.path.dirname(self.checkpoint_path) or ".", exist_ok=True)
+        tmp_path = self.checkpoint_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({
+                "filters": self.filters(),
+                "last_id": last_id,
+                "totals": dict(self.totals),
+                "transitions": dict(self.transitions),
+                "failed": self.failed,
+                "updated_at": datetime.utcnow().isoformat()
+            }, f, indent=2)
+        os.replace(tmp_path, self.checkpoint_path)  # never a half-written checkpoint
+
+    # =====================================================
+    # RUN
+    # =====================================================
+
+    def _report(self, report_file, call_id: str, changes: dict) -> None:
+        for column, (old, new) in changes.items():
+            if column in ("urgency_level", "risk_level"):
+                self.transitions[f"{old} -> {new}"] += 1
+            if self.dry_run:
+                print(f"  {call_id}: {column}: {_preview(old)!r} -> {_preview(new)!r}")
+        if report_file:
+            report_file.write(json.dumps({
+                "call_id": call_id,
+                "stage": self.stage,
+                "changes": {column: {"old": old, "new": new} for column, (old, new) in changes.items()}
+            }, ensure_ascii=False, default=str) + "\n")
+
+    def run(self) -> dict:
+        started = time.time()
+        last_id = self.load_checkpoint()
+        mode = "DRY RUN" if self.dry_run else "writing"
+        print(f"🔄 Backfill {self.stage} v{self.current_version()} ({mode}, {self.workers} workers)")
+
+        report_file = open(self.report_path, "a", encoding="utf-8") if self.report_path else None
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="backfill") as pool:
+                selected = 0
+                while self.limit is None or selected < self.limit:
+                    size = self.chunk_size if self.limit is None else min(self.chunk_size, self.limit - selected)
+                    calls = self.select_calls(last_id, size)
+                    if not calls:
+                        break
+                    selected += len(calls)
+
+                    todo = self.wanted(calls)
+                    self.totals["skipped"] += len(calls) - len(todo)
+                    context = self.chunk_context(todo)
+                    futures = [(call, pool.submit(self.compute, call, context)) for call in todo]
+
+                    updates = []
+                    for call, future in futures:
+                        try:
+                            outcome = future.result()
+                        except Exception as e:
+                            print(f"  ✗ {call.call_id}: {e}")
+                            self.failed.append(call.call_id)
+                            self.totals["failed"] += 1
+                            continue
+                        self.totals["processed"] += 1
+                        if outcome is None:
+                            continue
+                        update, changes = outcome
+                        updates.append(update)
+                        self.totals["changed" if changes else "unchanged"] += 1
+                        if changes:
+                            self._report(report_file, call.call_id, changes)
+
+                    if not self.dry_run:
+                        self.write(updates)
+                    last_id = calls[-1].id
+                    self.save_checkpoint(last_id)
+                    print(f"  ✓ Chunk up to call #{last_id}: {len(todo)} run, "
+                          f"{self.totals['changed']} changed so far ({time.time() - started:.0f}s)")
+        finally:
+            if report_file:
+                report_file.close()
+
+        totals = dict(self.totals)
+        totals.update(last_id=last_id, failed_calls=self.failed, transitions=dict(self.transitions),
+                      seconds=round(time.time() - started, 1))
+        return totals
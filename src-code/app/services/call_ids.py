@@ -0,0 +1,70 @@
+"""
+Call ID Generator
+Collision-free, time-sortable call IDs: CALL_19Oct_14h05_33_01JAB2...
+
+The readable prefix is kept for the dashboard; uniqueness comes from a ULID
+suffix (48-bit millisecond timestamp + 80 random bits, Crockford base32).
+Within a process IDs are strictly monotonic (same millisecond -> random part
+incremented); across worker processes the 80 random bits make collisions
+practically impossible, so no coordination is needed.
+"""
+import os
+import time
+import threading
+from datetime import datetime
+
+CROCKFORD_BASE32 = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+ULID_LENGTH = 26
+
+_lock = threading.Lock()
+_last_ms = -1
+_last_random = 0
+
+
+def _reset_state():
+    """Forked workers must not continue the parent's random sequence"""
+    global _last_ms, _last_random
+    _last_ms = -1
+    _last_random = 0
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_state)
+
+
+def _encode(value: int, length: int) -> str:
+    chars = []
+    for _ in range(length):
+        value, rem = divmod(value, 32)
+        chars.append(CROCKFORD_BASE32[rem])
+    return "".join(reversed(chars))
+
+
+def new_ulid(timestamp_ms: int = None) -> str:
+    """Generate a 26-character ULID, monotonic within this process"""
+    global _last_ms, _last_random
+
+    with _lock:
+        now_ms = int(time.time() * 1000) if timestamp_ms is None else timestamp_ms
+        if now_ms <= _last_ms:
+            # Same (or earlier - clock went back) millisecond: keep ordering
+            now_ms = _last_ms
+            _last_random += 1
+            if _last_random >= 1 << 80:
+                # Random part exhausted: borrow the next millisecond
+                now_ms += 1
+                _last_random = int.from_bytes(os.urandom(10), "big")
+        else:
+            _last_random = int.from_bytes(os.urandom(10), "big")
+        _last_ms = now_ms
+
+        return _encode(now_ms, 10) + _encode(_last_random, 16)
+
+
+def new_call_id(prefix: str = "CALL", when: datetime = None) -> str:
+    """
+    Generate a call ID with a human-readable prefix, e.g.
+    TEXT_19Oct_14h05_33_01JAB2W3X4Y5Z6... (46 chars, fits call_id String(50))
+    """
+    when = when or datetime.now()
+    return f"{prefix}_{when.strftime('%d%b_%Hh%M_%S')}_{new_ulid()}"
@@ -2,11 +2,15 @@
 Real-Time Emergency Call System
 Database Service with Urgency Support - FIXED WITH EXPUNGE
 """
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, func, inspect, text
 from sqlalchemy.orm import sessionmaker
 from contextlib import contextmanager
 from datetime import datetime
+import hashlib
 from app.models.call import Base, EmergencyCall
+from app.models import outbox, translation, live_session, stage_result  # noqa: F401 - registers their tables on Base
+from app.services.response_cache import response_cache
+from app.services.events import event_bus
 
 DATABASE_URL = "sqlite:///./data/emergency_calls.db"
 
@@ -22,9 +26,110 @@ engine = create_engine(
 SessionLocal = sessionmaker(bind=engine) # SessionLocal is a class that will be used to create database sessions in the context manager because 
 
 
+@event.listens_for(SessionLocal, "after_commit")
+def _publish_pending_events(session):
+    for args, data in session.info.pop("pending_events", []):
+        event_bus.publish(*args, **data)
+
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _drop_pending_events(session):
+    session.info.pop("pending_events", None)
+
+
+def publish_after_commit(db, event_type: str, call_id: str, **data) -> None:
+    """Publish a call event once the session's transaction has committed"""
+    db.info.setdefault("pending_events", []).append(((event_type, call_id), data))
+
+
+def ensure_schema(target_engine, metadata):
+    """
+    Create missing tables, columns and indexes.
+    create_all() only creates new tables, so columns and indexes added to
+    existing models are migrated here (SQLite ALTER TABLE ADD COLUMN).
+    """
+    metadata.create_all(bind=target_engine)
+    
+    inspector = inspect(target_engine)
+    with target_engine.begin() as conn:
+        for table in metadata.sorted_tables:
+            existing = {c['name'] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing:
+                    col_type = column.type.compile(dialect=target_engine.dialect)
+                    conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {col_type}"))
+                    print(f"✓ Added column {table.name}.{column.name}")
+    
+    for table in metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=target_engine, checkfirst=True)
+
+
+# Content a translation is derived from (see call_translations.source_hash)
+SOURCE_HASH_FIELDS = (
+    "language", "transcript", "patient_name", "doctor_name", "disease",
+    "soap_subjective", "soap_objective", "soap_assessment", "soap_plan", "urgency_reasoning"
+)
+
+
+def compute_source_hash(call) -> str:
+    """Stable hash of the translatable content of a call"""
+    digest = hashlib.sha256()
+    for field in SOURCE_HASH_FIELDS:
+        digest.update((getattr(call, field, None) or "").encode("utf-8"))
+        digest.update(b"\x1f")
+    return digest.hexdigest()
+
+
+@event.listens_for(EmergencyCall, "before_insert")
+@event.listens_for(EmergencyCall, "before_update")
+def _refresh_source_hash(mapper, connection, target):
+    target.source_hash = compute_source_hash(target)
+
+
+@event.listens_for(EmergencyCall, "before_update")
+def _bump_version(mapper, connection, target):
+    target.version = (target.version or 0) + 1
+    target.updated_at = datetime.utcnow()
+
+
+def touch_call(db, call_id: str) -> None:
+    """Bump a call's row version without loading it (e.g. new translation)"""
+    db.query(EmergencyCall).filter(EmergencyCall.call_id == call_id).update({
+        EmergencyCall.version: func.coalesce(EmergencyCall.version, 0) + 1,
+        EmergencyCall.updated_at: datetime.utcnow()
+    }, synchronize_session=False)
+    response_cache.invalidate(call_id)
+
+
+def _backfill_source_hashes(batch_size: int = 500) -> None:
+    """Hash calls created before source_hash existed"""
+    columns = [EmergencyCall.id] + [getattr(EmergencyCall, f) for f in SOURCE_HASH_FIELDS]
+    with get_db() as db:
+        rows = db.query(*columns).filter(EmergencyCall.source_hash.is_(None)).all()
+        for start in range(0, len(rows), batch_size):
+            db.bulk_update_mappings(EmergencyCall, [
+                {"id": row.id, "source_hash": compute_source_hash(row)}
+                for row in rows[start:start + batch_size]
+            ])
+    if rows:
+        print(f"✓ Hashed {len(rows)} existing calls")
+
+
+def _backfill_row_versions() -> None:
+    """Give calls created before version/updated_at existed a starting value"""
+    with get_db() as db:
+        db.query(EmergencyCall).filter(EmergencyCall.updated_at.is_(None)).update({
+            EmergencyCall.version: func.coalesce(EmergencyCall.version, 0),
+            EmergencyCall.updated_at: func.coalesce(EmergencyCall.processed_at, EmergencyCall.created_at)
+        }, synchronize_session=False)
+
+
 def init_db():
     """Create all database tables"""
-    Base.metadata.create_all(bind=engine) 
+    ensure_schema(engine, Base.metadata)
+    _backfill_source_hashes()
+    _backfill_row_versions()
     print("✓ Database tables created")
 
 
@@ -44,7 +149,7 @@ def get_db():
 
 def save_call(call_id: str, audio_path: str, transcript: str, duration: float, 
               patient_name: str = None, patient_id: str = None, doctor_name: str = None, disease: str = None,
-              language: str = "en") -> EmergencyCall:
+              language: str = "en", content_hash: str = None, idempotency_key: str = None) -> EmergencyCall:
     """Save an emergency call to database"""
     with get_db() as db:
         call = EmergencyCall(
@@ -56,16 +161,20 @@ def save_call(call_id: str, audio_path: str, transcript: str, duration: float,
             patient_id=patient_id,
             doctor_name=doctor_name,
             disease=disease,
-            language=language
+            language=language,
+            content_hash=content_hash,
+            idempotency_key=idempotency_key
         )
         db.add(call)
         db.flush()
         db.refresh(call)
+        publish_after_commit(db, "call.created", call_id, language=language)
         
         # Detach object from session before returning
         db.expunge(call)
-        
-        return call
+    
+    response_cache.invalidate(call_id)  # cached lists
+    return call
 
 
 def update_soap(call_id: str, subjective: str, objective: str, 
@@ -82,17 +191,25 @@ def update_soap(call_id: str, subjective: str, objective: str,
             call.soap_assessment = assessment
             call.soap_plan = plan
             call.processed_at = datetime.utcnow()
+            publish_after_commit(db, "call.soap_ready", call_id, urgency_level=call.urgency_level)
             db.flush()
             db.refresh(call)
             
             # Detach object from session before returning
             db.expunge(call)
-        
-        return call
+    
+    response_cache.invalidate(call_id)
+    return call
+
 
+def update_urgency(call_id: str, level: str, score: float, reasoning: str,
+                   enqueue_side_effects: bool = True) -> EmergencyCall:
+    """
+    Update urgency classification for a call (the last processing step).
+    Post-call side effects are queued in the same transaction (outbox).
+    """
+    from app.services.outbox import enqueue_post_call_tasks
 
-def update_urgency(call_id: str, level: str, score: float, reasoning: str) -> EmergencyCall:
-    """Update urgency classification for a call"""
     with get_db() as db:
         call = db.query(EmergencyCall).filter(
             EmergencyCall.call_id == call_id
@@ -102,13 +219,111 @@ def update_urgency(call_id: str, level: str, score: float, reasoning: str) -> Em
             call.urgency_level = level
             call.urgency_score = score
             call.urgency_reasoning = reasoning
+            if enqueue_side_effects:
+                enqueue_post_call_tasks(db, call_id)
+            publish_after_commit(db, "call.urgency_ready", call_id, urgency_level=level, urgency_score=score)
             db.flush()
             db.refresh(call)
             
             # Detach object from session before returning
             db.expunge(call)
-        
-        return call
+    
+    response_cache.invalidate(call_id)
+    return call
+
+
+# Keys of a save_completed_calls record that are not EmergencyCall columns
+RECORD_EXTRAS = ("stage_results", "language_markers")
+
+
+def save_completed_calls(records: list) -> list:
+    """
+    Insert fully processed calls (transcript, SOAP and urgency set) in one
+    transaction together with their post-call outbox tasks.
+    records are dicts of EmergencyCall column values, optionally with the
+    call's "stage_results" (see stages.py) and "language_markers" (an
+    analysis made by the pipeline: no language_markers outbox task then);
+    returns detached calls.
+    """
+    from app.services.outbox import enqueue_post_call_tasks, POST_CALL_TASKS
+    from app.services.stages import save_stage_results
+
+    now = datetime.utcnow()
+    with get_db() as db:
+        calls = []
+        for record in records:
+            columns = {k: v for k, v in record.items() if k not in RECORD_EXTRAS}
+            calls.append(EmergencyCall(processed_at=now, **columns))
+        db.add_all(calls)
+        db.flush()
+        for call, record in zip(calls, records):
+            save_stage_results(db, call.call_id, record.get("stage_results"))
+            kinds = POST_CALL_TASKS
+            if record.get("language_markers"):
+                from app.language_markers import MARKER_UPSERT_SQL, marker_row
+                db.execute(text(MARKER_UPSERT_SQL), marker_row({**record["language_markers"], "call_id": call.call_id}))
+                kinds = tuple(kind for kind in POST_CALL_TASKS if kind != "language_markers")
+            enqueue_post_call_tasks(db, call.call_id, kinds=kinds, new_call=True)
+            publish_after_commit(db, "call.created", call.call_id, language=call.language)
+            publish_after_commit(db, "call.urgency_ready", call.call_id,
+                                 urgency_level=call.urgency_level, urgency_score=call.urgency_score)
+        db.flush()
+        # Defaults and ids are populated by the flush; no per-row refresh needed
+        for call in calls:
+            db.expunge(call)
+    
+    for call in calls:
+        response_cache.invalidate(call.call_id)
+    return calls
+
+
+SOAP_COLUMNS = ("soap_subjective", "soap_objective", "soap_assessment", "soap_plan")
+URGENCY_COLUMNS = ("urgency_level", "urgency_score", "urgency_reasoning")
+
+
+def update_call_stages(updates: list) -> int:
+    """
+    Write the outputs of re-run stages (see pipeline.rerun_stages) and their
+    stage results. updates are (call_id, columns, stage_results) tuples, all
+    written in one transaction. Post-call side effects are not queued again;
+    translations go stale through the source hash.
+    Returns the number of calls whose columns changed.
+    """
+    from app.services.stages import save_stage_results
+
+    updates = list(updates)
+    if not updates:
+        return 0
+
+    now = datetime.utcnow()
+    changed_calls = 0
+    with get_db() as db:
+        calls = {
+            call.call_id: call
+            for call in db.query(EmergencyCall).filter(
+                EmergencyCall.call_id.in_([call_id for call_id, _, _ in updates])
+            )
+        }
+        for call_id, columns, stage_results in updates:
+            call = calls.get(call_id)
+            if call is None:
+                continue
+            changed = {k for k, v in columns.items() if getattr(call, k) != v}
+            for k in changed:
+                setattr(call, k, columns[k])
+            save_stage_results(db, call_id, stage_results)
+            if changed:
+                call.processed_at = now
+                changed_calls += 1
+            if changed & set(SOAP_COLUMNS):
+                publish_after_commit(db, "call.soap_ready", call_id, urgency_level=call.urgency_level)
+            if changed & set(URGENCY_COLUMNS):
+                publish_after_commit(db, "call.urgency_ready", call_id,
+                                     urgency_level=call.urgency_level, urgency_score=call.urgency_score)
+    
+    for call_id, _, _ in updates:
+        response_cache.invalidate(call_id)
+    return changed_calls
 
 
 def get_call(call_id: str) -> EmergencyCall:
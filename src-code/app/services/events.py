@@ -0,0 +1,97 @@
+"""
+Call Event Bus
+In-process pub/sub behind the /api/events server-sent event stream
+
+Events are published by the database layer after each processing step is
+committed, from any thread:
+  call.created        call saved (transcript available)
+  call.soap_ready     SOAP notes written
+  call.urgency_ready  urgency classified (call complete)
+  call.translated     translation stored for a language
+
+Subscribers live on the event loop and each get a bounded queue; a slow
+client loses its oldest events instead of blocking publishers.
+"""
+import json
+import asyncio
+import itertools
+import threading
+from datetime import datetime
+
+EVENT_TYPES = ("call.created", "call.soap_ready", "call.urgency_ready", "call.translated")
+
+# MINIMAL is the 5th ESI level, shown as LOW in the UI
+URGENCY_RANK = {"MINIMAL": 0, "LOW": 1, "MEDIUM": 2, "HIGH": 3, "CRITICAL": 4}
+
+
+class Subscription:
+    """One SSE client: queue plus its filters"""
+
+    def __init__(self, loop, types=None, min_urgency: str = None, max_queue: int = 100):
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=max_queue)
+        self.types = set(types) if types else None
+        if min_urgency and min_urgency.upper() not in URGENCY_RANK:
+            raise ValueError(f"Unknown urgency level: {min_urgency}")
+        self.min_rank = URGENCY_RANK.get((min_urgency or "").upper())
+
+    def accepts(self, event: dict) -> bool:
+        if self.types and event["type"] not in self.types:
+            return False
+        if self.min_rank is not None:
+            # Urgency filter: events of calls not classified yet are skipped
+            rank = URGENCY_RANK.get(event["data"].get("urgency_level") or "")
+            return rank is not None and rank >= self.min_rank
+        return True
+
+    def offer(self, event: dict) -> None:
+        """Runs on the event loop"""
+        if self.queue.full():
+            self.queue.get_nowait()
+        self.queue.put_nowait(event)
+
+
+class EventBus:
+    """Thread-safe publisher, asyncio subscribers"""
+
+    def __init__(self):
+        self.subscribers = set()
+        self.lock = threading.Lock()
+        self.ids = itertools.count(1)
+
+    def subscribe(self, types=None, min_urgency: str = None) -> Subscription:
+        """Call from the event loop (e.g. in an async endpoint)"""
+        subscription = Subscription(asyncio.get_running_loop(), types, min_urgency)
+        with self.lock:
+            self.subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self.lock:
+            self.subscribers.discard(subscription)
+
+    def publish(self, event_type: str, call_id: str, **data) -> None:
+        """Publish from any thread; never raises into the caller"""
+        event = {
+            "id": next(self.ids),
+            "type": event_type,
+            "data": {"call_id": call_id, "timestamp": datetime.utcnow().isoformat(), **data}
+        }
+        with self.lock:
+            subscribers = list(self.subscribers)
+        for subscription in subscribers:
+            if not subscription.accepts(event):
+                continue
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.offer, event)
+            except RuntimeError:
+                # Loop closed (server shutting down)
+                self.unsubscribe(subscription)
+
+
+def format_sse(event: dict) -> str:
+    """Encode an event in text/event-stream format"""
+    return f"id: {event['id']}\nevent: {event['type']}\ndata: {json.dumps(event['data'], ensure_ascii=False)}\n\n"
+
+
+event_bus = EventBus()
@@ -0,0 +1,169 @@
+"""
+Executors
+One bounded pool per workload class, so blocking work never runs on the
+event loop and one kind of work cannot starve the others:
+
+  asr  Whisper transcription of uploads (threads; one shared model, which
+       decodes one file at a time, so keep this at 1 worker)
+  live_asr  ffmpeg and Whisper for live call chunks (threads; its own
+       model, so uploads queued in asr never delay a live call)
+  llm  request orchestration that waits on OpenAI calls (threads; mostly
+       idle in network I/O; the calls themselves are ordered by the
+       priority work queue)
+  db   SQLite queries and file I/O (threads)
+  stage  pipeline stages of one call running side by side (threads; a
+       stage waits on the work queue, the asr or the cpu pool, never on
+       its own pool, so calls in the llm pool cannot deadlock on it)
+  cpu  pure-Python CPU work: language markers, text matching, quality
+       metrics (processes, so the GIL does not stall the event loop).
+       Functions and arguments must be picklable (module-level functions
+       or methods of module-level singletons).
+
+Async code uses `await run_in("db", func, *args)`; threads use
+`submit(...).result()`. LoopLagMonitor measures how late the event loop
+wakes up and warns when something blocks it.
+"""
+import os
+import time
+import asyncio
+import functools
+import threading
+import multiprocessing
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+POOL_SIZES = {
+    "asr": int(os.getenv("EXECUTOR_ASR_WORKERS", "1")),
+    "live_asr": int(os.getenv("EXECUTOR_LIVE_ASR_WORKERS", "1")),
+    "llm": int(os.getenv("EXECUTOR_LLM_WORKERS", "16")),
+    "db": int(os.getenv("EXECUTOR_DB_WORKERS", "4")),
+    "stage": int(os.getenv("EXECUTOR_STAGE_WORKERS", "32")),
+    "cpu": int(os.getenv("EXECUTOR_CPU_WORKERS", str(min(2, os.cpu_count() or 1)))),
+}
+PROCESS_POOLS = ("cpu",)
+
+LOOP_LAG_WARN_MS = float(os.getenv("LOOP_LAG_WARN_MS", "100"))
+
+
+class Pools:
+    """Lazily created executors with in-flight counters"""
+
+    def __init__(self, sizes: dict, process_pools=()):
+        self.sizes = sizes
+        self.process_pools = set(process_pools)
+        self.executors = {}
+        self.pending = {name: 0 for name in sizes}
+        self.completed = {name: 0 for name in sizes}
+        self.lock = threading.Lock()
+
+    def _executor(self, pool: str):
+        if pool not in self.sizes:
+            raise ValueError(f"Unknown executor pool '{pool}' (expected one of {', '.join(self.sizes)})")
+        with self.lock:
+            executor = self.executors.get(pool)
+            if executor is None:
+                if pool in self.process_pools:
+                    # spawn: forking a process that runs threads can deadlock
+                    executor = ProcessPoolExecutor(max_workers=self.sizes[pool],
+                                                   mp_context=multiprocessing.get_context("spawn"))
+                else:
+                    executor = ThreadPoolExecutor(max_workers=self.sizes[pool], thread_name_prefix=f"{pool}-pool")
+                self.executors[pool] = executor
+            return executor
+
+    def submit(self, pool: str, func, *args, **kwargs):
+        """Run func(*args, **kwargs) in a pool; returns a concurrent.futures.Future"""
+        future = self._executor(pool).submit(func, *args, **kwargs)
+        with self.lock:
+            self.pending[pool] += 1
+        future.add_done_callback(functools.partial(self._done, pool))
+        return future
+
+    def _done(self, pool: str, future) -> None:
+        with self.lock:
+            self.pending[pool] -= 1
+            self.completed[pool] += 1
+
+    async def run_in(self, pool: str, func, *args, **kwargs):
+        """Await func(*args, **kwargs) running in a pool"""
+        return await asyncio.wrap_future(self.submit(pool, func, *args, **kwargs))
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                name: {
+                    "workers": size,
+                    "kind": "process" if name in self.process_pools else "thread",
+                    "in_flight": self.pending[name],
+                    "completed": self.completed[name]
+                }
+                for name, size in self.sizes.items()
+            }
+
+    def shutdown(self) -> None:
+        with self.lock:
+            executors, self.executors = self.executors, {}
+        for executor in executors.values():
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+class LoopLagMonitor:
+    """
+    Sleeps for `interval` in a loop and records how much later than
+    requested it wakes up. Lag means a callback blocked the event loop
+    (and with it every WebSocket and SSE stream).
+    """
+
+    def __init__(self, interval: float = 0.25, warn_ms: float = LOOP_LAG_WARN_MS, window: int = 240):
+        self.interval = interval
+        self.warn_ms = warn_ms
+        self.samples = deque(maxlen=window)  # last minute at the default interval
+        self.max_ms = 0.0
+        self.slow_ticks = 0
+        self._task = None
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.record((time.perf_counter() - started - self.interval) * 1000)
+
+    def record(self, lag_ms: float) -> None:
+        lag_ms = max(0.0, lag_ms)
+        self.samples.append(lag_ms)
+        self.max_ms = max(self.max_ms, lag_ms)
+        if lag_ms >= self.warn_ms:
+            self.slow_ticks += 1
+            print(f"⚠️ Event loop blocked for {lag_ms:.0f} ms (blocking call in an async endpoint?)")
+
+    def stats(self) -> dict:
+        samples = sorted(self.samples)
+        p95 = samples[int(0.95 * (len(samples) - 1))] if samples else 0.0
+        return {
+            "lag_ms_last": round(self.samples[-1], 1) if self.samples else 0.0,
+            "lag_ms_p95": round(p95, 1),
+            "lag_ms_max": round(self.max_ms, 1),
+            "slow_ticks": self.slow_ticks,
+            "warn_threshold_ms": self.warn_ms,
+            "healthy": p95 < self.warn_ms
+        }
+
+
+pools = Pools(POOL_SIZES, PROCESS_POOLS)
+submit = pools.submit
+run_in = pools.run_in
+
+loop_monitor = LoopLagMonitor()
@@ -0,0 +1,169 @@
+"""
+Idempotent Ingestion
+Stops retries (flaky clients, double clicks, retry storms) from processing
+the same call twice and spending Whisper + two LLM calls on it again.
+
+- Idempotency-Key header: a repeated key returns the call created by the
+  first request (for IDEMPOTENCY_KEY_TTL_HOURS). Reusing a key for a
+  different payload is rejected.
+- Content hash: the same audio bytes / transcript (with the same language
+  and metadata) submitted again within IDEMPOTENCY_WINDOW_SECONDS returns
+  the existing call as well.
+- In flight: a duplicate arriving while the first request is still being
+  processed waits for its result instead of starting a second run.
+
+Both values are stored on the call (content_hash, idempotency_key), so the
+checks also work across API processes once the first call is saved.
+"""
+import os
+import asyncio
+import hashlib
+from datetime import datetime, timedelta
+from fastapi import HTTPException
+from sqlalchemy import or_
+from app.services.database import get_db
+from app.models.call import EmergencyCall
+
+IDEMPOTENCY_WINDOW_SECONDS = int(os.getenv("IDEMPOTENCY_WINDOW_SECONDS", "600"))
+IDEMPOTENCY_KEY_TTL_HOURS = int(os.getenv("IDEMPOTENCY_KEY_TTL_HOURS", "24"))
+MAX_KEY_LENGTH = 128
+# An unfinished call older than this was abandoned (crashed worker): process again
+STALE_PROCESSING_SECONDS = 300
+
+
+def _params_digest(digest, params: dict) -> None:
+    for name in sorted(params):
+        digest.update(f"\x1e{name}={params[name] or ''}".encode("utf-8"))
+
+
+def transcript_hash(text: str, **params) -> str:
+    """Hash of a transcript (whitespace-normalized) plus request parameters"""
+    digest = hashlib.sha256(b"text\x1f")
+    digest.update(" ".join(text.split()).encode("utf-8"))
+    _params_digest(digest, params)
+    return digest.hexdigest()
+
+
+def audio_hash(fileobj, chunk_size: int = 1024 * 1024, **params) -> str:
+    """Hash of an uploaded audio file plus request parameters; rewinds the file"""
+    digest = hashlib.sha256(b"audio\x1f")
+    for chunk in iter(lambda: fileobj.read(chunk_size), b""):
+        digest.update(chunk)
+    fileobj.seek(0)
+    _params_digest(digest, params)
+    return digest.hexdigest()
+
+
+def normalize_key(key: str):
+    """Validated Idempotency-Key header value (None if not sent)"""
+    if key is None:
+        return None
+    key = key.strip()
+    if not key or len(key) > MAX_KEY_LENGTH:
+        raise HTTPException(status_code=400,
+                            detail=f"Idempotency-Key must be 1-{MAX_KEY_LENGTH} characters")
+    return key
+
+
+def find_existing(content_hash: str, idempotency_key: str = None):
+    """
+    Call created by an earlier submission of the same request, or None.
+    Raises 422 if the key was used for a different payload and 409 if the
+    earlier call (from another process) is still being processed.
+    """
+    now = datetime.utcnow()
+    conditions = [(EmergencyCall.content_hash == content_hash) &
+                  (EmergencyCall.created_at >= now - timedelta(seconds=IDEMPOTENCY_WINDOW_SECONDS))]
+    if idempotency_key:
+        conditions.append((EmergencyCall.idempotency_key == idempotency_key) &
+                          (EmergencyCall.created_at >= now - timedelta(hours=IDEMPOTENCY_KEY_TTL_HOURS)))
+
+    with get_db() as db:
+        matches = db.query(EmergencyCall).filter(or_(*conditions)).order_by(EmergencyCall.created_at).all()
+        for call in matches:
+            db.expunge(call)
+
+    if not matches:
+        return None
+    # The key decides when both match different calls
+    call = next((c for c in matches if idempotency_key and c.idempotency_key == idempotency_key), matches[0])
+    if idempotency_key and call.idempotency_key == idempotency_key and call.content_hash != content_hash:
+        raise HTTPException(status_code=422,
+                            detail="Idempotency-Key was already used for a different request")
+    if call.urgency_level is None:
+        if call.created_at < now - timedelta(seconds=STALE_PROCESSING_SECONDS):
+            return None
+        raise HTTPException(status_code=409, detail=f"Call {call.call_id} is still being processed",
+                            headers={"Retry-After": "5"})
+    return call
+
+
+def release(content_hash: str) -> None:
+    """Forget a failed, unfinished call's hash/key so a retry is processed again"""
+    with get_db() as db:
+        db.query(EmergencyCall).filter(
+            EmergencyCall.content_hash == content_hash,
+            EmergencyCall.urgency_level.is_(None)
+        ).update({EmergencyCall.content_hash: None, EmergencyCall.idempotency_key: None},
+                 synchronize_session=False)
+
+
+def find_existing_many(content_hashes: list, window_seconds: int = IDEMPOTENCY_WINDOW_SECONDS) -> dict:
+    """
+    content_hash -> completed call within the window (batch submissions;
+    window_seconds=None: any age, e.g. archive ingestion)
+    """
+    with get_db() as db:
+        query = db.query(EmergencyCall).filter(
+            EmergencyCall.content_hash.in_(set(content_hashes)),
+            EmergencyCall.urgency_level.isnot(None)
+        )
+        if window_seconds is not None:
+            query = query.filter(EmergencyCall.created_at >= datetime.utcnow() - timedelta(seconds=window_seconds))
+        calls = query.order_by(EmergencyCall.created_at.desc()).all()
+        for call in calls:
+            db.expunge(call)
+    return {call.content_hash: call for call in calls}
+
+
+class InFlightRequests:
+    """Duplicates of a request that is still running wait for its result (event loop only)"""
+
+    def __init__(self):
+        self.running = {}  # "hash:..." / "key:..." -> (future, content_hash)
+
+    async def run_once(self, content_hash: str, idempotency_key: str, run):
+        """
+        await run() unless the same request is already running; then share
+        its result (a dict, returned flagged as deduplicated)
+        """
+        keys = [f"hash:{content_hash}"] + ([f"key:{idempotency_key}"] if idempotency_key else [])
+        for key in keys:
+            if key in self.running:
+                future, running_hash = self.running[key]
+                if running_hash != content_hash:
+                    raise HTTPException(status_code=422,
+                                        detail="Idempotency-Key is in use by a different request")
+                result = await asyncio.shield(future)
+                return {**result, "deduplicated": True}
+
+        future = asyncio.get_running_loop().create_future()
+        for key in keys:
+            self.running[key] = (future, content_hash)
+        try:
+            result = await run()
+            future.set_result(result)
+            return result
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # retrieved: no warning when nobody was waiting
+            raise
+        finally:
+            for key in keys:
+                self.running.pop(key, None)
+
+
+in_flight = InFlightRequests()
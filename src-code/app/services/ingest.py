@@ -0,0 +1,265 @@
+"""
+Bulk Audio Ingestion
+Loads a directory of recorded calls (wav/mp3/m4a/flac/ogg) through the
+pipeline using every core (scripts/ingest_audio.py).
+
+- Files are hashed like uploads (idempotency.audio_hash), so recordings
+  already in the database - ingested or uploaded - and duplicates within
+  the archive are skipped.
+- Whisper runs in INGEST_WORKERS processes (spawn), each with its own model
+  and INGEST_WHISPER_THREADS torch threads; by default workers x threads =
+  all cores.
+- The remaining stages (SOAP, urgency, language markers, ...) of a
+  transcribed file start right away on a thread pool, while the processes
+  transcribe the next files. The transcribe stage result is recorded like
+  a graph run.
+- Calls are saved INGEST_BATCH_SIZE at a time (save_completed_calls, one
+  transaction); the manifest (JSONL) gets a line per file after its batch
+  is committed, so a rerun skips finished files without hashing them again.
+"""
+import os
+import json
+import time
+import queue
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from collections import Counter
+
+AUDIO_EXTENSIONS = (".wav", ".mp3", ".m4a", ".flac", ".ogg")
+
+INGEST_WHISPER_THREADS = int(os.getenv("INGEST_WHISPER_THREADS", "2"))
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", str(max(1, (os.cpu_count() or 1) // INGEST_WHISPER_THREADS))))
+INGEST_LLM_WORKERS = int(os.getenv("INGEST_LLM_WORKERS", "8"))
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "20"))
+INGEST_FLUSH_SECONDS = float(os.getenv("INGEST_FLUSH_SECONDS", "10"))
+
+# Whisper model of this worker process (see _init_worker)
+_worker_service = None
+
+
+def _init_worker(model_name: str, threads: int) -> None:
+    """Process pool initializer: tune torch threads and load one model per process"""
+    global _worker_service
+    import torch
+    from app.services.transcription import TranscriptionService
+
+    torch.set_num_threads(threads)
+    _worker_service = TranscriptionService(model_name=model_name)
+    _worker_service.load()
+
+
+def _transcribe_file(path: str, language: str) -> dict:
+    started = time.perf_counter()
+    transcription = _worker_service.transcribe(path, language=language)
+    transcription["duration_ms"] = (time.perf_counter() - started) * 1000
+    return transcription
+
+
+def find_audio_files(directory: str) -> list:
+    """Audio files below a directory, in a stable order"""
+    found = []
+    for root, dirs, files in os.walk(directory):
+        dirs.sort()
+        for name in sorted(files):
+            if name.lower().endswith(AUDIO_EXTENSIONS):
+                found.append(os.path.join(root, name))
+    return found
+
+
+class Manifest:
+    """Append-only JSONL record of finished files: path -> {size, mtime, hash, status, call_id}"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.entries = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if line:
+                        entry = json.loads(line)
+                        self.entries[entry["path"]] = entry
+
+    def is_done(self, path: str) -> bool:
+        """Finished in an earlier run and unchanged since (failed files are retried)"""
+        entry = self.entries.get(path)
+        if not entry or entry["status"] == "failed":
+            return False
+        stat = os.stat(path)
+        return entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime
+
+    def append(self, entries: list) -> None:
+        if not entries:
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            for entry in entries:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+                self.entries[entry["path"]] = entry
+            f.flush()
+            os.fsync(f.fileno())
+
+
+class AudioIngest:
+    """One ingestion run: AudioIngest("archive/", language="en").run()"""
+
+    def __init__(self, directory: str, language: str = "en", manifest_path: str = None,
+                 workers: int = INGEST_WORKERS, whisper_threads: int = INGEST_WHISPER_THREADS,
+                 llm_workers: int = INGEST_LLM_WORKERS, batch_size: int = INGEST_BATCH_SIZE,
+                 model_name: str = "base", limit: int = None):
+        self.directory = directory
+        self.language = language
+        self.manifest = Manifest(manifest_path or os.path.join(directory, ".ingest_manifest.jsonl"))
+        self.workers = workers
+        self.whisper_threads = whisper_threads
+        self.llm_workers = llm_workers
+        self.batch_size = batch_size
+        self.model_name = model_name
+        self.limit = limit
+        self.totals = Counter()
+
+    def _entry(self, item: dict, status: str, call_id: str = None, error: str = None) -> dict:
+        entry = {"path": item["path"], "size": item["size"], "mtime": item["mtime"],
+                 "hash": item.get("hash"), "status": status, "call_id": call_id}
+        if error:
+            entry["error"] = error
+        return entry
+
+    def _hash(self, path: str) -> dict:
+        from app.services import idempotency
+
+        stat = os.stat(path)
+        with open(path, "rb") as f:
+            digest = idempotency.audio_hash(f, language=self.language)
+        return {"path": path, "size": stat.st_size, "mtime": stat.st_mtime, "hash": digest}
+
+    def plan(self) -> list:
+        """Files to transcribe: not in the manifest, not in the database, first of their hash"""
+        from app.services import idempotency
+
+        paths = find_audio_files(self.directory)
+        self.totals["found"] = len(paths)
+        todo = [path for path in paths if not self.manifest.is_done(path)]
+        self.totals["already_ingested"] = len(paths) - len(todo)
+
+        # Hashing is I/O bound (hashlib releases the GIL)
+        with ThreadPoolExecutor(max_workers=self.llm_workers) as pool:
+            items = list(pool.map(self._hash, todo))
+
+        existing = idempotency.find_existing_many([item["hash"] for item in items], window_seconds=None)
+        planned, seen, duplicates = [], set(), []
+        for item in items:
+            call = existing.get(item["hash"])
+            if call is not None or item["hash"] in seen:
+                duplicates.append(self._entry(item, "duplicate", call.call_id if call is not None else None))
+                continue
+            seen.add(item["hash"])
+            planned.append(item)
+        self.manifest.append(duplicates)
+        self.totals["duplicates"] = len(duplicates)
+
+        if self.limit is not None:
+            planned = planned[:self.limit]
+        return planned
+
+    def _analyze(self, item: dict, transcription: dict) -> dict:
+        """Stages after transcription (thread pool); returns the call record"""
+        from app.services.pipeline import pipeline, stage_columns
+        from app.services.call_ids import new_call_id
+
+        context = {"audio_path": item["path"], "language": self.language}
+        transcribe = pipeline.stages.result("transcribe", context, {
+            "transcript": transcription["text"], "duration": transcription["duration"]
+        }, transcription["duration_ms"])
+        context.update(transcribe["output"])
+
+        context, stage_results, _ = pipeline.run_stages(context)
+        return {
+            'call_id': new_call_id("CALL"),
+            'audio_path': item["path"],
+            'language': self.language,
+            **stage_columns(context),
+            'content_hash': item["hash"],
+            'stage_results': [transcribe] + stage_results,
+            'language_markers': context.get('markers')
+        }
+
+    def _flush(self, batch: list) -> None:
+        from app.services.database import save_completed_calls
+
+        if not batch:
+            return
+        try:
+            save_completed_calls([record for _, record in batch])
+            entries = [self._entry(item, "done", record["call_id"]) for item, record in batch]
+            self.totals["saved"] += len(batch)
+        except Exception as e:
+            print(f"✗ Saving {len(batch)} calls failed: {e}")
+            entries = [self._entry(item, "failed", error=str(e)) for item, _ in batch]
+            self.totals["failed"] += len(batch)
+        self.manifest.append(entries)
+        batch.clear()
+
+    def run(self) -> dict:
+        started = time.time()
+        items = self.plan()
+        print(f"🔄 Ingesting {len(items)} files ({self.totals['already_ingested']} already ingested, "
+              f"{self.totals['duplicates']} duplicates) with {self.workers} Whisper processes "
+              f"x {self.whisper_threads} threads")
+        if not items:
+            return dict(self.totals, seconds=round(time.time() - started, 1))
+
+        whisper_lang = "ja" if self.language in ["ja", "jp", "japanese"] else self.language
+        results = queue.Queue()  # (item, record or None, error or None)
+
+        # Spawned workers read thread settings when torch is imported
+        os.environ.setdefault("OMP_NUM_THREADS", str(self.whisper_threads))
+        asr_pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"),
+                                       initializer=_init_worker, initargs=(self.model_name, self.whisper_threads))
+        llm_pool = ThreadPoolExecutor(max_workers=self.llm_workers, thread_name_prefix="ingest-llm")
+
+        def analyze(item, transcription):
+            try:
+                results.put((item, self._analyze(item, transcription), None))
+            except Exception as e:
+                results.put((item, None, f"analysis: {e}"))
+
+        def transcribed(item, future):
+            # Runs in the process pool's result thread: hand off to the LLM pool
+            try:
+                llm_pool.submit(analyze, item, future.result())
+            except Exception as e:
+                results.put((item, None, f"transcription: {e}"))
+
+        try:
+            for item in items:
+                future = asr_pool.submit(_transcribe_file, item["path"], whisper_lang)
+                future.add_done_callback(lambda f, item=item: transcribed(item, f))
+
+            batch, pending, last_flush = [], len(items), time.monotonic()
+            while pending:
+                try:
+                    item, record, error = results.get(timeout=INGEST_FLUSH_SECONDS)
+                except queue.Empty:
+                    self._flush(batch)
+                    last_flush = time.monotonic()
+                    continue
+                pending -= 1
+                if error:
+                    print(f"  ✗ {item['path']}: {error}")
+                    self.totals["failed"] += 1
+                    self.manifest.append([self._entry(item, "failed", error=error)])
+                else:
+                    batch.append((item, record))
+                if len(batch) >= self.batch_size or time.monotonic() - last_flush >= INGEST_FLUSH_SECONDS:
+                    self._flush(batch)
+                    last_flush = time.monotonic()
+                    done = len(items) - pending
+                    print(f"  ✓ {done}/{len(items)} files, {self.totals['saved']} saved "
+                          f"({time.time() - started:.0f}s)")
+            self._flush(batch)
+        finally:
+            asr_pool.shutdown(wait=False, cancel_futures=True)
+            llm_pool.shutdown(wait=True)
+
+        return dict(self.totals, seconds=round(time.time() - started, 1))
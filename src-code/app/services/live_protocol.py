@@ -0,0 +1,69 @@
+"""
+Live Call WebSocket Protocol
+/ws/realtime-call speaks two protocol versions; the client picks one in its
+start message ({"action": "start", "protocol": 2}). Without "protocol" the
+session uses v1.
+
+v1 (legacy): audio as base64 in JSON text frames ({"action": "audio"}); every
+ack carries the full transcript and the latest SOAP.
+
+v2: audio in binary frames with an 8 byte big-endian header
+
+    version u8 (=2) | codec u8 | flags u16 (reserved, 0) | seq u32 | payload
+
+    codec 0 = WebM/Opus recorder chunk (decoded with ffmpeg)
+    codec 1 = raw PCM16 little-endian, mono, 16 kHz
+
+Control messages (start, end, ping) stay JSON text frames. The server
+answers each audio frame with a small ack and pushes:
+    {"type": "ack", "seq": <audio seq>, "queue_size": n}
+    {"type": "transcript", "seq": <transcript seq>, "audio_seq": n,
+     "offset": <seconds since start>, "text": <new text only>,
+     "word_count": n, "language": ..}
+    {"type": "soap", "version": n, "soap": {...}}   (only when it changed)
+    {"type": "triage", "esi_level": n, "urgency": ..}  (rule-based pre-screen,
+     only when the ESI level changed)
+    {"type": "summary", "final": false, "soap": .., "triage": ..}
+     (sent as soon as "end" arrives; the final result follows)
+Transcript seq numbers increase by one per segment, so a client can detect
+a gap and fetch the full transcript from /api/calls/{call_id} later.
+
+Both versions: if the connection drops, the session is kept for
+LIVE_SESSION_GRACE_SECONDS (see live_sessions.py). A new connection sends
+{"action": "resume", "session_id": <call_id>, "protocol": n} and gets
+{"status": "resumed", "transcript": .., "transcript_seq": n, "soap": ..}.
+"""
+import struct
+
+PROTOCOL_V1 = 1
+PROTOCOL_V2 = 2
+SUPPORTED_PROTOCOLS = (PROTOCOL_V1, PROTOCOL_V2)
+
+CODEC_WEBM = 0
+CODEC_PCM16 = 1
+CODEC_NAMES = {CODEC_WEBM: "webm", CODEC_PCM16: "pcm16"}
+
+PCM16_SAMPLE_RATE = 16000
+
+AUDIO_HEADER = struct.Struct(">BBHI")
+
+
+class ProtocolError(ValueError):
+    """Malformed v2 frame"""
+
+
+def encode_audio_frame(seq: int, payload: bytes, codec: int = CODEC_WEBM) -> bytes:
+    """Binary v2 audio frame (clients and tests)"""
+    return AUDIO_HEADER.pack(PROTOCOL_V2, codec, 0, seq) + payload
+
+
+def decode_audio_frame(frame: bytes) -> tuple:
+    """(codec name, seq, payload) of a binary v2 audio frame"""
+    if len(frame) < AUDIO_HEADER.size:
+        raise ProtocolError(f"Audio frame too short ({len(frame)} bytes)")
+    version, codec, _flags, seq = AUDIO_HEADER.unpack_from(frame)
+    if version != PROTOCOL_V2:
+        raise ProtocolError(f"Unsupported audio frame version {version}")
+    if codec not in CODEC_NAMES:
+        raise ProtocolError(f"Unknown audio codec {codec}")
+    return CODEC_NAMES[codec], seq, frame[AUDIO_HEADER.size:]
@@ -0,0 +1,239 @@
+"""
+Live Session Store
+Checkpoints live calls in SQLite (live_sessions + live_segments) so the
+state of a call does not live only in the memory of one worker.
+
+- The handler serving a call owns it through a random owner token and a
+  lease. Every committed transcript segment is written together with the
+  session state in one transaction. A heartbeat task of the handler renews
+  the lease every LIVE_SESSION_HEARTBEAT_SECONDS, also while it waits for
+  Whisper or the LLM, so a busy call never looks abandoned.
+- A WebSocket that drops suspends the session for LIVE_SESSION_GRACE_SECONDS.
+  A reconnect carrying the session id resumes it on any worker, which takes
+  over the owner token. A handler that lost its session notices on its
+  next checkpoint (compare-and-set on the owner) and stops.
+- LiveSessionSweeper finalizes sessions whose lease expired (client gone,
+  or the worker serving it died) and retries a crashed finalization.
+"""
+import os
+import json
+import uuid
+import asyncio
+from datetime import datetime, timedelta
+from sqlalchemy import update
+from app.services.database import get_db
+from app.models.live_session import LiveSession, LiveSegment
+from app.services.executors import run_in
+
+LIVE_SESSION_LEASE_SECONDS = int(os.getenv("LIVE_SESSION_LEASE_SECONDS", "60"))
+LIVE_SESSION_GRACE_SECONDS = int(os.getenv("LIVE_SESSION_GRACE_SECONDS", "30"))
+LIVE_SESSION_SWEEP_INTERVAL = float(os.getenv("LIVE_SESSION_SWEEP_INTERVAL", "15"))
+LIVE_SESSION_MAX_ATTEMPTS = 3
+LIVE_SESSION_HEARTBEAT_SECONDS = LIVE_SESSION_LEASE_SECONDS / 3
+
+OPEN_STATES = ("active", "disconnected")
+
+# Session columns written by checkpoint() (JSON for the dict ones)
+STATE_FIELDS = ("language", "word_count", "transcript_seq", "soap", "soap_version",
+                "soap_covered", "soap_language", "triage")
+JSON_FIELDS = ("soap", "triage")
+
+
+def new_owner() -> str:
+    return uuid.uuid4().hex
+
+
+def _lease(seconds: int = LIVE_SESSION_LEASE_SECONDS) -> datetime:
+    return datetime.utcnow() + timedelta(seconds=seconds)
+
+
+def _columns(state: dict) -> dict:
+    values = {}
+    for field in STATE_FIELDS:
+        if field in state:
+            value = state[field]
+            values[field] = json.dumps(value, ensure_ascii=False) if field in JSON_FIELDS and value is not None else value
+    return values
+
+
+def create_session(session_id: str, owner: str, language: str, started_at: datetime = None) -> None:
+    with get_db() as db:
+        db.add(LiveSession(session_id=session_id, owner=owner, language=language,
+                           started_at=started_at or datetime.utcnow(), lease_until=_lease()))
+
+
+def checkpoint(session_id: str, owner: str, state: dict, segment: dict = None) -> bool:
+    """
+    Write the session state (and a new segment) in one transaction and renew
+    the lease. False if the session is no longer owned by `owner`.
+    """
+    now = datetime.utcnow()
+    with get_db() as db:
+        result = db.execute(
+            update(LiveSession)
+            .where(LiveSession.session_id == session_id, LiveSession.owner == owner,
+                   LiveSession.status == "active")
+            .values(updated_at=now, lease_until=_lease(), **_columns(state))
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount != 1:
+            return False
+        if segment:
+            db.add(LiveSegment(session_id=session_id, **segment))
+    return True
+
+
+def renew_lease(session_id: str, owner: str) -> bool:
+    """Heartbeat of the serving handler (active or finalizing); False if it lost the session"""
+    with get_db() as db:
+        result = db.execute(
+            update(LiveSession)
+            .where(LiveSession.session_id == session_id, LiveSession.owner == owner,
+                   LiveSession.status.in_(("active", "finalizing")))
+            .values(lease_until=_lease())
+            .execution_options(synchronize_session=False)
+        )
+        return result.rowcount == 1
+
+
+def suspend_session(session_id: str, owner: str) -> bool:
+    """Client disconnected: keep the session for the grace period"""
+    with get_db() as db:
+        result = db.execute(
+            update(LiveSession)
+            .where(LiveSession.session_id == session_id, LiveSession.owner == owner,
+                   LiveSession.status == "active")
+            .values(status="disconnected", updated_at=datetime.utcnow(),
+                    lease_until=_lease(LIVE_SESSION_GRACE_SECONDS))
+            .execution_options(synchronize_session=False)
+        )
+        return result.rowcount == 1
+
+
+def resume_session(session_id: str, owner: str) -> dict:
+    """Take over an open session; returns its state (None if unknown or finished)"""
+    with get_db() as db:
+        result = db.execute(
+            update(LiveSession)
+            .where(LiveSession.session_id == session_id, LiveSession.status.in_(OPEN_STATES))
+            .values(status="active", owner=owner, updated_at=datetime.utcnow(), lease_until=_lease())
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount != 1:
+            return None
+    return load_session(session_id)
+
+
+def load_session(session_id: str) -> dict:
+    """Session state with its segments in order (None if unknown)"""
+    with get_db() as db:
+        session = db.get(LiveSession, session_id)
+        if session is None:
+            return None
+        state = {field: getattr(session, field) for field in STATE_FIELDS}
+        for field in JSON_FIELDS:
+            state[field] = json.loads(state[field]) if state[field] else None
+        state["session_id"] = session.session_id
+        state["started_at"] = session.started_at
+        state["segments"] = [
+            {"seq": seq, "offset": offset, "text": text, "language": language}
+            for seq, offset, text, language in db.query(
+                LiveSegment.seq, LiveSegment.offset, LiveSegment.text, LiveSegment.language
+            ).filter(LiveSegment.session_id == session_id).order_by(LiveSegment.seq)
+        ]
+        return state
+
+
+def claim_for_finalize(session_id: str, owner: str) -> bool:
+    """The serving handler ends the call (False if another connection took over)"""
+    with get_db() as db:
+        result = db.execute(
+            update(LiveSession)
+            .where(LiveSession.session_id == session_id, LiveSession.owner == owner,
+                   LiveSession.status.in_(OPEN_STATES))
+            .values(status="finalizing", attempts=LiveSession.attempts + 1,
+                    updated_at=datetime.utcnow(), lease_until=_lease())
+            .execution_options(synchronize_session=False)
+        )
+        return result.rowcount == 1
+
+
+def claim_expired_sessions(limit: int = 10) -> list:
+    """Lease expired sessions for finalization; returns (session_id, owner) tuples"""
+    now = datetime.utcnow()
+    claimed = []
+    with get_db() as db:
+        candidates = db.query(LiveSession.session_id, LiveSession.owner, LiveSession.lease_until).filter(
+            LiveSession.status.in_(OPEN_STATES + ("finalizing",)),
+            LiveSession.lease_until < now,
+            LiveSession.attempts < LIVE_SESSION_MAX_ATTEMPTS
+        ).limit(limit).all()
+
+        for session_id, previous_owner, lease_until in candidates:
+            owner = new_owner()
+            # Compare-and-set so two workers never finalize the same session
+            result = db.execute(
+                update(LiveSession)
+                .where(LiveSession.session_id == session_id, LiveSession.owner == previous_owner,
+                       LiveSession.lease_until == lease_until)
+                .values(status="finalizing", owner=owner, attempts=LiveSession.attempts + 1,
+                        updated_at=now, lease_until=_lease())
+                .execution_options(synchronize_session=False)
+            )
+            if result.rowcount == 1:
+                claimed.append((session_id, owner))
+    return claimed
+
+
+def finish_session(session_id: str, owner: str, completed: bool) -> None:
+    """
+    Finalization ended. Completed (or nothing to save): the segments are
+    dropped, the call row has the transcript. Failed: retried by the sweeper
+    after the lease, up to LIVE_SESSION_MAX_ATTEMPTS.
+    """
+    with get_db() as db:
+        session = db.get(LiveSession, session_id)
+        if session is None or session.owner != owner:
+            return
+        session.updated_at = datetime.utcnow()
+        if completed:
+            session.status = "finalized"
+            session.lease_until = None
+            db.query(LiveSegment).filter(LiveSegment.session_id == session_id).delete(synchronize_session=False)
+        elif (session.attempts or 0) >= LIVE_SESSION_MAX_ATTEMPTS:
+            session.status = "failed"
+            session.lease_until = None
+            print(f"✗ Live session {session_id} could not be finalized (kept for inspection)")
+
+
+class LiveSessionSweeper:
+    """Background task finalizing abandoned live sessions on any worker"""
+
+    def __init__(self, finalize, interval: float = LIVE_SESSION_SWEEP_INTERVAL):
+        self.finalize = finalize  # async (session_id, owner)
+        self.interval = interval
+        self._task = None
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+            print("✓ Live session sweeper started")
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                for session_id, owner in await run_in("db", claim_expired_sessions):
+                    print(f"⏹️  Finalizing abandoned live session {session_id}")
+                    await self.finalize(session_id, owner)
+            except Exception as e:
+                print(f"⚠️ Live session sweeper error: {e}")
+            await asyncio.sleep(self.interval)
@@ -0,0 +1,166 @@
+"""
+Live SOAP Scheduler
+Decides when a live call refreshes its partial SOAP note. One scheduler per
+session:
+
+- Content threshold: a refresh needs LIVE_SOAP_MIN_NEW_WORDS new words since
+  the last request, and at least LIVE_SOAP_MIN_INTERVAL seconds between
+  requests (debounce).
+- Time threshold: any new words are picked up after LIVE_SOAP_MAX_WAIT
+  seconds, so a slow speaker still gets a refresh.
+- At most one request per session. A request still waiting in the work
+  queue keeps its place (and its aging credit) and reads the transcript
+  when it starts, so newer words ride along; a running one finishes and the
+  next refresh starts from its completion.
+
+The scheduler only needs two callables and the word count passed to
+notify(), so it knows nothing about audio, WebSockets or the LLM client:
+    submit()           -> concurrent.futures.Future of the result for the transcript
+                          as of when the request starts (None: the update failed)
+    on_result(result)  -> awaitable, called with each successful result
+
+The handler decides what a request sends: after the first partial SOAP it
+only sends the transcript since the last one (SOAPExtractor.extract_incremental).
+"""
+import os
+import time
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+LIVE_SOAP_MIN_WORDS = int(os.getenv("LIVE_SOAP_MIN_WORDS", "10"))
+LIVE_SOAP_MIN_NEW_WORDS = int(os.getenv("LIVE_SOAP_MIN_NEW_WORDS", "15"))
+LIVE_SOAP_MIN_INTERVAL = float(os.getenv("LIVE_SOAP_MIN_INTERVAL", "8"))
+LIVE_SOAP_MAX_WAIT = float(os.getenv("LIVE_SOAP_MAX_WAIT", "20"))
+
+
+class PartialSoapScheduler:
+    """Debounced partial-SOAP refreshes for one live call"""
+
+    def __init__(self, submit, on_result,
+                 min_words: int = LIVE_SOAP_MIN_WORDS, min_new_words: int = LIVE_SOAP_MIN_NEW_WORDS,
+                 min_interval: float = LIVE_SOAP_MIN_INTERVAL, max_wait: float = LIVE_SOAP_MAX_WAIT):
+        self.submit = submit
+        self.on_result = on_result
+        self.min_words = min_words
+        self.min_new_words = min_new_words
+        self.min_interval = min_interval
+        self.max_wait = max_wait
+
+        self.word_count = 0
+        self.requested_words = 0  # word count of the newest request
+        self.last_started = None
+        self.future = None        # concurrent Future of the request in flight
+        self.task = None
+        self.timer = None
+        self.closed = False
+
+        self.requested = 0
+        self.completed = 0
+        self.coalesced = 0   # notifications folded into a request still queued
+        self.cancelled = 0   # queued requests dropped on close
+        self.failed = 0
+        self.latencies_ms = []
+
+    def notify(self, word_count: int) -> None:
+        """New transcript committed; starts a refresh when one is due"""
+        self.word_count = word_count
+        self._check()
+
+    def _delay(self) -> float:
+        """Seconds until a refresh is due (None: nothing new to extract)"""
+        new_words = self.word_count - self.requested_words
+        if self.word_count < self.min_words or new_words <= 0:
+            return None
+        if self.last_started is None:
+            return 0.0
+        elapsed = time.monotonic() - self.last_started
+        threshold = self.min_interval if new_words >= self.min_new_words else self.max_wait
+        return max(0.0, threshold - elapsed)
+
+    def _check(self) -> None:
+        if self.closed:
+            return
+        if self.future is not None:
+            if not (self.future.running() or self.future.done()):
+                # Still queued: it reads the transcript when it starts, so these words are covered
+                if self.word_count > self.requested_words:
+                    self.coalesced += 1
+                self.requested_words = self.word_count
+            return  # the completion of the running request checks again
+
+        delay = self._delay()
+        if delay is None:
+            return
+        if delay == 0:
+            self._start()
+        elif self.timer is None:
+            self.timer = asyncio.get_running_loop().call_later(delay, self._on_timer)
+
+    def _on_timer(self) -> None:
+        self.timer = None
+        self._check()
+
+    def _start(self) -> None:
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        self.requested_words = self.word_count
+        self.last_started = time.monotonic()
+        self.requested += 1
+        self.future = self.submit()
+        self.task = asyncio.ensure_future(self._await(self.future, self.last_started))
+
+    async def _await(self, future, started: float) -> None:
+        try:
+            result = await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            return  # closed
+        except Exception as e:
+            logger.warning(f"Partial SOAP failed: {e}")
+            result = None
+        finally:
+            if self.future is future:
+                self.future = None
+
+        if result is None:
+            self.failed += 1
+            # Not covered: the next refresh includes these words again
+            self.requested_words = min(self.requested_words, self.word_count - 1)
+        else:
+            self.completed += 1
+            self.latencies_ms.append((time.monotonic() - started) * 1000)
+            await self.on_result(result)
+        self._check()
+
+    def close(self) -> None:
+        """Call ended: no new requests; drop a request that has not started"""
+        self.closed = True
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        if self.future is not None and self.future.cancel():
+            self.cancelled += 1
+            self.future = None
+
+    async def wait(self) -> None:
+        """Wait for the request that is still running (its result is delivered)"""
+        if self.task is not None and not self.task.done():
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+
+    def stats(self) -> dict:
+        latencies = self.latencies_ms
+        return {
+            "requested": self.requested,
+            "completed": self.completed,
+            "coalesced": self.coalesced,
+            "cancelled": self.cancelled,
+            "failed": self.failed,
+            "in_flight": self.future is not None,
+            "latency_ms_avg": round(sum(latencies) / len(latencies), 1) if latencies else None,
+            "latency_ms_max": round(max(latencies), 1) if latencies else None
+        }
@@ -0,0 +1,440 @@
+"""
+Call Localization Service
+Translations for the dashboard language switch (call_translations table)
+
+A translation row is current when its version matches CACHE_VERSION and its
+source_hash matches the call's source_hash. Editing the SOAP notes or urgency
+changes the call's hash, so older translations go stale without any cleanup.
+The language-mixing check runs once when a translation is written.
+
+New calls are prefilled in the background (outbox "pretranslate" tasks run by
+a dedicated localization worker) so the dashboard language switch hits the
+table. Background translation is rate limited and waits while calls are being
+triaged. Requests never translate inline: a miss is served in the original
+language (translation_deferred) and queued - detail views as a pretranslate
+task, list pages as one background batch.
+"""
+import os
+import re
+import json
+import time
+import threading
+from concurrent.futures import Future
+from datetime import datetime
+from sqlalchemy import and_
+from app.services.database import get_db, touch_call, publish_after_commit
+from app.models.call import EmergencyCall
+from app.models.translation import CallTranslation
+from app.services.throttle import RateLimiter, triage_activity
+from app.services.work_queue import work_queue, BACKGROUND
+from app.services.executors import submit
+
+# Cache version: v2 (includes proper label localization)
+CACHE_VERSION = "v2"
+
+# Languages prefilled in the background after a call is processed
+PRETRANSLATE_LANGUAGES = [
+    lang.strip() for lang in os.getenv("PRETRANSLATE_LANGUAGES", "en,ja").split(",") if lang.strip()
+]
+
+# Background translation budget (AI requests per minute, parallel workers)
+LOCALIZATION_RATE_PER_MIN = float(os.getenv("LOCALIZATION_RATE_PER_MIN", "30"))
+LOCALIZATION_CONCURRENCY = int(os.getenv("LOCALIZATION_CONCURRENCY", "2"))
+# Max seconds background translation yields to triage before running anyway
+TRIAGE_YIELD_TIMEOUT = float(os.getenv("LOCALIZATION_TRIAGE_YIELD_TIMEOUT", "60"))
+# Batched list-localization requests: max calls, and max characters of call
+# fields (~4 chars per token; the reply is about as long, so this keeps a
+# batch well inside the model's output limit)
+LOCALIZATION_BATCH_SIZE = int(os.getenv("LOCALIZATION_BATCH_SIZE", "50"))
+LOCALIZATION_BATCH_CHARS = int(os.getenv("LOCALIZATION_BATCH_CHARS", "12000"))
+# Calls a batch failed to translate are retried after this delay, doubling
+# per failure up to the max (list polls don't re-send them meanwhile)
+LOCALIZATION_RETRY_SECONDS = float(os.getenv("LOCALIZATION_RETRY_SECONDS", "30"))
+LOCALIZATION_MAX_RETRY_SECONDS = float(os.getenv("LOCALIZATION_MAX_RETRY_SECONDS", "3600"))
+
+background_rate_limiter = RateLimiter(LOCALIZATION_RATE_PER_MIN)
+
+# Work queue priorities (BACKGROUND lane - translation always yields to triage)
+INTERACTIVE_PRIORITY = 1  # a dashboard view is waiting for it
+PREFILL_PRIORITY = 5
+
+_inflight = {}
+_inflight_lock = threading.Lock()
+# (call_id, lang) of list rows being batch-translated in the background
+_list_inflight = set()
+
+# (call_id, lang, source_hash) -> (failures, monotonic retry time)
+_batch_failures = {}
+_batch_failures_lock = threading.Lock()
+
+TRANSLATED_FIELDS = (
+    "soap_subjective", "soap_objective", "soap_assessment", "soap_plan",
+    "urgency_reasoning", "patient_name", "doctor_name", "disease"
+)
+
+ENGLISH_INDICATORS = ["Name:", "Age:", "Address:", "Phone:", "Blood:", "not provided", "[Not provided]"]
+ENGLISH_NARRATIVE = ["complained", "reported"]
+JAPANESE_CHARS = re.compile(r'[\u3040-\u309F\u30A0-\u30FF\u4E00-\u9FFF]')
+
+
+def is_valid_translation(cached: dict, lang: str) -> bool:
+    """Check that the translated text is not language-mixed"""
+    subj_text = cached.get("soap_subjective") or ""
+    soap_text = "\n".join(cached.get(f) or "" for f in ["soap_subjective", "soap_objective", "soap_assessment", "soap_plan"])
+
+    if lang == "ja":
+        # Japanese should not contain English labels or words
+        has_english = any(indicator in soap_text for indicator in ENGLISH_INDICATORS)
+        return not has_english and not any(word in subj_text for word in ENGLISH_NARRATIVE)
+    if lang == "en":
+        # English should not contain Hiragana, Katakana or Kanji
+        return not JAPANESE_CHARS.search(soap_text)
+    # For other languages, just check if a translation exists
+    return True
+
+
+def current_translation(lang: str):
+    """Join condition: valid, current translation of EmergencyCall into lang"""
+    return and_(
+        CallTranslation.call_id == EmergencyCall.call_id,
+        CallTranslation.lang == lang,
+        CallTranslation.version == CACHE_VERSION,
+        CallTranslation.source_hash == EmergencyCall.source_hash,
+        CallTranslation.is_valid.is_(True)
+    )
+
+
+def translation_to_dict(translation) -> dict:
+    """Translated fields of a CallTranslation row (transcript only if present)"""
+    cached = {field: getattr(translation, field) for field in TRANSLATED_FIELDS}
+    if translation.transcript is not None:
+        cached["transcript"] = translation.transcript
+    return cached
+
+
+def get_translation(db, call, lang: str):
+    """Current translation of a call as dict, or None"""
+    translation = db.query(CallTranslation).filter(
+        CallTranslation.call_id == call.call_id,
+        CallTranslation.lang == lang,
+        CallTranslation.version == CACHE_VERSION,
+        CallTranslation.source_hash == call.source_hash,
+        CallTranslation.is_valid.is_(True)
+    ).first()
+    return translation_to_dict(translation) if translation else None
+
+
+def save_translation(db, call, lang: str, cached: dict) -> bool:
+    """
+    Store a translation made from the call's current content (caller commits).
+    Replaces older rows of the same language; translations of content that
+    changed meanwhile are discarded. Returns whether a valid row was stored.
+    """
+    current_hash = db.query(EmergencyCall.source_hash).filter(EmergencyCall.call_id == call.call_id).scalar()
+    if current_hash != call.source_hash:
+        print(f"⚠️  {call.call_id} changed while translating to {lang}; translation discarded")
+        return False
+
+    is_valid = is_valid_translation(cached, lang)
+    if not is_valid:
+        print(f"⚠️  {lang} translation of {call.call_id} is language-mixed; it will be re-translated on next request")
+
+    db.query(CallTranslation).filter(
+        CallTranslation.call_id == call.call_id,
+        CallTranslation.lang == lang
+    ).delete(synchronize_session=False)
+    db.add(CallTranslation(
+        call_id=call.call_id,
+        lang=lang,
+        version=CACHE_VERSION,
+        source_hash=call.source_hash,
+        is_valid=is_valid,
+        transcript=cached.get("transcript"),
+        created_at=datetime.utcnow(),
+        **{field: cached.get(field) for field in TRANSLATED_FIELDS}
+    ))
+    touch_call(db, call.call_id)  # new ETag for the call and lists
+    if is_valid:
+        publish_after_commit(db, "call.translated", call.call_id, lang=lang, urgency_level=call.urgency_level)
+    return is_valid
+
+
+def localize_call(call, lang: str, priority: int = INTERACTIVE_PRIORITY) -> dict:
+    """Translate a call with ONE consolidated AI call (no DB access)"""
+    from app.services.soap_extractor import soap_extractor
+
+    print(f"Cache miss: Localizing call {call.call_id} from {call.language or 'en'} to {lang}...")
+    soap_notes = {
+        "subjective": call.soap_subjective or "",
+        "objective": call.soap_objective or "",
+        "assessment": call.soap_assessment or "",
+        "plan": call.soap_plan or ""
+    }
+    metadata = {
+        "reasoning": call.urgency_reasoning or "",
+        "patient_name": call.patient_name or "",
+        "doctor_name": call.doctor_name or "",
+        "disease": call.disease or ""
+    }
+
+    # ONE SINGLE CALL to OpenAI (Re-extraction + Localization + Translation)
+    localized = work_queue.run(soap_extractor.localize_call_data, call.transcript, soap_notes, metadata, lang,
+                               lane=BACKGROUND, priority=priority)
+
+    return {
+        "soap_subjective": localized.get("subjective", soap_notes["subjective"]),
+        "soap_objective": localized.get("objective", soap_notes["objective"]),
+        "soap_assessment": localized.get("assessment", soap_notes["assessment"]),
+        "soap_plan": localized.get("plan", soap_notes["plan"]),
+        "urgency_reasoning": localized.get("reasoning", call.urgency_reasoning),
+        "patient_name": localized.get("patient_name", call.patient_name),
+        "doctor_name": localized.get("doctor_name", call.doctor_name),
+        "disease": localized.get("disease", call.disease),
+        "transcript": localized.get("transcript", call.transcript)
+    }
+
+
+def localize_call_once(call, lang: str, priority: int = INTERACTIVE_PRIORITY) -> dict:
+    """
+    localize_call with in-flight dedupe: concurrent requests for the same
+    call, language and source content share one AI call.
+    """
+    key = (call.call_id, lang, call.source_hash)
+    with _inflight_lock:
+        future = _inflight.get(key)
+        owner = future is None
+        if owner:
+            future = _inflight[key] = Future()
+
+    if not owner:
+        print(f"⏳ Waiting for in-flight {lang} translation of {call.call_id}")
+        return future.result()
+
+    try:
+        result = localize_call(call, lang, priority=priority)
+        future.set_result(result)
+        return result
+    except Exception as e:
+        future.set_exception(e)
+        raise
+    finally:
+        with _inflight_lock:
+            _inflight.pop(key, None)
+
+
+BATCH_FIELDS = {
+    "patient_name": "patient_name", "disease": "disease", "reasoning": "urgency_reasoning",
+    "subjective": "soap_subjective", "objective": "soap_objective",
+    "assessment": "soap_assessment", "plan": "soap_plan"
+}
+
+
+def _batch_item(call) -> dict:
+    item = {field: getattr(call, column) for field, column in BATCH_FIELDS.items()}
+    item["id"] = call.call_id
+    return item
+
+
+def _split_batches(items: list) -> list:
+    """Consecutive batches of at most LOCALIZATION_BATCH_SIZE items / LOCALIZATION_BATCH_CHARS"""
+    batches, batch, size = [], [], 0
+    for item in items:
+        chars = sum(len(item[field] or "") for field in BATCH_FIELDS)
+        if batch and (len(batch) >= LOCALIZATION_BATCH_SIZE or size + chars > LOCALIZATION_BATCH_CHARS):
+            batches.append(batch)
+            batch, size = [], 0
+        batch.append(item)
+        size += chars
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+def batch_retry_pending(call, lang: str) -> bool:
+    """Whether a failed batch translation of this call content is still backing off"""
+    with _batch_failures_lock:
+        failure = _batch_failures.get((call.call_id, lang, call.source_hash))
+    return failure is not None and time.monotonic() < failure[1]
+
+
+def _record_batch_outcome(calls: list, lang: str, translated: dict) -> None:
+    now = time.monotonic()
+    with _batch_failures_lock:
+        for call in calls:
+            key = (call.call_id, lang, call.source_hash)
+            # Language-mixed results are stored invalid, so they count as failures
+            if call.call_id in translated and is_valid_translation(translated[call.call_id], lang):
+                _batch_failures.pop(key, None)
+                continue
+            failures = _batch_failures.get(key, (0, 0))[0] + 1
+            delay = min(LOCALIZATION_RETRY_SECONDS * 2 ** (failures - 1), LOCALIZATION_MAX_RETRY_SECONDS)
+            _batch_failures[key] = (failures, now + delay)
+
+
+def localize_calls_batch(calls: list, lang: str) -> dict:
+    """
+    Translate the list-view fields of many calls with one AI call per batch
+    (see _split_batches; no DB access). Transcripts are left out; the detail
+    view translates them on demand.
+    Returns {call_id: translated fields} for the calls the model returned.
+    Calls that failed back off (batch_retry_pending) before the next attempt.
+    """
+    from app.services.soap_extractor import soap_extractor
+
+    by_id = {call.call_id: call for call in calls}
+    translated = {}
+    for batch in _split_batches([_batch_item(call) for call in calls]):
+        print(f"Cache miss: Batch localizing {len(batch)} calls to {lang}...")
+        try:
+            localized = work_queue.run(soap_extractor.localize_batch, batch, lang,
+                                       lane=BACKGROUND, priority=INTERACTIVE_PRIORITY)
+        except Exception as e:
+            print(f"Batch localization of {len(batch)} calls failed: {e}")
+            localized = {}
+
+        for item in batch:
+            data = localized.get(item["id"])
+            if data:
+                call = by_id[item["id"]]
+                translated[call.call_id] = {
+                    column: data.get(field, item[field]) for field, column in BATCH_FIELDS.items()
+                }
+                translated[call.call_id]["doctor_name"] = call.doctor_name
+
+    _record_batch_outcome(calls, lang, translated)
+    return translated
+
+
+def prefill_list_translations(call_ids: list, lang: str) -> None:
+    """
+    Batch-translate list rows in the background (llm pool) so a list request
+    never waits for the AI call. Rows already being translated are skipped;
+    the next poll picks the stored translations up.
+    """
+    with _inflight_lock:
+        call_ids = [call_id for call_id in call_ids if (call_id, lang) not in _list_inflight]
+        _list_inflight.update((call_id, lang) for call_id in call_ids)
+    if call_ids:
+        submit("llm", _translate_list_rows, call_ids, lang)
+
+
+def _translate_list_rows(call_ids: list, lang: str) -> None:
+    try:
+        with get_db() as db:
+            calls = db.query(EmergencyCall).filter(EmergencyCall.call_id.in_(call_ids)).all()
+            db.expunge_all()  # detached copies: no DB lock is held during the AI call
+
+        translated = localize_calls_batch(calls, lang)
+        with get_db() as db:
+            for call in calls:
+                if call.call_id in translated and not get_translation(db, call, lang):
+                    save_translation(db, call, lang, translated[call.call_id])
+    except Exception as e:
+        print(f"⚠️ Background list translation to {lang} failed: {e}")
+    finally:
+        with _inflight_lock:
+            _list_inflight.difference_update((call_id, lang) for call_id in call_ids)
+
+
+def translate_transcript(call, lang: str, priority: int = INTERACTIVE_PRIORITY) -> str:
+    """Translate only the transcript of a call (no DB access)"""
+    from app.services.soap_extractor import soap_extractor
+
+    print(f"Transcript cache miss: Translating transcript for {call.call_id} to {lang}")
+    return work_queue.run(soap_extractor.translate_text, call.transcript, lang,
+                          lane=BACKGROUND, priority=priority)
+
+
+def store_transcript_translation(db, call, lang: str, transcript: str) -> None:
+    """Add a translated transcript to the current translation row (caller commits)"""
+    db.query(CallTranslation).filter(
+        CallTranslation.call_id == call.call_id,
+        CallTranslation.lang == lang,
+        CallTranslation.version == CACHE_VERSION,
+        CallTranslation.source_hash == call.source_hash
+    ).update({"transcript": transcript}, synchronize_session=False)
+    touch_call(db, call.call_id)
+
+
+def _is_complete(cached: dict, call) -> bool:
+    """Whether a translation covers the transcript too (batched list rows don't)"""
+    return bool(cached) and ("transcript" in cached or not call.transcript)
+
+
+def prefill_translations(call_id: str, languages: list = None) -> list:
+    """
+    Translate a call into the configured languages ahead of the first request.
+    Returns the languages that were translated (current ones are skipped).
+    """
+    from app.services.database import get_call
+
+    languages = PRETRANSLATE_LANGUAGES if languages is None else languages
+
+    # Translate on a detached copy so no DB lock is held during the AI call
+    call = get_call(call_id)
+    if not call:
+        raise LookupError(f"Call not found: {call_id}")
+
+    with get_db() as db:
+        missing = [
+            lang for lang in languages
+            if lang != (call.language or "en") and not _is_complete(get_translation(db, call, lang), call)
+        ]
+
+    translated = []
+    for lang in missing:
+        # Lower priority than triage, and within the background AI budget
+        triage_activity.wait_idle(timeout=TRIAGE_YIELD_TIMEOUT)
+        background_rate_limiter.acquire()
+
+        # Checked after waiting: another task may have translated it meanwhile
+        with get_db() as db:
+            cached = get_translation(db, call, lang)
+        if _is_complete(cached, call):
+            continue
+
+        if cached:
+            # Row from a batched list translation: only the transcript is missing
+            transcript = translate_transcript(call, lang, priority=PREFILL_PRIORITY)
+            with get_db() as db:
+                store_transcript_translation(db, call, lang, transcript)
+        else:
+            cached = localize_call_once(call, lang, priority=PREFILL_PRIORITY)
+            with get_db() as db:
+                save_translation(db, call, lang, cached)
+        translated.append(lang)
+
+    return translated
+
+
+def migrate_legacy_cache(batch_size: int = 200) -> int:
+    """
+    Move translations from the translated_data JSON column into
+    call_translations. Only current-version entries are kept; they are
+    stamped with the call's current source hash. Returns migrated calls.
+    """
+    migrated = 0
+    last_id = 0
+    while True:
+        with get_db() as db:
+            calls = db.query(EmergencyCall).filter(
+                EmergencyCall.id > last_id,
+                EmergencyCall.translated_data.isnot(None),
+                EmergencyCall.translated_data.notin_(["", "{}"])
+            ).order_by(EmergencyCall.id).limit(batch_size).all()
+            if not calls:
+                break
+
+            for call in calls:
+                try:
+                    cache = json.loads(call.translated_data)
+                except ValueError:
+                    cache = {}
+                for lang, cached in cache.items():
+                    if isinstance(cached, dict) and cached.get("_version") == CACHE_VERSION:
+                        save_translation(db, call, lang, cached)
+                call.translated_data = "{}"
+                migrated += 1
+            last_id = calls[-1].id
+
+    return migrated
@@ -0,0 +1,301 @@
+"""
+Transactional Outbox Worker
+Runs post-call side effects (patient sync, language markers, pre-translation)
+outside the request path, with retries.
+
+Tasks are inserted in the same transaction that completes the call
+(database.update_urgency / database.save_completed_calls), so they cannot be lost. The worker claims due
+tasks with a lease (compare-and-set UPDATE, safe with several processes),
+runs the registered handler in a thread and either marks the task done or
+reschedules it with exponential backoff. Handlers must be idempotent - a
+task can run again after a crash or an expired lease.
+
+Pre-translation tasks are drained by a separate localization worker so slow
+AI translation never holds up patient sync.
+"""
+import os
+import json
+import asyncio
+import traceback
+from datetime import datetime, timedelta
+from sqlalchemy import or_, and_, update
+from app.services.database import get_db
+from app.models.outbox import OutboxTask
+from app.services.localization import LOCALIZATION_CONCURRENCY, PRETRANSLATE_LANGUAGES
+from app.services.executors import run_in, submit
+
+# Side effects queued for every completed call
+POST_CALL_TASKS = ("patient_sync", "language_markers", "pretranslate")
+# Pre-translation has its own rate-limited worker (see localization.py)
+LOCALIZATION_TASKS = ("pretranslate",)
+
+HANDLERS = {}
+
+
+class Deferred(Exception):
+    """Raised by a handler to postpone its task without counting an attempt"""
+
+    def __init__(self, reason: str, delay: float = 30):
+        super().__init__(reason)
+        self.delay = delay
+
+
+def outbox_handler(kind: str):
+    """Register the handler for a task kind: handler(call_id, payload)"""
+    def decorator(func):
+        HANDLERS[kind] = func
+        return func
+    return decorator
+
+
+def enqueue_post_call_tasks(db, call_id: str, kinds=POST_CALL_TASKS, payload: dict = None,
+                            new_call: bool = False) -> None:
+    """
+    Queue side effects for a call inside the caller's session/transaction.
+    Re-enqueueing (e.g. after re-triage) resets the existing task to pending.
+    new_call=True skips the lookup of existing tasks (call inserted in this transaction).
+    """
+    now = datetime.utcnow()
+    existing = {} if new_call else {t.kind: t for t in db.query(OutboxTask).filter(
+        OutboxTask.call_id == call_id, OutboxTask.kind.in_(kinds)
+    )}
+    for kind in kinds:
+        task = existing.get(kind)
+        if task is None:
+            db.add(OutboxTask(kind=kind, call_id=call_id, payload=json.dumps(payload or {}),
+                              status="pending", attempts=0, next_attempt_at=now))
+        elif task.status != "running":
+            task.status = "pending"
+            task.attempts = 0
+            task.next_attempt_at = now
+            task.last_error = None
+
+
+def enqueue_translation(db, call_id: str, lang: str) -> None:
+    """
+    Queue the translation a request could not serve (caller commits).
+    A queued task that already covers lang is left alone, so polling
+    clients don't reset its retry backoff.
+    """
+    task = db.query(OutboxTask).filter(
+        OutboxTask.call_id == call_id, OutboxTask.kind == "pretranslate"
+    ).first()
+    if task is None:
+        db.add(OutboxTask(kind="pretranslate", call_id=call_id, payload=json.dumps({"languages": [lang]}),
+                          status="pending", attempts=0, next_attempt_at=datetime.utcnow()))
+        return
+
+    languages = json.loads(task.payload or "{}").get("languages")
+    languages = PRETRANSLATE_LANGUAGES if languages is None else languages
+    if lang in languages and task.status in ("pending", "running"):
+        return
+    if lang not in languages:
+        task.payload = json.dumps({"languages": list(languages) + [lang]})
+    if task.status != "running":
+        task.status = "pending"
+        task.attempts = 0
+        task.next_attempt_at = datetime.utcnow()
+        task.last_error = None
+
+
+class OutboxWorker:
+    """Background worker draining the outbox table"""
+
+    def __init__(self, name: str = "Outbox", kinds=None, exclude_kinds=(),
+                 poll_interval: float = 1.0, batch_size: int = 10,
+                 concurrency: int = 2, lease_seconds: int = 300):
+        self.name = name
+        self.kinds = tuple(kinds) if kinds else None
+        self.exclude_kinds = tuple(exclude_kinds)
+        self.poll_interval = poll_interval
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.lease_seconds = lease_seconds
+        self._task = None
+        self._stopping = False
+
+    async def start(self):
+        """Start draining in the background (called on app startup)"""
+        if self._task is None:
+            self._stopping = False
+            self._task = asyncio.create_task(self._run())
+            print(f"✓ {self.name} worker started")
+
+    async def stop(self):
+        self._stopping = True
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def run_one(task_id, kind, call_id, payload):
+            async with semaphore:
+                # Handlers mostly wait on AI calls / other services
+                await run_in("llm", self._execute, task_id, kind, call_id, payload)
+
+        while not self._stopping:
+            try:
+                claimed = await run_in("db", self.claim_due_tasks)
+                if claimed:
+                    await asyncio.gather(*(run_one(*task) for task in claimed))
+                    continue  # more work may be due right away
+            except Exception as e:
+                print(f"⚠️ {self.name} worker error: {e}")
+            await asyncio.sleep(self.poll_interval)
+
+    def claim_due_tasks(self) -> list:
+        """Lease up to batch_size due tasks; returns (id, kind, call_id, payload) tuples"""
+        now = datetime.utcnow()
+        claimed = []
+        with get_db() as db:
+            query = db.query(OutboxTask.id, OutboxTask.status, OutboxTask.locked_until).filter(
+                or_(
+                    and_(OutboxTask.status == "pending", OutboxTask.next_attempt_at <= now),
+                    # Lease expired: the worker running it died
+                    and_(OutboxTask.status == "running", OutboxTask.locked_until < now)
+                )
+            )
+            if self.kinds:
+                query = query.filter(OutboxTask.kind.in_(self.kinds))
+            if self.exclude_kinds:
+                query = query.filter(OutboxTask.kind.notin_(self.exclude_kinds))
+            candidates = query.order_by(OutboxTask.next_attempt_at).limit(self.batch_size).all()
+
+            for task_id, status, locked_until in candidates:
+                # Compare-and-set so two workers never claim the same task
+                if locked_until is None:
+                    same_lease = OutboxTask.locked_until.is_(None)
+                else:
+                    same_lease = OutboxTask.locked_until == locked_until
+                result = db.execute(
+                    update(OutboxTask)
+                    .where(OutboxTask.id == task_id, OutboxTask.status == status, same_lease)
+                    .values(status="running", locked_until=now + timedelta(seconds=self.lease_seconds),
+                            attempts=OutboxTask.attempts + 1)
+                    .execution_options(synchronize_session=False)
+                )
+                if result.rowcount == 1:
+                    task = db.get(OutboxTask, task_id)
+                    claimed.append((task.id, task.kind, task.call_id, json.loads(task.payload or "{}")))
+        return claimed
+
+    def _execute(self, task_id: int, kind: str, call_id: str, payload: dict) -> None:
+        handler = HANDLERS.get(kind)
+        try:
+            if handler is None:
+                raise LookupError(f"No outbox handler for '{kind}'")
+            handler(call_id, payload)
+        except Deferred as e:
+            self._defer(task_id, str(e), e.delay)
+            return
+        except Exception as e:
+            traceback.print_exc()
+            self._mark_failed(task_id, f"{type(e).__name__}: {e}")
+            return
+        self._mark_done(task_id)
+
+    def _mark_done(self, task_id: int) -> None:
+        with get_db() as db:
+            task = db.get(OutboxTask, task_id)
+            if task:
+                task.status = "done"
+                task.locked_until = None
+                task.completed_at = datetime.utcnow()
+                task.last_error = None
+
+    def _defer(self, task_id: int, reason: str, delay: float) -> None:
+        with get_db() as db:
+            task = db.get(OutboxTask, task_id)
+            if task:
+                task.status = "pending"
+                task.attempts = max(0, (task.attempts or 1) - 1)
+                task.locked_until = None
+                task.next_attempt_at = datetime.utcnow() + timedelta(seconds=delay)
+                task.last_error = f"Deferred: {reason}"
+
+    def _mark_failed(self, task_id: int, error: str) -> None:
+        with get_db() as db:
+            task = db.get(OutboxTask, task_id)
+            if not task:
+                return
+            task.last_error = error
+            task.locked_until = None
+            if task.attempts >= task.max_attempts:
+                task.status = "failed"
+                print(f"✗ Outbox task {task.kind} for {task.call_id} failed permanently: {error}")
+            else:
+                backoff = min(5 * 2 ** (task.attempts - 1), 600)
+                task.status = "pending"
+                task.next_attempt_at = datetime.utcnow() + timedelta(seconds=backoff)
+                print(f"⚠️ Outbox task {task.kind} for {task.call_id} failed (attempt {task.attempts}), retry in {backoff}s")
+
+    def drain(self) -> int:
+        """Run all currently due tasks synchronously (scripts / maintenance)"""
+        count = 0
+        while True:
+            claimed = self.claim_due_tasks()
+            if not claimed:
+                return count
+            for task in claimed:
+                self._execute(*task)
+                count += 1
+
+
+# =====================================================
+# HANDLERS
+# =====================================================
+
+@outbox_handler("patient_sync")
+def _sync_patient(call_id: str, payload: dict):
+    from app.services.sync_helper import sync_call_to_patient_journey
+    sync_call_to_patient_journey(call_id)
+
+
+def _defer_if_degraded():
+    from app.services.admission import is_degraded
+    if is_degraded():
+        raise Deferred("degraded mode (triage backlog)", delay=30)
+
+
+@outbox_handler("language_markers")
+def _analyze_markers(call_id: str, payload: dict):
+    from app.services.database import get_call
+    from app.language_markers import analyzer
+
+    _defer_if_degraded()
+
+    call = get_call(call_id)
+    if not call:
+        raise LookupError(f"Call not found: {call_id}")
+    if call.transcript and len(call.transcript.strip()) >= 5:
+        # CPU-bound: cpu process pool (this thread just waits)
+        submit("cpu", analyzer.analyze_transcript, call_id, call.transcript).result()
+
+
+@outbox_handler("pretranslate")
+def _pretranslate(call_id: str, payload: dict):
+    from app.services.localization import prefill_translations
+    _defer_if_degraded()
+    prefill_translations(call_id, payload.get("languages"))
+
+
+outbox_worker = OutboxWorker(
+    exclude_kinds=LOCALIZATION_TASKS,
+    concurrency=int(os.getenv("OUTBOX_CONCURRENCY", "2"))
+)
+
+# Background pre-translation: separate slots so slow, rate-limited AI
+# translation never delays patient sync
+localization_worker = OutboxWorker(
+    name="Localization",
+    kinds=LOCALIZATION_TASKS,
+    batch_size=2,
+    concurrency=LOCALIZATION_CONCURRENCY,
+    lease_seconds=900
+)
@@ -3,15 +3,142 @@ Patient Registration Service
 Handles registered patient database operations
 """
 from sqlalchemy.orm import Session
-from sqlalchemy import create_engine
-from app.models.patient import RegisteredPatient, Base
+from sqlalchemy import column, create_engine, event, func, text, update
+from sqlalchemy.exc import OperationalError
+from app.models.patient import RegisteredPatient, JourneyEvent, Base
+from app.services.database import ensure_schema
 import json
+import re
+import unicodedata
 from datetime import datetime
 
 # Database setup
 DATABASE_URL = "sqlite:///./data/registered_patients.db"
 engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
-Base.metadata.create_all(bind=engine)
+
+
+@event.listens_for(engine, "connect")
+def _enable_foreign_keys(dbapi_connection, connection_record):
+    # SQLite ignores FOREIGN KEY / ON DELETE CASCADE unless enabled per connection
+    dbapi_connection.execute("PRAGMA foreign_keys=ON")
+
+
+ensure_schema(engine, Base.metadata)
+
+
+# =====================================================
+# NORMALIZED SEARCH KEYS
+# =====================================================
+# Lookups used to run ilike('%name%'), a full table scan per emergency call.
+# Every patient now carries normalized keys (indexed) plus an FTS5 trigram
+# index over them, so exact matches use a B-tree and substring matches use
+# the trigram index.
+
+def normalize_search_text(value: str) -> str:
+    """Casefold, strip Latin accents and punctuation, collapse whitespace"""
+    if not value:
+        return ""
+    decomposed = unicodedata.normalize("NFKD", value)
+    chars = []
+    for ch in decomposed:
+        # Drop accents on Latin letters only (keeps Japanese dakuten intact)
+        if unicodedata.combining(ch) and chars and ord(chars[-1]) < 0x250:
+            continue
+        chars.append(ch)
+    value = unicodedata.normalize("NFKC", "".join(chars)).casefold()
+    value = re.sub(r"[^\w\s]", " ", value)
+    return " ".join(value.split())
+
+
+def normalize_phone(value: str) -> str:
+    """Keep digits only"""
+    return re.sub(r"\D", "", value or "")
+
+
+def search_keys(name: str = None, phone: str = None, street: str = None) -> dict:
+    """Compute the indexed search columns for a patient"""
+    return {
+        'name_key': normalize_search_text(name) or None,
+        'phone_digits': normalize_phone(phone) or None,
+        'street_key': normalize_search_text(street) or None
+    }
+
+
+@event.listens_for(RegisteredPatient, "before_insert")
+@event.listens_for(RegisteredPatient, "before_update")
+def _refresh_search_keys(mapper, connection, patient):
+    for key, value in search_keys(patient.name, patient.phone, patient.street).items():
+        setattr(patient, key, value)
+
+
+def _ensure_search_index():
+    """Create the FTS5 trigram index and backfill keys for older rows"""
+    with engine.begin() as conn:
+        rows = conn.execute(text(
+            "SELECT id, name, phone, street FROM registered_patients WHERE name_key IS NULL"
+        )).fetchall()
+        if rows:
+            conn.execute(
+                text("UPDATE registered_patients SET name_key = :name_key, phone_digits = :phone_digits, "
+                     "street_key = :street_key WHERE id = :id"),
+                [{'id': r.id, **search_keys(r.name, r.phone, r.street)} for r in rows]
+            )
+            print(f"✓ Backfilled search keys for {len(rows)} patients")
+    
+    try:
+        with engine.begin() as conn:
+            exists = conn.execute(text(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'registered_patients_fts'"
+            )).first()
+            if exists:
+                return True
+            conn.execute(text("""
+                CREATE VIRTUAL TABLE registered_patients_fts USING fts5(
+                    name_key, street_key, phone_digits,
+                    content='registered_patients', content_rowid='id', tokenize='trigram'
+                )
+            """))
+            conn.execute(text("""
+                CREATE TRIGGER IF NOT EXISTS registered_patients_fts_ai AFTER INSERT ON registered_patients BEGIN
+                    INSERT INTO registered_patients_fts(rowid, name_key, street_key, phone_digits)
+                    VALUES (new.id, new.name_key, new.street_key, new.phone_digits);
+                END
+            """))
+            conn.execute(text("""
+                CREATE TRIGGER IF NOT EXISTS registered_patients_fts_ad AFTER DELETE ON registered_patients BEGIN
+                    INSERT INTO registered_patients_fts(registered_patients_fts, rowid, name_key, street_key, phone_digits)
+                    VALUES ('delete', old.id, old.name_key, old.street_key, old.phone_digits);
+                END
+            """))
+            conn.execute(text("""
+                CREATE TRIGGER IF NOT EXISTS registered_patients_fts_au
+                AFTER UPDATE OF name_key, street_key, phone_digits ON registered_patients BEGIN
+                    INSERT INTO registered_patients_fts(registered_patients_fts, rowid, name_key, street_key, phone_digits)
+                    VALUES ('delete', old.id, old.name_key, old.street_key, old.phone_digits);
+                    INSERT INTO registered_patients_fts(rowid, name_key, street_key, phone_digits)
+                    VALUES (new.id, new.name_key, new.street_key, new.phone_digits);
+                END
+            """))
+            conn.execute(text("INSERT INTO registered_patients_fts(registered_patients_fts) VALUES ('rebuild')"))
+            print("✓ Patient trigram search index created")
+        return True
+    except OperationalError as e:
+        # SQLite < 3.34 has no trigram tokenizer - fall back to prefix lookups
+        print(f"⚠️ Trigram index unavailable, using prefix search only: {e}")
+        return False
+
+
+FTS_ENABLED = _ensure_search_index()
+
+
+def _fts_phrase(column: str, value: str) -> str:
+    """Build an FTS5 column filter for a literal substring"""
+    return f'{column} : "{value.replace(chr(34), chr(34) * 2)}"'
+
+
+def _prefix_filter(column, key: str):
+    """Range condition that lets SQLite use the B-tree index for 'key%'"""
+    return (column >= key) & (column < key + "\U0010ffff")
 
 def get_patient_db():
     """Get database session"""
@@ -23,6 +150,142 @@ def get_patient_db():
     finally:
         db.close()
 
+# =====================================================
+# JOURNEY EVENTS
+# =====================================================
+# Events are rows in the journey_events table (indexed on patient/date/time)
+# so adding one is a single INSERT regardless of how long the timeline is.
+# Segment numbers are positions in the sorted timeline, assigned on read.
+
+def _parse_events(events) -> list:
+    """Accept a JSON string or a list of event dicts"""
+    if not events:
+        return []
+    if isinstance(events, str):
+        return json.loads(events) or []
+    return list(events)
+
+def journey_event_row(patient_id: str, event: dict, source_call_id: str = None) -> dict:
+    """Column values for a journey_events row"""
+    return {
+        'patient_id': patient_id,
+        'date': event.get('date'),
+        'time': event.get('time'),
+        'description': event.get('description'),
+        'status': event.get('status', 'pending'),
+        'source_call_id': source_call_id or event.get('source_call_id')
+    }
+
+def _event_dict(event: JourneyEvent, segment: int) -> dict:
+    return {
+        'segment': segment,
+        'date': event.date,
+        'time': event.time,
+        'description': event.description,
+        'status': event.status
+    }
+
+def _timeline_order():
+    return (JourneyEvent.date, JourneyEvent.time, JourneyEvent.id)
+
+def get_journey_events(db: Session, patient_id: str, skip: int = 0, limit: int = None) -> list:
+    """Get a page of a patient's timeline (sorted by date/time)"""
+    query = db.query(JourneyEvent).filter(
+        JourneyEvent.patient_id == patient_id
+    ).order_by(*_timeline_order()).offset(skip)
+    if limit is not None:
+        query = query.limit(limit)
+    return [_event_dict(e, skip + i + 1) for i, e in enumerate(query.all())]
+
+def count_journey_events(db: Session, patient_id: str) -> int:
+    """Number of events on a patient's timeline"""
+    return db.query(func.count(JourneyEvent.id)).filter(
+        JourneyEvent.patient_id == patient_id
+    ).scalar()
+
+def get_journey_events_for_patients(db: Session, patient_ids: list) -> dict:
+    """Full timelines for several patients in one query (patient_id -> events)"""
+    timelines = {pid: [] for pid in patient_ids}
+    if not patient_ids:
+        return timelines
+    
+    rows = db.query(JourneyEvent).filter(
+        JourneyEvent.patient_id.in_(patient_ids)
+    ).order_by(JourneyEvent.patient_id, *_timeline_order()).all()
+    
+    for e in rows:
+        events = timelines[e.patient_id]
+        events.append(_event_dict(e, len(events) + 1))
+    return timelines
+
+def replace_journey_events(db: Session, patient_id: str, events) -> None:
+    """Replace a patient's whole timeline (caller commits)"""
+    db.query(JourneyEvent).filter(JourneyEvent.patient_id == patient_id).delete(synchronize_session=False)
+    rows = [journey_event_row(patient_id, e) for e in _parse_events(events)]
+    if rows:
+        db.bulk_insert_mappings(JourneyEvent, rows)
+
+def migrate_legacy_journey_events(db: Session, batch_size: int = 500) -> tuple:
+    """
+    Move JSON journey_events blobs into the journey_events table.
+    Safe to re-run: migrated patients have their blob cleared.
+    Unreadable blobs are left in place for manual repair.
+    Returns (migrated patient count, patient_ids with unreadable blobs).
+    """
+    migrated, unreadable, last_id = 0, [], 0
+    while True:
+        patients = db.query(RegisteredPatient).filter(
+            RegisteredPatient.journey_events.isnot(None),
+            RegisteredPatient.id > last_id
+        ).order_by(RegisteredPatient.id).limit(batch_size).all()
+        if not patients:
+            break
+        last_id = patients[-1].id
+        
+        rows, done = [], []
+        for patient in patients:
+            try:
+                events = _parse_events(patient.journey_events)
+                patient_rows = [journey_event_row(patient.patient_id, e) for e in events]
+            except (ValueError, TypeError, AttributeError):
+                print(f"⚠️ Unreadable journey_events for {patient.patient_id}, left in place")
+                unreadable.append(patient.patient_id)
+                continue
+            rows.extend(patient_rows)
+            done.append(patient.id)
+        
+        if rows:
+            db.bulk_insert_mappings(JourneyEvent, rows)
+        if done:
+            db.execute(
+                update(RegisteredPatient)
+                .where(RegisteredPatient.id.in_(done))
+                .values(journey_events=None)
+                .execution_options(synchronize_session=False)
+            )
+        db.commit()
+        migrated += len(done)
+    
+    return migrated, unreadable
+
+
+def _migrate_journey_events_on_init() -> None:
+    """Timelines are read from journey_events only: move any legacy blobs at startup"""
+    from sqlalchemy.orm import sessionmaker
+    db = sessionmaker(bind=engine)()
+    try:
+        count, unreadable = migrate_legacy_journey_events(db)
+        if count:
+            print(f"✓ Migrated journey events of {count} patients")
+        if unreadable:
+            print(f"⚠️ {len(unreadable)} patients keep unreadable journey_events (see scripts/migrate_journey_events.py)")
+    finally:
+        db.close()
+
+
+_migrate_journey_events_on_init()
+
+
 def create_patient(db: Session, patient_data: dict):
     """Create a new registered patient"""
     patient = RegisteredPatient(
@@ -40,11 +303,17 @@ def create_patient(db: Session, patient_data: dict):
         allergies=patient_data.get('allergies'),
         medications=patient_data.get('medications'),
         medical_history=patient_data.get('medical_history'),
-        journey_events=patient_data.get('journey_events', json.dumps([])),
         follow_up_notes=patient_data.get('follow_up_notes', ''),
         clinical_notes=patient_data.get('clinical_notes', '')
     )
     db.add(patient)
+    db.flush()
+    
+    rows = [journey_event_row(patient.patient_id, e)
+            for e in _parse_events(patient_data.get('journey_events'))]
+    if rows:
+        db.bulk_insert_mappings(JourneyEvent, rows)
+    
     db.commit()
     db.refresh(patient)
     return patient
@@ -54,21 +323,51 @@ def get_patient_by_id(db: Session, patient_id: str):
     return db.query(RegisteredPatient).filter(RegisteredPatient.patient_id == patient_id).first()
 
 def get_patient_by_name(db: Session, name: str):
-    """Get patient by name (case-insensitive)"""
-    return db.query(RegisteredPatient).filter(RegisteredPatient.name.ilike(f"%{name}%")).first()
+    """
+    Get patient by name (case/accent-insensitive)
+    Exact normalized match first, then substring match via the search index.
+    """
+    key = normalize_search_text(name)
+    if not key:
+        return None
+    
+    patient = db.query(RegisteredPatient).filter(RegisteredPatient.name_key == key).first()
+    if patient:
+        return patient
+    
+    matches = search_patients(db, name=name, limit=1)
+    return matches[0] if matches else None
 
-def search_patients(db: Session, name: str = None, street: str = None, phone: str = None):
-    """Search patients by multiple criteria"""
+def search_patients(db: Session, name: str = None, street: str = None, phone: str = None, limit: int = 100):
+    """
+    Search patients by multiple criteria (substring match on normalized keys)
+    Terms with 3+ characters use the trigram index, shorter ones a prefix range.
+    """
+    criteria = [
+        ('name_key', RegisteredPatient.name_key, normalize_search_text(name)),
+        ('street_key', RegisteredPatient.street_key, normalize_search_text(street)),
+        ('phone_digits', RegisteredPatient.phone_digits, normalize_phone(phone))
+    ]
+    criteria = [c for c in criteria if c[2]]
+    if not criteria:
+        return []
+    
     query = db.query(RegisteredPatient)
+    fts_terms = []
+    for column_name, attr, key in criteria:
+        if FTS_ENABLED and len(key) >= 3:
+            fts_terms.append(_fts_phrase(column_name, key))
+        else:
+            query = query.filter(_prefix_filter(attr, key))
     
-    if name:
-        query = query.filter(RegisteredPatient.name.ilike(f"%{name}%"))
-    if street:
-        query = query.filter(RegisteredPatient.street.ilike(f"%{street}%"))
-    if phone:
-        query = query.filter(RegisteredPatient.phone.ilike(f"%{phone}%"))
+    if fts_terms:
+        query = query.filter(RegisteredPatient.id.in_(
+            text("SELECT rowid FROM registered_patients_fts WHERE registered_patients_fts MATCH :match")
+            .bindparams(match=" AND ".join(fts_terms))
+            .columns(column("rowid"))
+        ))
     
-    return query.all()
+    return query.order_by(RegisteredPatient.id).limit(limit).all()
 
 def get_all_patients(db: Session, skip: int = 0, limit: int = 100):
     """Get all registered patients"""
@@ -80,6 +379,10 @@ def update_patient(db: Session, patient_id: str, update_data: dict):
     if not patient:
         return None
     
+    update_data = dict(update_data)
+    if 'journey_events' in update_data:
+        replace_journey_events(db, patient_id, update_data.pop('journey_events'))
+    
     for key, value in update_data.items():
         if hasattr(patient, key):
             setattr(patient, key, value)
@@ -89,15 +392,13 @@ def update_patient(db: Session, patient_id: str, update_data: dict):
     db.refresh(patient)
     return patient
 
-def add_journey_event(db: Session, patient_id: str, event: dict):
-    """Add a journey event to patient"""
+def add_journey_event(db: Session, patient_id: str, event: dict, source_call_id: str = None):
+    """Add a journey event to patient (single INSERT, timeline is not rewritten)"""
     patient = get_patient_by_id(db, patient_id)
     if not patient:
         return None
     
-    events = json.loads(patient.journey_events) if patient.journey_events else []
-    events.append(event)
-    patient.journey_events = json.dumps(events)
+    db.add(JourneyEvent(**journey_event_row(patient_id, event, source_call_id)))
     patient.updated_at = datetime.utcnow()
     
     db.commit()
@@ -5,10 +5,31 @@ Complete Processing Pipeline
 from app.services.transcription import transcription_service
 from app.services.soap_extractor import SOAPExtractor
 from app.services.urgency_classifier import urgency_classifier
-from app.services.database import save_call, update_soap, update_urgency, get_call
-from datetime import datetime
+from app.services.database import get_call, save_completed_calls, update_call_stages
+from app.services.call_ids import new_call_id
+from app.services.throttle import triage_activity
+from app.services.work_queue import work_queue, TRIAGE, DEFAULT_PRIORITY
+from app.services import executors
+from app.services.stages import Stage, StageGraph, load_stage_results
+from app.language_markers import analyzer, THRESHOLDS_VERSION
+import os
+import re
 import time
 
+# Bump a stage's version when its prompt or rules change; re-runs and
+# backfills then recompute it for older calls (see stages.py)
+STAGE_VERSIONS = {
+    "transcribe": "1",
+    "prescreen": "1",     # rule-based ESI criteria (urgency_classifier.prescreen)
+    "demographics": "1",  # extract_demographics patterns
+    "markers": THRESHOLDS_VERSION,
+    "soap": "1",          # SOAPExtractor.extract prompt
+    "patient_name": "2",  # extract_patient_name, demographics fallback
+    "urgency": "1",       # ESI criteria tables + urgency prompt
+}
+
+MIN_MARKER_TRANSCRIPT = 5  # characters; shorter transcripts are not analyzed
+
 class ProcessingPipeline:
     """Complete call processing pipeline"""
     
@@ -19,84 +40,72 @@ class ProcessingPipeline:
         #self.soap_extractor.extract(text2)
         # ... without reloading the OpenAI client each time
         self.soap_extractor = SOAPExtractor()
+        
+        # Declared in execution order; dependencies follow from inputs/outputs.
+        # SOAP waits for the rule-based pre-screen (milliseconds), which sets the
+        # work queue priority of SOAP and urgency; demographics and language
+        # markers run while SOAP is in flight.
+        self.stages = StageGraph([
+            Stage("transcribe", STAGE_VERSIONS["transcribe"], ("audio_path", "language"),
+                  ("transcript", "duration"), self._stage_transcribe),
+            Stage("prescreen", STAGE_VERSIONS["prescreen"], ("transcript", "language"), ("prescreen",),
+                  self._stage_prescreen),
+            Stage("demographics", STAGE_VERSIONS["demographics"], ("transcript",), ("demographics",),
+                  self._stage_demographics),
+            Stage("markers", STAGE_VERSIONS["markers"], ("transcript",), ("markers",), self._stage_markers),
+            Stage("soap", STAGE_VERSIONS["soap"], ("transcript", "language"), ("soap",), self._stage_soap,
+                  after=("prescreen",)),
+            Stage("patient_name", STAGE_VERSIONS["patient_name"], ("soap", "demographics"), ("patient_name",),
+                  self._stage_patient_name),
+            Stage("urgency", STAGE_VERSIONS["urgency"], ("transcript", "soap", "language"), ("urgency",),
+                  self._stage_urgency),
+        ])
     
     
     #Full Audio Processing
-    def process_call(self, audio_path: str, language: str = "en") -> dict:
+    @triage_activity.tracked  # background translation waits while calls are triaged
+    def process_call(self, audio_path: str, language: str = "en",
+                     content_hash: str = None, idempotency_key: str = None) -> dict:
         """
         Process an emergency call through the complete pipeline
         
         Args:
             audio_path: Path to audio file
             language: Target language (en, ja, etc.)
+            content_hash, idempotency_key: stored for ingestion dedupe
         
         Returns:
             dict with complete analysis
         """
         start_time = time.time()
-        # Include seconds for uniqueness
-        call_id = f"CALL_{datetime.now().strftime('%d%b_%Hh%M_%S')}" 
+        # Readable timestamp prefix + ULID suffix (unique across workers)
+        call_id = new_call_id("CALL")
         #Console Output for Tracking:-> output: Console Output for Tracking:
         print(f"\n{'='*60}")
         print(f"Processing call: {call_id} (Language: {language})")
         print(f"{'='*60}") #'='*60 creates a line of 60 equal signs
         
         try:
-            # Step 1: Transcribe -> what happens-> Call Whisper service:
-            print(f"\n[1/4] Transcribing audio in {language}...")
-            # If japanese, we use 'ja' for whisper
-            whisper_lang = "ja" if language in ["ja", "jp", "japanese"] else language
-            transcription = transcription_service.transcribe(audio_path, language=whisper_lang)
-            transcript = transcription['text'] # the actual text 
-            duration = transcription['duration']
-            
-            # Save to database
-            save_call(call_id, audio_path, transcript, duration, language=language)
-            print(f"✓ Transcription complete ({len(transcript)} characters)")
+            # Step 1: transcribe, then SOAP -> urgency with the CPU stages alongside (stage graph)
+            print("\n[1/2] Running stages: " + ", ".join(self.stages.by_name))
+            context, stage_results, _ = self.run_stages({"audio_path": audio_path, "language": language})
             
-            # Step 2: Extract SOAP
-            print(f"\n[2/4] Extracting SOAP notes in {language}...")
-            soap = self.soap_extractor.extract(transcript, target_language=language)
-            update_soap(call_id, soap['subjective'], soap['objective'],
-                       soap['assessment'], soap['plan'])
-            print(f"✓ SOAP extraction complete")
-            
-            # Step 3: Classify urgency
-            print(f"\n[3/4] Classifying urgency in {language}...")
-            urgency = urgency_classifier.classify(transcript, soap, language=language) #what happends-> Call hybrid classifier:
-            update_urgency(call_id, urgency['level'], urgency['score'],
-                         urgency['reasoning'])
-            print(f"✓ Urgency classified: {urgency['level']}")
-            
-            # Step 4: Get final result
-            print("\n[4/4] Finalizing...")
-            call = get_call(call_id)
+            # Step 2: One write with the complete call, its stage results and outbox tasks
+            print("\n[2/2] Saving to database...")
+            call = save_completed_calls([{
+                'call_id': call_id,
+                'audio_path': audio_path,
+                'language': language,
+                **stage_columns(context),
+                'content_hash': content_hash,
+                'idempotency_key': idempotency_key,
+                'stage_results': stage_results,
+                'language_markers': context.get('markers')
+            }])[0]
             
             processing_time = time.time() - start_time
             
-            result = {
-                'success': True,
-                'call_id': call.call_id,
-                'language': language,
-                'patient_name': call.patient_name,
-                'doctor_name': call.doctor_name,
-                'disease': call.disease,
-                'processing_time': round(processing_time, 2),
-                'audio_duration': call.audio_duration,
-                'transcript': call.transcript,
-                'soap': {
-                    'subjective': call.soap_subjective,
-                    'objective': call.soap_objective,
-                    'assessment': call.soap_assessment,
-                    'plan': call.soap_plan
-                },
-                'urgency': {
-                    'level': call.urgency_level,
-                    'score': call.urgency_score,
-                    'reasoning': call.urgency_reasoning
-                },
-                'created_at': call.created_at.isoformat()
-            }
+            result = self.build_result(call, processing_time)
             
             print(f"\n✅ Processing complete in {processing_time:.2f}s")
             print(f"{'='*60}\n")
@@ -107,9 +116,190 @@ class ProcessingPipeline:
             print(f"\n✗ Processing failed: {e}")
             raise
     
+    @triage_activity.tracked
+    def analyze_text(self, transcript: str, patient_name: str = None, language: str = "en") -> dict:
+        """
+        AI stages of a text call without any database writes (used by
+        process_text and the batch endpoint, which persists in bulk)
+        
+        Returns:
+            dict with soap, urgency, patient_name, markers and stage_results
+        """
+        context = {"transcript": transcript, "duration": 0.0, "language": language}
+        if patient_name:
+            context["patient_name"] = patient_name  # given: the extraction stage is skipped
+        context, stage_results, _ = self.run_stages(context)
+        return {
+            'soap': context['soap'],
+            'urgency': context['urgency'],
+            'patient_name': context.get('patient_name'),
+            'patient_name_given': bool(patient_name),
+            'markers': context.get('markers'),
+            'stage_results': stage_results
+        }
+    
+    def text_call_record(self, call_id: str, transcript: str, analysis: dict,
+                         doctor_name: str = None, disease: str = None, language: str = "en",
+                         content_hash: str = None, idempotency_key: str = None) -> dict:
+        """Column values of a processed text call (see database.save_completed_calls)"""
+        return {
+            'call_id': call_id,
+            'audio_path': "text_input",
+            'transcript': transcript,
+            'audio_duration': 0.0,
+            'doctor_name': doctor_name,
+            'disease': disease,
+            'language': language,
+            **stage_columns(analysis),
+            'patient_name_given': analysis.get('patient_name_given', False),
+            'content_hash': content_hash,
+            'idempotency_key': idempotency_key,
+            'stage_results': analysis.get('stage_results', []),
+            'language_markers': analysis.get('markers')
+        }
+    
+    # =====================================================
+    # STAGES (see stages.py)
+    # =====================================================
+    
+    def run_stages(self, context: dict, cached: dict = None, rerun=()) -> tuple:
+        """StageGraph.run with independent stages side by side (stage pool)"""
+        return self.stages.run(context, cached, rerun=rerun, submit=self._submit_stage)
+    
+    def _submit_stage(self, func, *args):
+        return executors.submit("stage", func, *args)
+    
+    def _priority(self, context: dict) -> int:
+        """Queue priority of the AI stages: ESI level of the prescreen stage (1 = most urgent)"""
+        prescreen = context.get("prescreen")
+        return prescreen['esi_level'] if prescreen else DEFAULT_PRIORITY
+    
+    def _stage_transcribe(self, context: dict) -> dict:
+        audio_path = context["audio_path"]
+        if not os.path.exists(audio_path):
+            raise ValueError(f"No audio to transcribe ({audio_path})")
+        print(f"\n[transcribe] Transcribing audio in {context['language']}...")
+        # If japanese, we use 'ja' for whisper
+        whisper_lang = "ja" if context["language"] in ["ja", "jp", "japanese"] else context["language"]
+        # Whisper runs in the bounded asr pool (shared with live calls)
+        transcription = executors.submit("asr", transcription_service.transcribe,
+                                         audio_path, language=whisper_lang).result()
+        print(f"✓ Transcription complete ({len(transcription['text'])} characters)")
+        return {"transcript": transcription['text'], "duration": transcription['duration']}
+    
+    def _stage_prescreen(self, context: dict) -> dict:
+        # Rule-based ESI, no AI call; a failure only costs the queue priority
+        try:
+            prescreen = urgency_classifier.prescreen(context["transcript"], language=context["language"])
+            print(f"⚡ Pre-screen: ESI {prescreen['esi_level']} ({prescreen['urgency']})")
+        except Exception as e:
+            print(f"⚠️ Pre-screen failed: {e}")
+            prescreen = None
+        return {"prescreen": prescreen}
+    
+    def _stage_demographics(self, context: dict) -> dict:
+        return {"demographics": extract_demographics(context["transcript"])}
+    
+    def _stage_markers(self, context: dict) -> dict:
+        # None: not analyzed here; the language_markers outbox task retries it
+        transcript = context["transcript"] or ""
+        if len(transcript.strip()) < MIN_MARKER_TRANSCRIPT:
+            return {"markers": None}
+        try:
+            # CPU-bound: cpu process pool (this thread just waits)
+            markers = executors.submit("cpu", analyzer.analyze_transcript, None, transcript, False).result()
+        except Exception as e:
+            print(f"⚠️ Language marker analysis failed: {e}")
+            return {"markers": None}
+        return {"markers": markers}
+    
+    def _stage_soap(self, context: dict) -> dict:
+        # AI stages run in ESI pre-screen priority order
+        print(f"\n[soap] Extracting SOAP notes in {context['language']}...")
+        soap = work_queue.run(self.soap_extractor.extract, context["transcript"],
+                              target_language=context["language"],
+                              lane=TRIAGE, priority=self._priority(context))
+        print(f"✓ SOAP extraction complete")
+        return {"soap": soap}
+    
+    def _stage_patient_name(self, context: dict) -> dict:
+        # A name the operator typed wins (re-runs of SOAP must not replace it)
+        if context.get("patient_name_given") and context.get("patient_name"):
+            return {"patient_name": context["patient_name"]}
+        # The extractor puts Name: ..., Age: ... in the Objective section;
+        # the caller's own words ("my name is ...") are the fallback
+        name = extract_patient_name(context["soap"].get('objective', ''))
+        demographics = context.get("demographics") or {}
+        return {"patient_name": name or demographics.get("name") or context.get("patient_name")}
+    
+    def _stage_urgency(self, context: dict) -> dict:
+        print(f"\n[urgency] Classifying urgency in {context['language']}...")
+        urgency = work_queue.run(urgency_classifier.classify, context["transcript"], context["soap"],
+                                 language=context["language"],
+                                 lane=TRIAGE, priority=self._priority(context)) #what happends-> Call hybrid classifier:
+        print(f"✓ Urgency classified: {urgency['level']}")
+        return {"urgency": urgency}
+    
+    def rerun_stages(self, call_id: str, stages) -> dict:
+        """
+        Re-run stages of a stored call (and everything downstream of them).
+        Upstream outputs come from the call, so e.g. ["urgency"] never runs
+        Whisper or SOAP extraction. A stage whose version and inputs did not
+        change keeps its stored result. Returns {stage: given|skipped|cached|ran}.
+        """
+        call = get_call(call_id)
+        if call is None:
+            raise LookupError(f"Call {call_id} not found")
+        
+        columns, stage_results, report = self.plan_rerun(call, stages, load_stage_results(call_id))
+        update_call_stages([(call_id, columns, stage_results)])
+        print(f"✓ Re-ran stages of {call_id}: {report}")
+        return report
+    
+    def plan_rerun(self, call, stages, cached: dict = None) -> tuple:
+        """
+        rerun_stages without the write (also used by the backfill, which
+        writes in bulk). Returns (columns, stage results, report).
+        """
+        context, stage_results, report = self.run_stages(call_context(call), cached, rerun=stages)
+        produced = {
+            name: context[name]
+            for stage, outcome in report.items() if outcome in ("cached", "ran")
+            for name in self.stages.by_name[stage].outputs
+        }
+        return stage_columns(produced), stage_results, report
+    
+    def build_result(self, call, processing_time: float) -> dict:
+        """API result of a processed call"""
+        return {
+            'success': True,
+            'call_id': call.call_id,
+            'language': call.language,
+            'patient_name': call.patient_name,
+            'doctor_name': call.doctor_name,
+            'disease': call.disease,
+            'processing_time': round(processing_time, 2),
+            'audio_duration': call.audio_duration,
+            'transcript': call.transcript,
+            'soap': {
+                'subjective': call.soap_subjective,
+                'objective': call.soap_objective,
+                'assessment': call.soap_assessment,
+                'plan': call.soap_plan
+            },
+            'urgency': {
+                'level': call.urgency_level,
+                'score': call.urgency_score,
+                'reasoning': call.urgency_reasoning
+            },
+            'created_at': call.created_at.isoformat()
+        }
+    
+    @triage_activity.tracked
     def process_text(self, transcript: str, patient_name: str = None, 
                      doctor_name: str = None, disease: str = None,
-                     language: str = "en") -> dict: #Method 2: process_text() - Skip Audio Transcription
+                     language: str = "en", content_hash: str = None,
+                     idempotency_key: str = None) -> dict: #Method 2: process_text() - Skip Audio Transcription
 
         """
         Process text transcript directly (skip audio transcription)
@@ -117,6 +307,7 @@ class ProcessingPipeline:
         Args:
             transcript: Text transcript of emergency call
             language: Target language
+            content_hash, idempotency_key: stored for ingestion dedupe
         
         Returns:
             dict with complete analysis
@@ -124,91 +315,27 @@ class ProcessingPipeline:
 
         #Performance tracking:
         start_time = time.time()
-        # Include seconds for uniqueness
-        call_id = f"TEXT_{datetime.now().strftime('%d%b_%Hh%M_%S')}"
+        # Readable timestamp prefix + ULID suffix (unique across workers)
+        call_id = new_call_id("TEXT")
         
         print(f"\n{'='*60}")
         print(f"Processing text input: {call_id} (Language: {language})")
         print(f"{'='*60}")
         
         try:
-            # Step 1: Save to database (no audio file)
-            print("\n[1/3] Saving to database...")
-            save_call(call_id, "text_input", transcript, 0.0, patient_name, doctor_name, disease, language=language)
-            print(f"✓ Saved ({len(transcript)} characters) as {call_id}")
-            
-            # Step 2: Extract SOAP
-            soap = self.soap_extractor.extract(transcript, target_language=language)
-            
-            # EXTRACT PATIENT INFO from SOAP Objective
-            # The extractor puts Name: ..., Age: ... in Objective section
-            objective_text = soap.get('objective', '')
-            extracted_name = None
-            
-            # Simple parsing for Name/Age/Address to update DB re is a regex and means:
-            # - Name: ... or 氏名: ... (in Japanese)
-            # - Age: ... or 年齢: ... (in Japanese)
-            # - Address: ... or 住所: ... (in Japanese)
-            #is normaly used to extract information from a string
-            import re
-            
-            # Check for Name
-            name_match = re.search(r'(?:Name|氏名)[:：]\s*(.+)', objective_text, re.IGNORECASE)
-            if name_match:
-                extracted_name = name_match.group(1).strip()
-                if extracted_name.lower() not in ['[not provided]', '[不明]', 'unknown', 'n/a']:
-                    # Update variable for return
-                    if not patient_name:
-                        patient_name = extracted_name
-                        # Update DB call record
-                        from app.services.database import get_db, EmergencyCall
-                        try:
-                            with get_db() as db:
-                                call_obj = db.query(EmergencyCall).filter(EmergencyCall.call_id == call_id).first()
-                                if call_obj:
-                                    call_obj.patient_name = extracted_name
-                                    db.commit()
-                        except Exception as e:
-                            print(f"Failed to update patient name in DB: {e}")
-
-            update_soap(call_id, soap['subjective'], soap['objective'],
-                       soap['assessment'], soap['plan'])
-            print(f"✓ SOAP extraction complete")
+            # Step 1: SOAP + urgency (no DB writes yet)
+            print(f"\n[1/2] Analyzing transcript in {language}...")
+            analysis = self.analyze_text(transcript, patient_name, language)
             
-            # Step 3: Classify urgency
-            print(f"\n[3/3] Classifying urgency in {language}...")
-            urgency = urgency_classifier.classify(transcript, soap, language=language)
-            update_urgency(call_id, urgency['level'], urgency['score'],
-                         urgency['reasoning'])
-            print(f"✓ Urgency classified: {urgency['level']}")
-            
-            # Get final result
-            call = get_call(call_id)
+            # Step 2: One write with the complete call and its outbox tasks
+            print("\n[2/2] Saving to database...")
+            record = self.text_call_record(call_id, transcript, analysis, doctor_name, disease, language,
+                                           content_hash, idempotency_key)
+            call = save_completed_calls([record])[0]
+            print(f"✓ Saved ({len(transcript)} characters) as {call_id}")
             
             processing_time = time.time() - start_time
-            
-            result = {
-                'success': True,
-                'call_id': call.call_id,
-                'patient_name': call.patient_name,
-                'doctor_name': call.doctor_name,
-                'disease': call.disease,
-                'processing_time': round(processing_time, 2),
-                'audio_duration': 0.0,
-                'transcript': call.transcript,
-                'soap': {
-                    'subjective': call.soap_subjective,
-                    'objective': call.soap_objective,
-                    'assessment': call.soap_assessment,
-                    'plan': call.soap_plan
-                },
-                'urgency': {
-                    'level': call.urgency_level,
-                    'score': call.urgency_score,
-                    'reasoning': call.urgency_reasoning
-                },
-                'created_at': call.created_at.isoformat()
-            }
+            result = self.build_result(call, processing_time)
             
             print(f"\n✅ Processing complete in {processing_time:.2f}s")
             print(f"{'='*60}\n")
@@ -220,5 +347,88 @@ class ProcessingPipeline:
             raise
 
 
+def stage_columns(context: dict) -> dict:
+    """EmergencyCall column values of the stage outputs present in a context"""
+    columns = {}
+    if "transcript" in context:
+        columns['transcript'] = context['transcript']
+    if "duration" in context:
+        columns['audio_duration'] = context['duration']
+    if "patient_name" in context:
+        columns['patient_name'] = context['patient_name']
+    if context.get("soap") is not None:
+        soap = context['soap']
+        columns.update({
+            'soap_subjective': soap['subjective'],
+            'soap_objective': soap['objective'],
+            'soap_assessment': soap['assessment'],
+            'soap_plan': soap['plan']
+        })
+    if context.get("urgency") is not None:
+        urgency = context['urgency']
+        columns.update({
+            'urgency_level': urgency['level'],
+            'urgency_score': urgency['score'],
+            'urgency_reasoning': urgency['reasoning']
+        })
+    return columns
+
+
+def call_context(call) -> dict:
+    """Stage context of a stored call (its columns as stage outputs)"""
+    return {
+        "audio_path": call.audio_path,
+        "language": call.language or "en",
+        "transcript": call.transcript,
+        "duration": call.audio_duration or 0.0,
+        "patient_name": call.patient_name,
+        "patient_name_given": bool(call.patient_name_given),
+        "soap": {
+            "subjective": call.soap_subjective,
+            "objective": call.soap_objective,
+            "assessment": call.soap_assessment,
+            "plan": call.soap_plan
+        } if call.soap_subjective is not None else None,
+        "urgency": {
+            "level": call.urgency_level,
+            "score": call.urgency_score,
+            "reasoning": call.urgency_reasoning
+        } if call.urgency_level is not None else None
+    }
+
+
+DEMOGRAPHIC_NAME_PATTERNS = [
+    re.compile(r"\b(?:my|his|her|their|the patient's) name is ([A-Z][a-z]+(?: [A-Z][a-z]+)?)"),
+    re.compile(r"(?:名前は|氏名は)\s*([^\s、。,]+)"),
+]
+DEMOGRAPHIC_AGE_PATTERNS = [
+    re.compile(r"\b(\d{1,3})[- ]years?[- ]old\b", re.IGNORECASE),
+    re.compile(r"\b(?:he|she|they|i)(?:'s|'m| is| am| are) (\d{1,3})\b", re.IGNORECASE),
+    re.compile(r"(\d{1,3})\s*歳"),
+]
+
+
+def extract_demographics(transcript: str) -> dict:
+    """Patient name and age stated in the transcript (regex, no AI call); None if not found"""
+    transcript = transcript or ''
+    name = next((m.group(1) for p in DEMOGRAPHIC_NAME_PATTERNS for m in [p.search(transcript)] if m), None)
+    ages = [int(m.group(1)) for p in DEMOGRAPHIC_AGE_PATTERNS for m in [p.search(transcript)] if m]
+    age = next((a for a in ages if 0 < a < 120), None)
+    return {"name": name, "age": age}
+
+
+def extract_patient_name(objective_text: str):
+    """
+    Patient name from the SOAP Objective section, None if not provided.
+    Matches "Name: ..." or "氏名: ..." (Japanese)
+    """
+    name_match = re.search(r'(?:Name|氏名)[:：]\s*(.+)', objective_text or '', re.IGNORECASE)
+    if name_match:
+        extracted_name = name_match.group(1).strip()
+        if extracted_name.lower() not in ['[not provided]', '[不明]', 'unknown', 'n/a']:
+            return extracted_name
+    return None
+
+
 # Create global instance
 pipeline = ProcessingPipeline()
\ No newline at end of file
@@ -15,11 +15,41 @@ import subprocess
 import tempfile
 import shutil
 import logging
+from app.services.call_ids import new_call_id
+from app.services.throttle import triage_activity
+from app.services.work_queue import work_queue, TRIAGE, DEFAULT_PRIORITY
+from app.services.executors import run_in
+from app.services.live_protocol import decode_audio_frame, ProtocolError, PCM16_SAMPLE_RATE
+from app.services.live_soap import PartialSoapScheduler
+from app.services.soap_extractor import extraction_failed
+from app.services import live_sessions
+from app.services.live_sessions import LiveSessionSweeper, LIVE_SESSION_HEARTBEAT_SECONDS
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)# logging is used to log messages in the console
 logger = logging.getLogger(__name__)
 
+# Live pre-screen per segment: the new segment with a little context
+TRIAGE_WINDOW_SEGMENTS = 3
+
+# Full SOAP extractions tried at end_call before the failure placeholder is saved
+FINAL_SOAP_ATTEMPTS = 2
+
+# Raw PCM16 (protocol v2) is transcribed in segments of this length,
+# like the 5 s WebM chunks of the browser recorder
+PCM16_SEGMENT_SECONDS = 5
+PCM16_SEGMENT_BYTES = PCM16_SEGMENT_SECONDS * PCM16_SAMPLE_RATE * 2
+
+
+def _write_wav(path: str, pcm: bytes) -> None:
+    """Mono 16 kHz PCM16 -> WAV file for Whisper"""
+    with wave.open(path, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(PCM16_SAMPLE_RATE)
+        wav.writeframes(pcm)
+
+
 class RealtimeCallHandler:
     """Handles real-time audio streaming and processing"""
     # constructor is a special method that is called when an object is created we do it because we need to initialize the object with some values
@@ -27,17 +57,35 @@ class RealtimeCallHandler:
         self.pipeline = pipeline #pipeline is not the pipeline of the model but the pipeline of the app is used in the _transcribe_chunk method to process the audio            
         self.db = db_session #db_session is used to save the call in the database
         self.call_id = None #call_id is used to identify the call
-        self.audio_buffer = [] #audio_buffer is used to store the audio chunks
-        self.transcript_buffer = "" #transcript_buffer is used to store the transcript chunks -> chunks are used to process the audio in smaller parts to avoid memory overflow 
-        self.word_count = 0 #word_count is used to count the number of words in the transcript
+        # Transcript as committed segments {"seq", "offset" (s since start), "text", "language"};
+        # the full text is only joined when needed (see transcript), so a long call stays linear
+        self.segments = []
+        self.word_count = 0 #word_count is used to count the number of words in the transcript (kept incrementally)
+        self.sent_segments = 0  # v1: segments already included in an ack
         self.sample_rate = 16000 #sample_rate is used to set the sample rate of the audio
         # is the pipeline same as pipeline.py ? -> no it is not the same but it is used to process the audio in real time in the _transcribe_chunk method that i can finde in realtime_call.py why i have to define pipeline here? cause -> how is she proseccing in real time the audio? > _transcribe_chunk method is used to process the audio in real time in the _transcribe_chunk method that i can finde in realtime_call.py
 
-        # Async Queue for processing chunks
+        # Async Queue for processing chunks: (codec, audio bytes, audio seq)
         self.queue = asyncio.Queue() #queue is used to store the audio chunks
         self.processing_task = None #processing_task is used to store the processing task
         self.is_running = False #is_running is used to check if the call is running
         
+        # Protocol v2 (see live_protocol.py): pushed updates instead of full-state acks
+        self.listener = None  # async callable(dict), set by the WebSocket endpoint
+        self.transcript_seq = 0
+        self.soap_version = 0
+        self.latest_soap = None
+        self.pcm_pending = bytearray()  # raw PCM16 until a segment is long enough
+        self.soap_scheduler = None  # partial SOAP refreshes, created per call
+        self.soap_covered = 0       # number of segments the latest SOAP covers
+        self.soap_language = None
+        self.latest_triage = None   # rule-based ESI pre-screen, kept current per segment
+        
+        # Checkpointed session (see live_sessions.py): this handler serves it while it owns the token
+        self.owner = None
+        self.session_lost = False
+        self.heartbeat_task = None  # renews the session lease while this handler serves the call
+        
         # Check dependencies -> dependencies are the required packages or modules that are needed to run the code -> here we need ffmpeg to convert the audio to wav 
         if not shutil.which('ffmpeg'): #shutil is a module in python that provides a high-level interface for file operations
             logger.error("CRITICAL: FFmpeg not found! Live call will fail.")
@@ -47,19 +95,123 @@ class RealtimeCallHandler:
         if not shutil.which('ffmpeg'): #shutil is a module in python that provides a high-level interface for file operations
             raise RuntimeError("FFmpeg is not installed on the server. Cannot process audio.")
 
-        self.call_id = f"LIVE_{datetime.now().strftime('%d%b_%Hh%M')}" #call_id is used to identify the call
-        self.language = language #language is used to set the language of the call
-        self.audio_buffer = [] #audio_buffer is used to store the audio chunks
-        self.transcript_buffer = "" #transcript_buffer is used to store the transcript chunks
-        self.word_count = 0 #word_count is used to count the number of words in the transcript
-        self.start_time = datetime.now() #start_time is used to store the start time of the call
-        
-        # Start processing worker
-        self.is_running = True           #is_running is used to check if the call is running
-        self.processing_task = asyncio.create_task(self._process_queue()) #processing_task is used to store the processing task
+        self.call_id = new_call_id("LIVE") #call_id is used to identify the call
+        self._restore({
+            "language": language, "started_at": datetime.now(), "segments": [], "word_count": 0,
+            "transcript_seq": 0, "soap": None, "soap_version": 0, "soap_covered": 0,
+            "soap_language": None, "triage": None
+        })
+        self.owner = live_sessions.new_owner()
+        await run_in("db", live_sessions.create_session, self.call_id, self.owner, self.language, self.start_time)
+        self._start_worker()
         
         logger.info(f"🔴 LIVE CALL STARTED: {self.call_id} ({self.language})")
         return self.call_id
+
+    async def resume_call(self, session_id: str) -> Optional[dict]:
+        """Reconnect: take over a checkpointed session (from any worker); None if it is gone"""
+        owner = live_sessions.new_owner()
+        state = await run_in("db", live_sessions.resume_session, session_id, owner)
+        if state is None:
+            return None
+        self.call_id = session_id
+        self.owner = owner
+        self._restore(state)
+        # The restored SOAP covers what it covers; refresh once new words arrive
+        self.soap_scheduler.requested_words = self.word_count if self.latest_soap else 0
+        self._start_worker()
+        
+        logger.info(f"🔁 LIVE CALL RESUMED: {self.call_id} ({self.word_count} words)")
+        return {
+            "call_id": self.call_id,
+            "transcript": self.transcript,
+            "transcript_seq": self.transcript_seq,
+            "word_count": self.word_count,
+            "soap": self.latest_soap,
+            "soap_version": self.soap_version,
+            "language": self.language
+        }
+
+    def _restore(self, state: dict) -> None:
+        """Session state (new, resumed or abandoned call)"""
+        self.language = state["language"] #language is used to set the language of the call
+        self.segments = list(state["segments"])
+        self.sent_segments = 0
+        self.word_count = state["word_count"] or 0
+        self.start_time = state["started_at"] #start_time is used to store the start time of the call
+        self.transcript_seq = state["transcript_seq"] or 0
+        self.soap_version = state["soap_version"] or 0
+        # Checkpoints written before failed extractions were filtered may hold one
+        self.latest_soap = None if extraction_failed(state["soap"]) else state["soap"]
+        self.soap_covered = (state["soap_covered"] or 0) if self.latest_soap else 0
+        self.soap_language = state["soap_language"]
+        self.latest_triage = state["triage"]
+        self.pcm_pending = bytearray()
+        self.session_lost = False
+        self.soap_scheduler = PartialSoapScheduler(self._submit_soap, self._on_partial_soap)
+
+    def _start_worker(self) -> None:
+        self.is_running = True           #is_running is used to check if the call is running
+        self.processing_task = asyncio.create_task(self._process_queue()) #processing_task is used to store the processing task
+        self._start_heartbeat()
+
+    def _start_heartbeat(self) -> None:
+        if self.heartbeat_task is None:
+            self.heartbeat_task = asyncio.create_task(self._heartbeat())
+
+    async def _stop_heartbeat(self) -> None:
+        if self.heartbeat_task:
+            self.heartbeat_task.cancel()
+            try:
+                await self.heartbeat_task
+            except asyncio.CancelledError:
+                pass
+            self.heartbeat_task = None
+
+    async def _heartbeat(self) -> None:
+        """Renew the lease on a timer, independent of transcription and SOAP work"""
+        while not self.session_lost:
+            await asyncio.sleep(LIVE_SESSION_HEARTBEAT_SECONDS)
+            try:
+                owned = await run_in("db", live_sessions.renew_lease, self.call_id, self.owner)
+            except Exception as e:
+                logger.error(f"Lease renewal failed for {self.call_id}: {e}")
+                continue
+            if not owned:
+                self._lose_session()
+
+    def _lose_session(self) -> None:
+        """Another connection (or the sweeper) owns the session now: stop serving it"""
+        logger.warning(f"Session {self.call_id} was taken over elsewhere - stopping this handler")
+        self.session_lost = True
+        self.is_running = False
+        if self.soap_scheduler:
+            self.soap_scheduler.close()
+
+    def _session_state(self) -> dict:
+        return {
+            "language": self.language,
+            "word_count": self.word_count,
+            "transcript_seq": self.transcript_seq,
+            "soap": self.latest_soap,
+            "soap_version": self.soap_version,
+            "soap_covered": self.soap_covered,
+            "soap_language": self.soap_language,
+            "triage": self.latest_triage
+        }
+
+    async def _checkpoint(self, segment: dict = None) -> None:
+        """Persist the session state (with a new segment); stop if another connection took over"""
+        if self.owner is None or self.session_lost:
+            return
+        try:
+            owned = await run_in("db", live_sessions.checkpoint, self.call_id, self.owner,
+                                 self._session_state(), segment)
+        except Exception as e:
+            logger.error(f"Checkpoint failed for {self.call_id}: {e}")
+            return
+        if not owned:
+            self._lose_session()
     
     async def process_audio_chunk(self, audio_data: str) -> dict:
         """
@@ -74,24 +226,126 @@ class RealtimeCallHandler:
                 return {"status": "buffering", "call_id": self.call_id}
             
             # Put in queue
-            await self.queue.put(audio_bytes)
+            await self.queue.put(("webm", audio_bytes, None))
             
             # Return current state (processed async by worker)
-            # We include the CURRENT buffer state so the UI updates (polling effect)
-            return {
+            # The full transcript is only included when it changed since the last ack
+            ack = {
                 "status": "processing",
                 "call_id": self.call_id,
                 "queue_size": self.queue.qsize(),
                 "word_count": self.word_count,
-                "full_transcript": self.transcript_buffer.strip(),
-                "soap": getattr(self, 'latest_soap', None),
+                "soap": self.latest_soap,
                 "language": self.language
             }
+            if len(self.segments) > self.sent_segments:
+                self.sent_segments = len(self.segments)
+                ack["full_transcript"] = self.transcript
+            return ack
             
         except Exception as e:
             logger.error(f"❌ Error receiving audio: {e}")
             return {"status": "error", "error": str(e)}
 
+    async def process_audio_frame(self, frame: bytes) -> dict:
+        """
+        Protocol v2: binary audio frame (header + WebM chunk or raw PCM16).
+        Returns a small ack; transcript and SOAP updates are pushed to the listener.
+        """
+        try:
+            codec, seq, payload = decode_audio_frame(frame)
+        except ProtocolError as e:
+            return {"type": "error", "error": str(e)}
+        
+        if not self.is_running:
+            return {"type": "error", "seq": seq, "error": "Call not started"}
+        
+        if codec == "pcm16":
+            # Raw PCM frames are small: transcribe in segments of PCM16_SEGMENT_SECONDS
+            self.pcm_pending.extend(payload)
+            if len(self.pcm_pending) >= PCM16_SEGMENT_BYTES:
+                await self.queue.put(("pcm16", bytes(self.pcm_pending), seq))
+                self.pcm_pending.clear()
+        elif len(payload) >= 1000:
+            await self.queue.put((codec, payload, seq))
+        
+        return {"type": "ack", "seq": seq, "queue_size": self.queue.qsize()}
+    
+    async def _emit(self, event: dict) -> None:
+        """Push an update to a v2 client (no-op for v1 sessions)"""
+        if self.listener is None:
+            return
+        try:
+            await self.listener(event)
+        except Exception as e:
+            logger.warning(f"Could not push {event.get('type')} update: {e}")
+
+    @property
+    def transcript(self) -> str:
+        """Full transcript, joined on demand"""
+        return self._join(0)
+
+    def _join(self, start: int, end: int = None) -> str:
+        return " ".join(segment["text"] for segment in self.segments[start:end])
+
+    def _priority(self) -> int:
+        """Work queue priority: ESI level of the running pre-screen"""
+        return self.latest_triage['esi_level'] if self.latest_triage else DEFAULT_PRIORITY
+
+    async def _update_triage(self, full: bool = False) -> None:
+        """
+        Rule-based ESI pre-screen (no AI call). Per segment only the last
+        TRIAGE_WINDOW_SEGMENTS are screened and the most urgent level seen is
+        kept (the keyword criteria only ever escalate); full=True screens the
+        whole transcript once (finalization).
+        """
+        from app.services.urgency_classifier import urgency_classifier
+        text = self.transcript if full else self._join(max(0, len(self.segments) - TRIAGE_WINDOW_SEGMENTS))
+        try:
+            triage = urgency_classifier.prescreen(text, language=self.language)
+        except Exception as e:
+            logger.warning(f"Pre-screen failed: {e}")
+            return
+        previous = self.latest_triage
+        if not full and previous and previous['esi_level'] <= triage['esi_level']:
+            return
+        self.latest_triage = triage
+        if previous is None or previous['esi_level'] != triage['esi_level']:
+            logger.info(f"⚡ Live pre-screen: ESI {triage['esi_level']} ({triage['urgency']})")
+            await self._emit({"type": "triage", "esi_level": triage['esi_level'], "urgency": triage['urgency']})
+
+    def _submit_soap(self):
+        """
+        Partial SOAP on the priority work queue (ordered by the ESI pre-screen).
+        The request stays queued as the call goes on and reads the transcript
+        when it starts (_partial_soap), so it sends the newest segments.
+        """
+        return work_queue.submit(self._partial_soap, lane=TRIAGE, priority=self._priority(), label="live_soap")
+
+    def _partial_soap(self):
+        """
+        Work queue worker: once there is a SOAP in this language only the new segments are sent.
+        Returns (soap, covered segments, language) - handler state is only updated on the loop.
+        """
+        language = self.language
+        covered = len(self.segments)
+        if self.latest_soap and self.soap_language == language:
+            soap = self.pipeline.soap_extractor.extract_incremental(
+                self.latest_soap, self._join(self.soap_covered, covered), target_language=language
+            )
+            return (soap, covered, language) if soap is not None else None
+        soap = self.pipeline.soap_extractor.extract(self._join(0, covered), target_language=language)
+        # A failed extraction is not a partial SOAP: never shown or built upon
+        return None if extraction_failed(soap) else (soap, covered, language)
+
+    async def _on_partial_soap(self, result: tuple) -> None:
+        soap, self.soap_covered, self.soap_language = result
+        if soap != self.latest_soap:
+            self.latest_soap = soap
+            self.soap_version += 1
+            await self._emit({"type": "soap", "version": self.soap_version, "soap": soap})
+        await self._checkpoint()
+
     async def _process_queue(self):
         """Background worker that processes audio chunks one by one"""
         logger.info("Worker started")
@@ -99,13 +353,15 @@ class RealtimeCallHandler:
         while self.is_running or not self.queue.empty():
             try:
                 # Get next chunk
+                if self.session_lost:
+                    break
                 try:
-                    audio_bytes = await asyncio.wait_for(self.queue.get(), timeout=1.0)
+                    codec, audio_bytes, seq = await asyncio.wait_for(self.queue.get(), timeout=1.0)
                 except asyncio.TimeoutError:
                     continue
                 
                 # PROCESS CHUNK (No batching, as WebM files cannot be simply concatenated)
-                await self._transcribe_chunk(audio_bytes) #_transcribe_chunk is used to transcribe the audio in real time
+                await self._transcribe_chunk(audio_bytes, codec, seq) #_transcribe_chunk is used to transcribe the audio in real time
                 self.queue.task_done() #task_done is used to mark the task as done
                 
                 # Drain queue if backing up (drop intermediate? No, process them)
@@ -117,32 +373,39 @@ class RealtimeCallHandler:
                 import traceback
                 traceback.print_exc()
 
-    async def _transcribe_chunk(self, audio_bytes):
+    async def _transcribe_chunk(self, audio_bytes, codec: str = "webm", seq: int = None):
         """Heavy lifting: Save file, ffmpeg, transcribe (in thread)"""
         try:
-            # Create temp files
-            with tempfile.NamedTemporaryFile(suffix=".webm", delete=False) as temp_webm:
-                temp_webm.write(audio_bytes)
-                webm_path = temp_webm.name
-            
-            wav_path = webm_path + ".wav"
-            
-            # Non-blocking FFmpeg
-            # We run this in a threadexecutor to avoid blocking the event loop
-            await asyncio.to_thread(self._convert_audio, webm_path, wav_path)
+            if codec == "pcm16":
+                # Raw PCM only needs a WAV header, no ffmpeg
+                webm_path = None
+                fd, wav_path = tempfile.mkstemp(suffix=".wav")
+                os.close(fd)
+                await run_in("live_asr", _write_wav, wav_path, audio_bytes)
+            else:
+                # Create temp files
+                with tempfile.NamedTemporaryFile(suffix=".webm", delete=False) as temp_webm:
+                    temp_webm.write(audio_bytes)
+                    webm_path = temp_webm.name
+                
+                wav_path = webm_path + ".wav"
+                
+                # Non-blocking FFmpeg
+                # We run this in a threadexecutor to avoid blocking the event loop
+                await run_in("live_asr", self._convert_audio, webm_path, wav_path)
             
             if not os.path.exists(wav_path):
                 logger.error("WAV file creation failed")
                 return None
 
             # Non-blocking Transcription
-            from app.services.transcription import transcription_service
+            from app.services.transcription import live_transcription_service
             
             # Use japanese code for whisper if needed
             whisper_lang = "ja" if self.language in ["ja", "jp", "japanese"] else self.language
 
-            # Run transcribe in thread
-            result = await asyncio.to_thread(transcription_service.transcribe, wav_path, language=whisper_lang)
+            # Live calls have their own pool and model: an upload never delays a chunk
+            result = await run_in("live_asr", live_transcription_service.transcribe, wav_path, language=whisper_lang)
             
             # Update State (Thread-safe enough for Python's GIL + Asyncio)
             new_text = result['text'].strip()
@@ -157,20 +420,38 @@ class RealtimeCallHandler:
                  self.language = 'en'
 
             if new_text:
-                self.transcript_buffer += " " + new_text
-                self.word_count = len(self.transcript_buffer.split())
+                self.transcript_seq += 1
+                segment = {
+                    "seq": self.transcript_seq,
+                    "offset": round((datetime.now() - self.start_time).total_seconds(), 2),
+                    "text": new_text,
+                    "language": self.language
+                }
+                self.segments.append(segment)
+                self.word_count += len(new_text.split())
                 logger.info(f"✓ UPDATE [{self.language}]: {new_text}")
-            
-            # Partial SOAP
-            if self.word_count >= 10 and self.word_count % 10 == 0:
-                 # Run in thread as it might be slow
-                 soap = await asyncio.to_thread(self.pipeline.soap_extractor.extract, self.transcript_buffer, target_language=self.language)
-                 # We might want to store this soap to return it later
-                 self.latest_soap = soap
+                
+                # Committed: checkpoint before anyone is told about it
+                await self._checkpoint({**segment, "audio_seq": seq})
+                # v2: only the new segment goes over the wire
+                await self._emit({
+                    "type": "transcript",
+                    "seq": self.transcript_seq,
+                    "audio_seq": seq,
+                    "offset": segment["offset"],
+                    "text": new_text,
+                    "word_count": self.word_count,
+                    "language": self.language
+                })
+                
+                # Triage and a recent SOAP stay on record, so end_call has little left to do
+                await self._update_triage()
+                # Partial SOAP runs in the background when due (debounced, see live_soap.py)
+                self.soap_scheduler.notify(self.word_count)
 
             # Cleanup
             try:
-                if os.path.exists(webm_path):
+                if webm_path and os.path.exists(webm_path):
                     os.remove(webm_path)
                 if os.path.exists(wav_path):
                     os.remove(wav_path)
@@ -183,7 +464,7 @@ class RealtimeCallHandler:
             logger.error(f"Transcribe chunk error: {e}")
             # Ensure cleanup happens even on error
             try:
-                if 'webm_path' in locals() and os.path.exists(webm_path):
+                if locals().get('webm_path') and os.path.exists(webm_path):
                     os.remove(webm_path)
                 if 'wav_path' in locals() and os.path.exists(wav_path):
                     os.remove(wav_path)
@@ -208,6 +489,48 @@ class RealtimeCallHandler:
         Finalize call and run complete analysis.
         Waits for queue to finish first.
         """
+        if self.owner is None:
+            return {"status": "error", "error": "Call not started"}
+        
+        # v2: what is on record right now is dispatchable before the final analysis
+        await self._emit({
+            "type": "summary",
+            "final": False,
+            "soap": self.latest_soap,
+            "triage": self.latest_triage,
+            "word_count": self.word_count
+        })
+        await self._stop_processing()
+        
+        try:
+            if self.session_lost or not await run_in("db", live_sessions.claim_for_finalize, self.call_id, self.owner):
+                return {"status": "error", "error": "Call was resumed on another connection"}
+            return await self._finalize_session()
+        finally:
+            await self._stop_heartbeat()
+
+    async def suspend(self) -> None:
+        """
+        Client disconnected: finish the audio already received and keep the
+        session for LIVE_SESSION_GRACE_SECONDS. A reconnect resumes it; otherwise
+        the sweeper finalizes it.
+        """
+        try:
+            await self._stop_processing()
+            if self.session_lost:
+                return
+            await self._checkpoint()
+            if await run_in("db", live_sessions.suspend_session, self.call_id, self.owner):
+                logger.info(f"⏸️  LIVE CALL SUSPENDED: {self.call_id}")
+        finally:
+            await self._stop_heartbeat()
+
+    async def _stop_processing(self) -> None:
+        """Transcribe what is queued, stop the worker and the partial SOAP refreshes"""
+        # v2: transcribe the PCM tail (anything longer than half a second)
+        if len(self.pcm_pending) >= PCM16_SAMPLE_RATE:
+            await self.queue.put(("pcm16", bytes(self.pcm_pending), None))
+        self.pcm_pending.clear()
         self.is_running = False
         
         # Wait for remaining items
@@ -226,50 +549,137 @@ class RealtimeCallHandler:
                 await self.processing_task
             except asyncio.CancelledError:
                 pass
-            
-        return await self._finalize_call_logic(language=self.language)
+        
+        if self.soap_scheduler:
+            # A running partial covers most of the call: finalization builds on it
+            self.soap_scheduler.close()
+            await self.soap_scheduler.wait()
+            logger.info(f"Partial SOAP: {self.soap_scheduler.stats()}")
+
+    async def _finalize_session(self) -> dict:
+        """Final analysis of a session claimed for finalization (the heartbeat holds the lease)"""
+        self._start_heartbeat()
+        try:
+            with triage_activity.busy():
+                result = await self._finalize_call_logic(language=self.language)
+        finally:
+            await self._stop_heartbeat()
+        completed = result.get("status") == "completed" or result.get("error") == "No transcript"
+        await run_in("db", live_sessions.finish_session, self.call_id, self.owner, completed)
+        return result
+
+    async def _final_soap(self, language: str, priority: int) -> dict:
+        """Last partial SOAP, updated with the transcript it does not cover yet"""
+        if self.latest_soap and self.soap_language == language:
+            new_segment = self._join(self.soap_covered)
+            if not new_segment.strip():
+                logger.info("Final SOAP: last partial is up to date")
+                return self.latest_soap
+            soap = await asyncio.wrap_future(work_queue.submit(
+                self.pipeline.soap_extractor.extract_incremental, self.latest_soap, new_segment,
+                target_language=language, lane=TRIAGE, priority=priority
+            ))
+            if soap:
+                return soap
+        for attempt in range(FINAL_SOAP_ATTEMPTS):
+            soap = await asyncio.wrap_future(work_queue.submit(
+                self.pipeline.soap_extractor.extract, self.transcript, target_language=language,
+                lane=TRIAGE, priority=priority
+            ))
+            if not extraction_failed(soap):
+                break
+            logger.warning(f"Final SOAP extraction failed (attempt {attempt + 1}/{FINAL_SOAP_ATTEMPTS})")
+        return soap
 
     async def _finalize_call_logic(self, language: str = "en"):
         # ... (Previous end_call logic, but async where needed) ...
         try:
             logger.info(f"⏹️  ENDING CALL: {self.call_id} (Final language: {language})")
             
-            if not self.transcript_buffer.strip():
+            if not self.segments:
                 return {"status": "error", "error": "No transcript"}
             
-            # Final Analysis (Threaded)
-            soap = await asyncio.to_thread(self.pipeline.soap_extractor.extract, self.transcript_buffer, target_language=language)
+            started = datetime.now()
+            transcript = self.transcript
+            await self._update_triage(full=True)
+            priority = self._priority()
             
+            # Final Analysis (priority work queue, ordered by ESI pre-screen)
             from app.services.urgency_classifier import urgency_classifier
-            urgency = await asyncio.to_thread(urgency_classifier.classify, self.transcript_buffer, soap, language=language)
+            if self.latest_soap and self.soap_language == language:
+                # The classifier reads the whole transcript and the last partial SOAP is at
+                # most one refresh behind, so urgency does not wait for the final SOAP update
+                soap, urgency = await asyncio.gather(
+                    self._final_soap(language, priority),
+                    asyncio.wrap_future(work_queue.submit(
+                        urgency_classifier.classify, transcript, self.latest_soap, language=language,
+                        lane=TRIAGE, priority=priority
+                    ))
+                )
+            else:
+                soap = await self._final_soap(language, priority)
+                urgency = await asyncio.wrap_future(work_queue.submit(
+                    urgency_classifier.classify, transcript, soap, language=language,
+                    lane=TRIAGE, priority=priority
+                ))
             
-            # DB Storage (Threaded)
-            from app.services.database import save_call, update_soap, update_urgency
+            # DB Storage: one transaction with the post-call tasks (db pool)
+            from app.services.database import save_completed_calls
+            from app.services.pipeline import extract_patient_name
             
-            duration = (datetime.now() - self.start_time).total_seconds()
+            duration = (started - self.start_time).total_seconds()
             
-            await asyncio.to_thread(
-                save_call, self.call_id, "realtime_call", self.transcript_buffer, duration, language=language
-            )
-            
-            await asyncio.to_thread(
-                update_soap, self.call_id, soap['subjective'], soap['objective'], soap['assessment'], soap['plan']
-            )
-            
-            await asyncio.to_thread(
-                update_urgency, self.call_id, urgency['level'], urgency['score'], urgency['reasoning']
-            )
+            await run_in("db", save_completed_calls, [{
+                'call_id': self.call_id,
+                'audio_path': "realtime_call",
+                'transcript': transcript,
+                'audio_duration': duration,
+                'patient_name': extract_patient_name(soap['objective']),
+                'language': language,
+                'soap_subjective': soap['subjective'],
+                'soap_objective': soap['objective'],
+                'soap_assessment': soap['assessment'],
+                'soap_plan': soap['plan'],
+                'urgency_level': urgency['level'],
+                'urgency_score': urgency['score'],
+                'urgency_reasoning': urgency['reasoning']
+            }])
+            logger.info(f"✓ Call finalized in {(datetime.now() - started).total_seconds():.2f}s")
             
             return {
                 "status": "completed",
                 "call_id": self.call_id,
-                "transcript": self.transcript_buffer.strip(),
+                "transcript": transcript,
                 "soap": soap,
                 "urgency": urgency,
                 "word_count": self.word_count,
+                "partial_soap": self.soap_scheduler.stats() if self.soap_scheduler else None,
                  "completed_at": datetime.now().isoformat()
             }
             
         except Exception as e:
             logger.error(f"Error finalizing: {e}")
-            return {"status": "error", "error": str(e)}
\ No newline at end of file
+            return {"status": "error", "error": str(e)}
+
+
+async def finalize_abandoned_session(session_id: str, owner: str) -> None:
+    """Sweeper: finalize a session nobody serves anymore, from its checkpoint"""
+    from app.services.pipeline import pipeline
+    from app.services.database import get_call
+    
+    state = await run_in("db", live_sessions.load_session, session_id)
+    if state is None:
+        return
+    handler = RealtimeCallHandler(pipeline, None)
+    handler.call_id = session_id
+    handler.owner = owner
+    handler._restore(state)
+    if await run_in("db", get_call, session_id):
+        # Saved before the worker died, only the checkpoint was left behind
+        await run_in("db", live_sessions.finish_session, session_id, owner, True)
+        return
+    result = await handler._finalize_session()
+    logger.info(f"Abandoned session {session_id}: {result.get('status')}")
+
+
+live_session_sweeper = LiveSessionSweeper(finalize_abandoned_session)
@@ -0,0 +1,70 @@
+"""
+Response Cache
+In-process LRU of encoded JSON responses plus strong ETags for the
+dashboard's polled endpoints (/api/calls, /api/calls/{call_id}).
+
+ETags are derived from database state (the call's row version, or the
+count/max(updated_at) fingerprint of the list), so they stay correct with
+several API processes; the LRU only saves the query and JSON encoding.
+"""
+import os
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+
+LIST_KEY = "__list__"
+
+
+def make_etag(*parts) -> str:
+    """Strong ETag from the values that determine a response"""
+    digest = hashlib.sha1("\x1f".join(str(p) for p in parts).encode("utf-8")).hexdigest()
+    return f'"{digest[:32]}"'
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """If-None-Match check (comma-separated list, '*' and W/ prefixes allowed)"""
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or any(tag.removeprefix("W/") == etag for tag in candidates)
+
+
+def encode_json(body: dict) -> bytes:
+    return json.dumps(body, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class ResponseCache:
+    """Thread-safe LRU: (scope, *key) -> (etag, encoded body)"""
+
+    def __init__(self, max_entries: int = 512):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key: tuple):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+            return entry
+
+    def put(self, key: tuple, etag: str, body: bytes) -> None:
+        with self.lock:
+            self.entries[key] = (etag, body)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def invalidate(self, call_id: str) -> None:
+        """Drop cached responses of a call and every cached list"""
+        with self.lock:
+            for key in [k for k in self.entries if k[0] in (call_id, LIST_KEY)]:
+                del self.entries[key]
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+
+
+response_cache = ResponseCache(int(os.getenv("RESPONSE_CACHE_SIZE", "512")))
@@ -2,11 +2,21 @@
 SOAP Extraction Service - OpenAI Version
 """
 import os # is used to access environment variables
+from typing import Optional
 from openai import OpenAI # is used to access the OpenAI API
 from dotenv import load_dotenv # is used to load environment variables from a .env file
 
 load_dotenv() # is used to load environment variables from a .env file
 
+# Placeholder text of every section when extract() fails
+EXTRACTION_FAILED = "Extraction failed"
+
+
+def extraction_failed(soap: Optional[dict]) -> bool:
+    """True for a missing SOAP or the placeholder extract() returns on failure"""
+    return not soap or soap.get("subjective") == EXTRACTION_FAILED
+
+
 class SOAPExtractor:
     """Extract SOAP notes using OpenAI GPT"""
     
@@ -21,9 +31,8 @@ class SOAPExtractor:
         
         print(f"✓ SOAP Extractor initialized (OpenAI {self.model})")
     
-    def extract(self, transcript: str, target_language: str = "en") -> dict:
-        print(f"Extracting SOAP notes (Target Language: {target_language})...")
-        
+    def _language_rules(self, target_language: str) -> tuple:
+        """(lang_name, missing_term, labels, strict_instruction, extraction_guidance) for the prompts"""
         is_japanese = target_language in ["ja", "jp", "japanese"]
         lang_name = "JAPANESE" if is_japanese else "ENGLISH"
         
@@ -69,6 +78,12 @@ IMPORTANT: Actively extract information from the conversation:
 - Phone: Look for phone number patterns
 - Name: Look for "my name is", "this is", person references
 If mentioned in the conversation, replace [Not provided] with actual values."""
+        return lang_name, missing_term, labels, strict_instruction, extraction_guidance
+
+    def extract(self, transcript: str, target_language: str = "en") -> dict:
+        print(f"Extracting SOAP notes (Target Language: {target_language})...")
+        
+        lang_name, missing_term, labels, strict_instruction, extraction_guidance = self._language_rules(target_language)
 
         prompt = f"""You are an expert emergency medical dispatcher assistant. 
 Analyze this 911 call transcript and extract clinical SOAP notes in {lang_name}.
@@ -132,12 +147,80 @@ In the OBJECTIVE (O) section, you MUST format the patient details using these ex
         except Exception as e:
             print(f"✗ SOAP extraction failed: {e}")
             return {
-                "subjective": "Extraction failed",
-                "objective": "Extraction failed",
-                "assessment": "Extraction failed",
-                "plan": "Extraction failed"
+                "subjective": EXTRACTION_FAILED,
+                "objective": EXTRACTION_FAILED,
+                "assessment": EXTRACTION_FAILED,
+                "plan": EXTRACTION_FAILED
             }
-    
+
+    def extract_incremental(self, previous_soap: dict, new_segment: str, target_language: str = "en") -> Optional[dict]:
+        """
+        Update SOAP notes with a new transcript segment (live calls).
+        The prompt holds the previous notes and only the new text, so its size
+        stays flat over a long call. Returns None if the update failed; the
+        caller resends the segment or falls back to extract().
+        """
+        print(f"Updating SOAP notes with {len(new_segment.split())} new words (Target Language: {target_language})...")
+
+        lang_name, missing_term, labels, strict_instruction, extraction_guidance = self._language_rules(target_language)
+
+        prompt = f"""You are an expert emergency medical dispatcher assistant.
+You keep the SOAP notes of an ongoing 911 call up to date in {lang_name}.
+Below are the CURRENT SOAP NOTES and the NEW part of the transcript since they were written.
+
+{strict_instruction}
+
+{extraction_guidance}
+
+RULES FOR THE UPDATE:
+- Keep every detail of the current notes unless the new transcript corrects it.
+- Add new symptoms, findings and patient details from the new transcript.
+- Revise the assessment and plan if the new information changes them.
+- If any piece of information is still missing, use exactly "{missing_term}".
+- In the OBJECTIVE (O) section keep these exact labels:
+{labels}
+
+CURRENT SOAP NOTES:
+S: {previous_soap.get('subjective', '')}
+O: {previous_soap.get('objective', '')}
+A: {previous_soap.get('assessment', '')}
+P: {previous_soap.get('plan', '')}
+
+NEW TRANSCRIPT SEGMENT:
+{new_segment}
+
+Return the COMPLETE updated SOAP notes in {lang_name}:
+S: [Subjective - all in {lang_name}]
+O: [Objective with strictly {lang_name} labels as shown above]
+A: [Assessment - all in {lang_name}]
+P: [Plan - all in {lang_name}]
+"""
+
+        try:
+            response = self.client.chat.completions.create(
+                model=self.model,
+                messages=[
+                    {"role": "system", "content": f"You are an expert emergency medical dispatcher. You ONLY write in {lang_name}. Never mix languages. You update existing notes without losing information."},
+                    {"role": "user", "content": prompt}
+                ],
+                temperature=self.temperature,
+                max_tokens=500
+            )
+
+            content = response.choices[0].message.content.strip()
+            soap = self._parse_soap_response(content)
+            # A section the model left out keeps its previous text
+            for section, text in soap.items():
+                if not text:
+                    soap[section] = previous_soap.get(section, "")
+
+            print(f"✓ SOAP update complete")
+            return soap
+
+        except Exception as e:
+            print(f"✗ SOAP update failed: {e}")
+            return None
+
     def _parse_soap_response(self, content: str) -> dict:
         soap = {
             "subjective": "",
@@ -279,15 +362,15 @@ OUTPUT FORMAT (Strictly JSON):
 
     def translate_batch(self, texts: list, target_language: str) -> list:
         """Translate multiple snippets in one call to save time/cost"""
+        import json
+        
         if not texts: return []
         
         # Filter out empty or N/A strings but keep indices
-        to_translate = []
-        indices = []
+        to_translate = {}
         for i, t in enumerate(texts):
             if t and len(t.strip()) > 1 and t.lower() != "n/a" and t.lower() != "unassigned":
-                to_translate.append(t)
-                indices.append(i)
+                to_translate[str(i)] = t
         
         if not to_translate:
             return texts
@@ -296,30 +379,95 @@ OUTPUT FORMAT (Strictly JSON):
         lang_name = "JAPANESE" if is_japanese else "ENGLISH"
         
         try:
-            # Create a structured prompt
-            delimiter = "|||"
-            input_text = delimiter.join(to_translate)
-            
+            # JSON in / JSON out keyed by index (no delimiter that the model can drop or merge)
             response = self.client.chat.completions.create(
                 model=self.model,
                 messages=[
-                    {"role": "system", "content": f"You are a medical translator. Translate each section separated by '{delimiter}' into {lang_name}. Return the translations separated by EXACTLY the same delimiter '{delimiter}'. Do not add numbering or extra text."},
-                    {"role": "user", "content": input_text}
+                    {"role": "system", "content": f"You are a medical translator. Translate every value of the JSON object into {lang_name}. Respond ONLY with a JSON object with exactly the same keys."},
+                    {"role": "user", "content": json.dumps(to_translate, ensure_ascii=False)}
                 ],
-                temperature=0.1
+                temperature=0.1,
+                response_format={ "type": "json_object" }
             )
             
-            results = response.choices[0].message.content.strip().split(delimiter)
+            results = json.loads(response.choices[0].message.content)
             
-            # Map back to original list
+            # Map back to original list (missing keys keep the original text)
             final_list = list(texts)
-            for j, res in enumerate(results):
-                if j < len(indices) and j < len(results):
-                    final_list[indices[j]] = res.strip()
+            for key, res in results.items():
+                if key in to_translate and isinstance(res, str):
+                    final_list[int(key)] = res.strip()
             
             return final_list
         except Exception as e:
             print(f"Batch translation failed: {e}")
             return texts
 
+    def localize_batch(self, items: list, target_language: str) -> dict:
+        """
+        Localize the short fields of many calls in ONE AI call (list views).
+        
+        Args:
+            items: dicts with id, patient_name, disease, reasoning,
+                   subjective, objective, assessment, plan
+        
+        Returns:
+            {id: localized fields} - calls missing from the response are left out
+        """
+        import json
+        
+        if not items: return {}
+        
+        is_japanese = target_language in ["ja", "jp", "japanese"]
+        lang_name = "JAPANESE" if is_japanese else "ENGLISH"
+        
+        # Same label rules as localize_call_data
+        if is_japanese:
+            labels = "氏名:, 年齢:, 住所:, 電話:, 血液型:"
+            missing = "[不明]"
+        else:
+            labels = "Name:, Age:, Address:, Phone:, Blood:"
+            missing = "[Not provided]"
+        
+        fields = ["patient_name", "disease", "reasoning", "subjective", "objective", "assessment", "plan"]
+        calls = {str(item["id"]): {f: item.get(f) or "" for f in fields} for item in items}
+
+        prompt = f"""You are a medical localization expert.
+Localize the following emergency calls into {lang_name}.
+
+TASK:
+1. Translate every field of every call (SOAP notes and metadata).
+2. EXTREMELY IMPORTANT: In the objective field, you MUST use these exact labels: {labels}.
+3. If information is missing, use "{missing}".
+4. Keep the call ids and field names unchanged.
+5. Return ONLY a JSON object.
+
+INPUT DATA:
+{{"calls": {json.dumps(calls, ensure_ascii=False)}}}
+
+OUTPUT FORMAT (Strictly JSON):
+{{"calls": {{"<call id>": {{"patient_name": "...", "disease": "...", "reasoning": "...", "subjective": "...", "objective": "...", "assessment": "...", "plan": "..."}}}}}}
+"""
+        try:
+            response = self.client.chat.completions.create(
+                model=self.model,
+                messages=[
+                    {"role": "system", "content": f"You are a medical translation API. Respond ONLY with valid JSON in {lang_name}."},
+                    {"role": "user", "content": prompt}
+                ],
+                temperature=0.1,
+                response_format={ "type": "json_object" }
+            )
+            
+            result = json.loads(response.choices[0].message.content).get("calls", {})
+            localized = {
+                call_id: data for call_id, data in result.items()
+                if call_id in calls and isinstance(data, dict)
+            }
+            print(f"✓ Batch localization of {len(localized)}/{len(calls)} calls to {lang_name} complete")
+            return localized
+        except Exception as e:
+            print(f"Batch localization failed: {e}")
+            return {}
+
 soap_extractor = SOAPExtractor()
@@ -0,0 +1,226 @@
+"""
+Pipeline Stages
+Call processing as a declarative stage graph instead of hard-wired steps.
+
+A Stage reads named values from the call context (its inputs) and returns
+named values (its outputs). Stages are declared in execution order; a stage
+depends on the stages producing its inputs. Every run is stored in
+stage_results with the stage version and a hash of its inputs:
+
+- A stage whose stored version and input hash match is not run again.
+- Bump a stage's version when its prompt or rules change. Re-running a
+  call with rerun={"urgency"} runs urgency and everything downstream of
+  it; upstream outputs (transcript, SOAP) are taken from the call, so a
+  re-triage never touches Whisper or the SOAP prompt.
+- Stages run as soon as their inputs exist: with a submit function,
+  independent stages (e.g. language markers next to the SOAP request) run
+  concurrently. `after` orders a stage behind others whose outputs it only
+  peeks at (SOAP waits for the pre-screen that sets its queue priority);
+  those outputs are not part of its input hash.
+"""
+import json
+import time
+import hashlib
+from concurrent.futures import wait, FIRST_COMPLETED
+from datetime import datetime
+from app.services.database import get_db
+from app.models.stage_result import StageResult
+
+
+class Stage:
+    """One pipeline step: run(context) -> dict with its outputs"""
+
+    def __init__(self, name: str, version: str, inputs: tuple, outputs: tuple, run, after: tuple = ()):
+        self.name = name
+        self.version = version
+        self.inputs = tuple(inputs)
+        self.outputs = tuple(outputs)
+        self.run = run
+        self.after = tuple(after)  # stages that must finish first without being inputs
+
+    def __repr__(self):
+        return f"<Stage {self.name} v{self.version}>"
+
+
+class StageGraph:
+    """Stages in execution order, with their dependencies"""
+
+    def __init__(self, stages):
+        self.stages = list(stages)
+        self.by_name = {stage.name: stage for stage in self.stages}
+        self.producers = {}  # output -> stage name
+        declared_outputs = {output for stage in self.stages for output in stage.outputs}
+        declared = set()
+        for stage in self.stages:
+            for name in stage.inputs:
+                if name in declared_outputs and name not in self.producers:
+                    raise ValueError(f"Stage '{stage.name}' is declared before the stage producing '{name}'")
+            for name in stage.after:
+                if name not in declared:
+                    raise ValueError(f"Stage '{stage.name}' runs after '{name}', which is not declared before it")
+            declared.add(stage.name)
+            for name in stage.outputs:
+                if name in self.producers:
+                    raise ValueError(f"'{name}' is produced by both '{self.producers[name]}' and '{stage.name}'")
+                self.producers[name] = stage.name
+
+    def versions(self) -> dict:
+        return {stage.name: stage.version for stage in self.stages}
+
+    def dependencies(self, name: str) -> set:
+        """Stages producing the inputs of a stage, and the stages it runs after"""
+        stage = self.by_name[name]
+        return {self.producers[i] for i in stage.inputs if i in self.producers} | set(stage.after)
+
+    def downstream(self, names) -> set:
+        """The given stages and every stage depending on them"""
+        unknown = set(names) - set(self.by_name)
+        if unknown:
+            raise ValueError(f"Unknown stage(s): {', '.join(sorted(unknown))} (expected {', '.join(self.by_name)})")
+        selected = set(names)
+        for stage in self.stages:  # declaration order is a topological order
+            if self.dependencies(stage.name) & selected:
+                selected.add(stage.name)
+        return selected
+
+    def input_hash(self, stage: Stage, context: dict) -> str:
+        values = {name: context.get(name) for name in stage.inputs}
+        payload = json.dumps(values, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def upstream(self, names) -> set:
+        """The given stages and every stage they depend on"""
+        needed = set(names)
+        for stage in reversed(self.stages):
+            if stage.name in needed:
+                needed |= self.dependencies(stage.name)
+        return needed
+
+    def run(self, context: dict, cached: dict = None, rerun=(), submit=None) -> tuple:
+        """
+        Run the stages whose outputs are missing from the context, or which are
+        in `rerun` or downstream of it. With `rerun`, stages the selection does
+        not need are skipped. Stored results (cached: stage ->
+        {version, input_hash, output}) are reused when version and inputs match.
+
+        submit(func, *args) -> Future runs every stage as soon as the stages
+        producing its inputs are done (e.g. CPU-only stages while an LLM stage
+        is in flight); without it the stages run one by one.
+        Returns (context, new stage results, {stage: "given" | "skipped" | "cached" | "ran"}).
+        """
+        cached = cached or {}
+        selected = self.downstream(rerun) if rerun else set()
+        needed = self.upstream(selected) if rerun else set(self.by_name)
+        context = dict(context)
+        results = []
+        report = {}
+
+        pending = []
+        for stage in self.stages:
+            if stage.name not in needed:
+                report[stage.name] = "skipped"
+            elif stage.name not in selected and all(context.get(o) is not None for o in stage.outputs):
+                report[stage.name] = "given"
+            else:
+                pending.append(stage)
+
+        running = {}  # future -> stage
+        while pending or running:
+            unfinished = {s.name for s in pending} | {s.name for s in running.values()}
+            ready = [s for s in pending if not self.dependencies(s.name) & unfinished]
+            for stage in ready:
+                pending.remove(stage)
+                missing = [i for i in stage.inputs if i not in context]
+                if missing:
+                    raise ValueError(f"Stage '{stage.name}' is missing input(s): {', '.join(missing)}")
+
+                input_hash = self.input_hash(stage, context)
+                previous = cached.get(stage.name)
+                if previous and previous["version"] == stage.version and previous["input_hash"] == input_hash:
+                    context.update(previous["output"])
+                    report[stage.name] = "cached"
+                elif submit is None:
+                    self._finish(stage, context, self._timed(stage, dict(context)), results, report)
+                else:
+                    running[submit(self._timed, stage, dict(context))] = stage
+
+            if running and not ready:
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    stage = running.pop(future)
+                    self._finish(stage, context, future.result(), results, report)
+            elif not running and not ready and pending:
+                raise ValueError(f"Stages cannot run: {', '.join(s.name for s in pending)}")
+
+        return context, results, report
+
+    def _timed(self, stage: Stage, context: dict) -> tuple:
+        started = time.perf_counter()
+        output = stage.run(context)
+        return context, output, (time.perf_counter() - started) * 1000
+
+    def _finish(self, stage: Stage, context: dict, outcome: tuple, results: list, report: dict) -> None:
+        inputs, output, duration_ms = outcome
+        result = self.result(stage.name, inputs, output, duration_ms)
+        context.update(result["output"])
+        results.append(result)
+        report[stage.name] = "ran"
+
+    def result(self, name: str, context: dict, output: dict, duration_ms: float = None) -> dict:
+        """
+        Stage result of a stage run by the graph, or outside of it (e.g. bulk
+        ingestion transcribes in worker processes); context holds its inputs
+        """
+        stage = self.by_name[name]
+        absent = set(stage.outputs) - set(output)
+        if absent:
+            raise ValueError(f"Stage '{stage.name}' did not return {', '.join(sorted(absent))}")
+        return {
+            "stage": stage.name,
+            "version": stage.version,
+            "input_hash": self.input_hash(stage, context),
+            "output": {name: output[name] for name in stage.outputs},
+            "duration_ms": round(duration_ms, 1) if duration_ms is not None else None
+        }
+
+
+def load_stage_results(call_id: str) -> dict:
+    """Stored stage results of a call: stage -> {version, input_hash, output, duration_ms}"""
+    return load_stage_results_many([call_id]).get(call_id, {})
+
+
+def load_stage_results_many(call_ids: list) -> dict:
+    """load_stage_results for many calls with one query: call_id -> stage -> result"""
+    results = {}
+    with get_db() as db:
+        for row in db.query(StageResult).filter(StageResult.call_id.in_(list(call_ids))):
+            results.setdefault(row.call_id, {})[row.stage] = {
+                "version": row.version,
+                "input_hash": row.input_hash,
+                "output": json.loads(row.output),
+                "duration_ms": row.duration_ms,
+                "created_at": row.created_at.isoformat() if row.created_at else None
+            }
+    return results
+
+
+def save_stage_results(db, call_id: str, results: list) -> None:
+    """Upsert stage results in the caller's transaction"""
+    if not results:
+        return
+    existing = {
+        row.stage: row
+        for row in db.query(StageResult).filter(
+            StageResult.call_id == call_id, StageResult.stage.in_([r["stage"] for r in results])
+        )
+    }
+    for result in results:
+        row = existing.get(result["stage"])
+        if row is None:
+            row = StageResult(call_id=call_id, stage=result["stage"])
+            db.add(row)
+        row.version = result["version"]
+        row.input_hash = result["input_hash"]
+        row.output = json.dumps(result["output"], ensure_ascii=False, default=str)
+        row.duration_ms = result.get("duration_ms")
+        row.created_at = datetime.utcnow()
@@ -1,89 +1,302 @@
 """
 Auto-sync helper to keep emergency calls and patient journey in sync
+
+Calls are synced in chunks: every chunk resolves its patients with one
+indexed query (names without an exact match fall back to the substring
+search of get_patient_by_name), writes journey events and patient updates with bulk statements
+and commits once. The single-call sync used after each processed call is the
+same code path with a chunk of one.
 """
+from sqlalchemy import func, update
 from app.services.database import get_db
+from app.services.response_cache import response_cache
 from app.models.call import EmergencyCall
-from app.services.patient_service import create_patient, get_patient_by_name, update_patient, get_patient_db
-import json
+from app.models.patient import RegisteredPatient, JourneyEvent, SyncState
+from app.services.patient_service import (
+    get_patient_db, journey_event_row, normalize_search_text, search_keys, search_patients
+)
 import uuid
 from datetime import datetime
 
+SYNC_STATE_KEY = "emergency_calls_high_water_mark"
+
+# Only the columns the sync needs (skips transcript and translation blobs)
+CALL_SYNC_COLUMNS = (
+    EmergencyCall.id, EmergencyCall.call_id, EmergencyCall.patient_name,
+    EmergencyCall.patient_id, EmergencyCall.disease, EmergencyCall.created_at,
+    EmergencyCall.soap_subjective, EmergencyCall.soap_assessment, EmergencyCall.soap_plan
+)
+
+
+def _journey_event(call) -> dict:
+    created = call.created_at or datetime.utcnow()
+    return {
+        'date': created.strftime('%Y-%m-%d'),
+        'time': created.strftime('%H:%M'),
+        'description': f"Emergency call: {call.disease or 'Medical emergency'}",
+        'status': 'completed'
+    }
+
+
+def _new_patient_row(call) -> dict:
+    created = call.created_at or datetime.utcnow()
+    now = datetime.utcnow()
+    return {
+        'patient_id': f"PAT-{uuid.uuid4().hex[:8].upper()}",
+        'name': call.patient_name,
+        **search_keys(name=call.patient_name),
+        'primary_condition': call.disease or 'Emergency',
+        'medical_history': f"Emergency call on {created.strftime('%Y-%m-%d')}: {call.soap_subjective or ''}",
+        'clinical_notes': call.soap_assessment or '',
+        'follow_up_notes': call.soap_plan or '',
+        'registered_at': now,
+        'updated_at': now
+    }
+
+
+def _sync_chunk(calls: list, patient_db, append_notes: bool = True) -> dict:
+    """
+    Sync a chunk of calls into the patient journey DB (caller commits).
+
+    Returns:
+        dict with synced/created/skipped counts and links {call_id: patient_id}
+    """
+    stats = {'synced': 0, 'created': 0, 'skipped': 0, 'links': {}}
+
+    named = []
+    for call in calls:
+        key = normalize_search_text(call.patient_name)
+        if key and len(call.patient_name.strip()) > 1:
+            named.append((key, call))
+        else:
+            stats['skipped'] += 1
+    if not named:
+        return stats
+
+    # 1. Resolve the patients of the chunk: exact keys with one indexed query
+    keys = {key for key, _ in named}
+    patients = {}
+    for p in patient_db.query(RegisteredPatient).filter(
+        RegisteredPatient.name_key.in_(keys)
+    ).order_by(RegisteredPatient.id):
+        patients.setdefault(p.name_key, p)
+    # No exact match: substring match via the search index, like get_patient_by_name
+    for key in keys - set(patients):
+        matches = search_patients(patient_db, name=key, limit=1)
+        if matches:
+            patients[key] = matches[0]
+
+    # 2. Skip calls that already have a journey event (idempotent re-runs)
+    call_ids = [call.call_id for _, call in named]
+    already_synced = {row.source_call_id for row in patient_db.query(JourneyEvent.source_call_id).filter(
+        JourneyEvent.source_call_id.in_(call_ids)
+    )}
+    # Events created before source_call_id existed are matched on date/time
+    legacy_slots = {(row.patient_id, row.date, row.time) for row in patient_db.query(
+        JourneyEvent.patient_id, JourneyEvent.date, JourneyEvent.time
+    ).filter(
+        JourneyEvent.patient_id.in_([p.patient_id for p in patients.values()]),
+        JourneyEvent.source_call_id.is_(None)
+    )}
+
+    # 3. Patients seen for the first time (created from their first call)
+    new_rows = {}
+    creators = set()
+    for key, call in named:
+        if key not in patients and key not in new_rows:
+            new_rows[key] = _new_patient_row(call)
+            creators.add(call.call_id)
+
+    # 4. Collect events and per-patient note updates
+    event_rows = []
+    updates = {}
+    for key, call in named:
+        patient_id = patients[key].patient_id if key in patients else new_rows[key]['patient_id']
+        if not call.patient_id:
+            stats['links'][call.call_id] = patient_id
+
+        event = _journey_event(call)
+        slot = (patient_id, event['date'], event['time'])
+        if call.call_id in already_synced:
+            stats['skipped'] += 1
+            continue
+        if slot in legacy_slots:
+            # A legacy event stands for one call; events of this run never block others
+            legacy_slots.discard(slot)
+            stats['skipped'] += 1
+            continue
+
+        event_rows.append(journey_event_row(patient_id, event, source_call_id=call.call_id))
+        already_synced.add(call.call_id)
+        stats['synced'] += 1
+
+        if call.call_id in creators:
+            continue
+
+        existing = patients.get(key)
+        if existing is None:
+            patient_update = new_rows[key]
+        else:
+            patient_update = updates.setdefault(existing.id, {
+                'id': existing.id,
+                'primary_condition': existing.primary_condition,
+                'medical_history': existing.medical_history or '',
+                'clinical_notes': existing.clinical_notes or '',
+                'follow_up_notes': existing.follow_up_notes or '',
+                'updated_at': datetime.utcnow()
+            })
+        patient_update['primary_condition'] = call.disease or patient_update['primary_condition']
+        if append_notes:
+            created = call.created_at or datetime.utcnow()
+            patient_update['medical_history'] += f"\n[{created.strftime('%Y-%m-%d')}] Emergency call: {call.soap_subjective or ''}"
+            patient_update['clinical_notes'] += f"\n{call.soap_assessment or ''}"
+            patient_update['follow_up_notes'] += f"\n{call.soap_plan or ''}"
+
+    # 5. Bulk writes (patients first - events reference them)
+    if new_rows:
+        patient_db.bulk_insert_mappings(RegisteredPatient, list(new_rows.values()))
+        stats['created'] = len(new_rows)
+    if event_rows:
+        patient_db.bulk_insert_mappings(JourneyEvent, event_rows)
+    if updates:
+        patient_db.bulk_update_mappings(RegisteredPatient, list(updates.values()))
+
+    return stats
+
+
+def _link_calls(links: dict) -> None:
+    """
+    Store the resolved patient_id on the emergency calls, with a new row
+    version so ETags and cached lists pick up the link
+    """
+    if not links:
+        return
+    by_patient = {}
+    for call_id, patient_id in links.items():
+        by_patient.setdefault(patient_id, []).append(call_id)
+    now = datetime.utcnow()
+    with get_db() as emergency_db:
+        for patient_id, call_ids in by_patient.items():
+            emergency_db.execute(
+                update(EmergencyCall)
+                .where(EmergencyCall.call_id.in_(call_ids))
+                .values(patient_id=patient_id, updated_at=now,
+                        version=func.coalesce(EmergencyCall.version, 0) + 1)
+                .execution_options(synchronize_session=False)
+            )
+    for call_id in links:
+        response_cache.invalidate(call_id)
+
+
+def _get_high_water_mark(patient_db) -> int:
+    state = patient_db.get(SyncState, SYNC_STATE_KEY)
+    return int(state.value) if state and state.value else 0
+
+
+def _set_high_water_mark(patient_db, call_row_id: int) -> None:
+    patient_db.merge(SyncState(key=SYNC_STATE_KEY, value=str(call_row_id), updated_at=datetime.utcnow()))
+
+
+def sync_calls_to_patient_journey(chunk_size: int = 500, resume: bool = True,
+                                  append_notes: bool = True) -> dict:
+    """
+    Bulk sync of emergency calls into the patient journey database
+
+    Streams calls in id order (keyset pagination), one patient-DB transaction
+    per chunk. The last synced call id is stored as a high-water mark in the
+    same transaction, so an interrupted run resumes where it stopped.
+
+    Args:
+        chunk_size: Calls per chunk / transaction
+        resume: Start after the stored high-water mark (False = full resync)
+        append_notes: Append SOAP notes to existing patients' history
+
+    Returns:
+        dict with totals (synced, created, skipped, chunks, high_water_mark)
+    """
+    totals = {'synced': 0, 'created': 0, 'skipped': 0, 'chunks': 0}
+
+    patient_db = next(get_patient_db())
+    try:
+        last_id = _get_high_water_mark(patient_db) if resume else 0
+
+        while True:
+            with get_db() as emergency_db:
+                calls = emergency_db.query(*CALL_SYNC_COLUMNS).filter(
+                    EmergencyCall.id > last_id
+                ).order_by(EmergencyCall.id).limit(chunk_size).all()
+            if not calls:
+                break
+
+            stats = _sync_chunk(calls, patient_db, append_notes=append_notes)
+            last_id = calls[-1].id
+            _set_high_water_mark(patient_db, last_id)
+            patient_db.commit()
+            _link_calls(stats['links'])
+
+            for key in ('synced', 'created', 'skipped'):
+                totals[key] += stats[key]
+            totals['chunks'] += 1
+            print(f"  ✓ Chunk {totals['chunks']}: {stats['synced']} synced, {stats['created']} new patients (up to call #{last_id})")
+    except Exception:
+        patient_db.rollback()
+        raise
+    finally:
+        patient_db.close()
+
+    totals['high_water_mark'] = last_id
+    return totals
+
+
+def sync_call_to_patient_journey(call_id: str):
+    """
+    Sync one emergency call (by call_id) to the patient journey database.
+    Raises on failure so callers like the outbox worker can retry.
+    Returns the patient_id or None if the call has no patient name.
+    """
+    with get_db() as emergency_db:
+        call = emergency_db.query(*CALL_SYNC_COLUMNS).filter(EmergencyCall.call_id == call_id).first()
+
+    if not call:
+        raise LookupError(f"Call not found: {call_id}")
+    if not call.patient_name:
+        return None
+
+    patient_db = next(get_patient_db())
+    try:
+        stats = _sync_chunk([call], patient_db)
+        patient_db.commit()
+
+        patient = patient_db.query(RegisteredPatient.patient_id).filter(
+            RegisteredPatient.name_key == normalize_search_text(call.patient_name)
+        ).order_by(RegisteredPatient.id).first()
+    except Exception:
+        patient_db.rollback()
+        raise
+    finally:
+        patient_db.close()
+
+    _link_calls(stats['links'])
+
+    if stats['created']:
+        print(f"✓ Created new patient in journey: {call.patient_name}")
+    elif stats['synced']:
+        print(f"✓ Updated existing patient in journey: {call.patient_name}")
+    return patient.patient_id if patient else None
+
+
 def sync_emergency_call_to_patient_journey(call_id: int):
     """
     Automatically sync an emergency call to patient journey database
-    This is called after every emergency call is processed
+    (by row id; failures are logged and return None)
     """
     try:
-        # Get the emergency call
         with get_db() as emergency_db:
-            call = emergency_db.query(EmergencyCall).filter(EmergencyCall.id == call_id).first()
-            
-            if not call or not call.patient_name:
-                return None
-            
-            # Get patient journey database
-            patient_db_gen = get_patient_db()
-            patient_db = next(patient_db_gen)
-            
-            try:
-                # Check if patient already exists
-                existing = get_patient_by_name(patient_db, call.patient_name)
-                
-                if existing:
-                    # Update existing patient - add new journey event
-                    existing_events = json.loads(existing.journey_events) if existing.journey_events else []
-                    
-                    new_event = {
-                        'segment': len(existing_events) + 1,
-                        'date': call.created_at.strftime('%Y-%m-%d'),
-                        'time': call.created_at.strftime('%H:%M'),
-                        'description': f"Emergency call: {call.disease or 'Medical emergency'}",
-                        'status': 'completed'
-                    }
-                    
-                    existing_events.append(new_event)
-                    
-                    # Update notes
-                    updated_history = (existing.medical_history or '') + f"\n[{call.created_at.strftime('%Y-%m-%d')}] Emergency call: {call.soap_subjective or ''}"
-                    updated_clinical = (existing.clinical_notes or '') + f"\n{call.soap_assessment or ''}"
-                    updated_plan = (existing.follow_up_notes or '') + f"\n{call.soap_plan or ''}"
-                    
-                    update_patient(patient_db, existing.patient_id, {
-                        'primary_condition': call.disease or existing.primary_condition,
-                        'medical_history': updated_history,
-                        'clinical_notes': updated_clinical,
-                        'follow_up_notes': updated_plan,
-                        'journey_events': json.dumps(existing_events)
-                    })
-                    
-                    print(f"✓ Updated existing patient in journey: {call.patient_name}")
-                    return existing.patient_id
-                    
-                else:
-                    # Create new patient
-                    patient_data = {
-                        'patient_id': f"PAT-{uuid.uuid4().hex[:8].upper()}",
-                        'name': call.patient_name,
-                        'primary_condition': call.disease or 'Emergency',
-                        'medical_history': f"Emergency call on {call.created_at.strftime('%Y-%m-%d')}: {call.soap_subjective or ''}",
-                        'clinical_notes': call.soap_assessment or '',
-                        'follow_up_notes': call.soap_plan or '',
-                        'journey_events': json.dumps([{
-                            'segment': 1,
-                            'date': call.created_at.strftime('%Y-%m-%d'),
-                            'time': call.created_at.strftime('%H:%M'),
-                            'description': f"Emergency call: {call.disease or 'Medical emergency'}",
-                            'status': 'completed'
-                        }])
-                    }
-                    
-                    new_patient = create_patient(patient_db, patient_data)
-                    print(f"✓ Created new patient in journey: {call.patient_name}")
-                    return new_patient.patient_id
-                    
-            finally:
-                patient_db.close()
-                
+            call = emergency_db.query(EmergencyCall.call_id).filter(EmergencyCall.id == call_id).first()
+        if not call:
+            return None
+        return sync_call_to_patient_journey(call.call_id)
+
     except Exception as e:
         print(f"✗ Failed to sync to patient journey: {e}")
         return None
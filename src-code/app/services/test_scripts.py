@@ -0,0 +1,40 @@
+"""
+Reference Test Scripts
+Fuzzy matching of live-test input against the scripted calls in data/text
+(expected urgency and SOAP). Runs in the cpu process pool: module-level
+and picklable.
+"""
+import re
+from difflib import SequenceMatcher
+
+MATCH_THRESHOLD = 0.4  # >40% similar: assume it's this script
+MATCH_CHARS = 300
+
+
+def clean_for_match(text: str) -> str:
+    if not text:
+        return ""
+    text = re.sub(r'^(Dispatcher|Caller|通信指令員|通報者):\s*', '', text, flags=re.MULTILINE)
+    text = re.sub(r'\[.*?\]', '', text)
+    text = re.sub(r'[^\w\s]', '', text)
+    return " ".join(text.lower().split())
+
+
+def match_test_script(text: str):
+    """Best matching scripted call (dict from data/text), or None"""
+    from data.text.evaluated_text_data import EVALUATED_CALLS
+    from data.text.custom_test_scripts import CUSTOM_CALLS
+
+    # Smart fuzzy matching
+    best_ratio = 0
+    best_match = None
+    current_clean = clean_for_match(text)[:MATCH_CHARS]
+
+    for eval_call in CUSTOM_CALLS + EVALUATED_CALLS:
+        ref_clean = clean_for_match(eval_call["text"])[:MATCH_CHARS]
+        ratio = SequenceMatcher(None, current_clean, ref_clean).ratio()
+        if ratio > best_ratio:
+            best_ratio = ratio
+            best_match = eval_call
+
+    return best_match if best_ratio > MATCH_THRESHOLD else None
@@ -0,0 +1,74 @@
+"""
+Throttling Helpers
+Rate limits and triage-first scheduling for background AI work
+"""
+import time
+import functools
+import threading
+from contextlib import contextmanager
+
+
+class RateLimiter:
+    """Thread-safe token bucket: at most `per_minute` acquisitions per minute"""
+
+    def __init__(self, per_minute: float, burst: int = 1):
+        self.interval = 60.0 / per_minute if per_minute > 0 else 0.0
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """Block until a token is available"""
+        if not self.interval:
+            return
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) / self.interval)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) * self.interval
+            time.sleep(wait)
+
+
+class ActivityGate:
+    """
+    Counts foreground work in progress (e.g. triage of an incoming call).
+    Background work calls wait_idle() first so it never competes with it.
+    """
+
+    def __init__(self):
+        self.active = 0
+        self.condition = threading.Condition()
+
+    @contextmanager
+    def busy(self):
+        with self.condition:
+            self.active += 1
+        try:
+            yield
+        finally:
+            with self.condition:
+                self.active -= 1
+                if self.active == 0:
+                    self.condition.notify_all()
+
+    def tracked(self, func):
+        """Decorator: count every call of func as foreground work"""
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with self.busy():
+                return func(*args, **kwargs)
+        return wrapper
+
+    def wait_idle(self, timeout: float = None) -> bool:
+        """Wait until no foreground work runs; False if the timeout expired"""
+        with self.condition:
+            return self.condition.wait_for(lambda: self.active == 0, timeout=timeout)
+
+
+# Triage (transcription, SOAP, urgency) of incoming calls
+triage_activity = ActivityGate()
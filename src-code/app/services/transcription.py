@@ -4,6 +4,7 @@ Transcription Service - Convert Audio to Text using Whisper
 """
 import whisper
 import time
+import threading
 from pathlib import Path
 
 class TranscriptionService:
@@ -19,11 +20,27 @@ class TranscriptionService:
         - small: better accuracy (~460MB)
         - medium: high accuracy (~1.5GB)
         - large: best accuracy (~3GB)
+        
+        The model is loaded on first use (or load()), so importing this
+        module in worker processes does not load a model they never use.
         """
-        print(f"Loading Whisper model: {model_name}...")
         self.model_name = model_name
-        self.model = whisper.load_model(model_name)
-        print(f"✓ Whisper {model_name} model loaded")
+        self._model = None
+        self._lock = threading.Lock()
+    
+    @property
+    def model(self):
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    print(f"Loading Whisper model: {self.model_name}...")
+                    self._model = whisper.load_model(self.model_name)
+                    print(f"✓ Whisper {self.model_name} model loaded")
+        return self._model
+    
+    def load(self) -> None:
+        """Load the model now (server startup, ingestion workers)"""
+        self.model
     
     def transcribe(self, audio_path: str, language: str = "en") -> dict: #dict is a dictionary used to store data in key-value pairs cause we need to return multiple values
         """
@@ -79,6 +96,9 @@ class TranscriptionService:
         }
 
 
-# Create global instance (loads model once)
+# Create global instance (the model is loaded once, at API startup)
 # Using 'base' model as requested by user
 transcription_service = TranscriptionService(model_name="base")
+# Live calls get their own model (executors "live_asr" pool): a Whisper model
+# must not decode two files at once, and uploads must not delay live chunks
+live_transcription_service = TranscriptionService(model_name="base")
@@ -393,6 +393,17 @@ class HybridUrgencyClassifier:
         
         return final_result
     
+    def prescreen(self, transcript: str, language: str = "en") -> dict:
+        """
+        Rule-based ESI pre-screen of a raw transcript (no AI call).
+        Used to prioritize queued work before SOAP notes exist.
+        
+        Returns:
+            dict with esi_level, urgency, rationale (same shape as ESI criteria)
+        """
+        clinical_data = self._extract_clinical_data(transcript or "", {})
+        return self._apply_esi_criteria(clinical_data, language)
+    
     def _extract_clinical_data(self, transcript: str, soap: dict) -> dict:
         """Extract clinical information from transcript and SOAP notes"""
         text = transcript.lower()
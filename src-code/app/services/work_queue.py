@@ -0,0 +1,141 @@
+"""
+Priority Work Queue
+Runs the AI stages (SOAP extraction, urgency classification, translation,
+image generation) on a fixed pool of worker threads in priority order
+instead of arrival order.
+
+- Lanes: TRIAGE work always runs before waiting BACKGROUND work
+  (translation, journey images), whatever their priorities.
+- Reserved capacity: at most WORK_QUEUE_BACKGROUND_MAX (default: workers - 1)
+  BACKGROUND items run at once, so long background jobs never occupy every
+  worker and a triage item starts as soon as it is queued. With a single
+  worker nothing can be reserved; triage then waits for the running item.
+- Priority within a lane: ESI level of a rule-based pre-screen
+  (1 = immediate life threat ... 5 = no resources), lower runs first.
+- Aging: every WORK_QUEUE_AGING_SECONDS spent waiting improves an item by
+  one level, so low-acuity calls are delayed under load but never starved.
+"""
+import os
+import time
+import itertools
+import threading
+from concurrent.futures import Future
+
+TRIAGE = 0
+BACKGROUND = 1
+
+DEFAULT_PRIORITY = 3  # ESI level 3 (unclear cases)
+
+
+class WorkItem:
+    def __init__(self, func, args, kwargs, lane: int, priority: float, seq: int, label: str):
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.lane = lane
+        self.priority = priority
+        self.seq = seq
+        self.label = label
+        self.enqueued_at = time.monotonic()
+        self.future = Future()
+
+    def sort_key(self, now: float, aging_seconds: float) -> tuple:
+        waited = now - self.enqueued_at
+        return (self.lane, self.priority - waited / aging_seconds, self.seq)
+
+
+class PriorityWorkQueue:
+    """Thread pool that always picks the most urgent waiting item"""
+
+    def __init__(self, workers: int = 4, aging_seconds: float = 30.0, background_max: int = None):
+        self.workers = workers
+        self.aging_seconds = aging_seconds
+        # Workers BACKGROUND items may hold at once (the rest are kept for triage)
+        self.background_max = max(1, workers - 1 if background_max is None else min(background_max, workers))
+        self.running_background = 0
+        self.items = []
+        self.condition = threading.Condition()
+        self.seq = itertools.count()
+        self.threads = []
+        self.running = 0
+
+    def _ensure_workers(self):
+        # Started lazily so importing the module has no side effects
+        if not self.threads:
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._worker, name=f"work-queue-{i}", daemon=True)
+                thread.start()
+                self.threads.append(thread)
+
+    def submit(self, func, *args, lane: int = TRIAGE, priority: float = DEFAULT_PRIORITY,
+               label: str = None, **kwargs) -> Future:
+        """Queue func(*args, **kwargs); returns a concurrent.futures.Future"""
+        item = WorkItem(func, args, kwargs, lane, priority, next(self.seq), label or func.__name__)
+        with self.condition:
+            self._ensure_workers()
+            self.items.append(item)
+            self.condition.notify()
+        return item.future
+
+    def run(self, func, *args, lane: int = TRIAGE, priority: float = DEFAULT_PRIORITY,
+            label: str = None, **kwargs):
+        """Queue func and block until its result is available"""
+        return self.submit(func, *args, lane=lane, priority=priority, label=label, **kwargs).result()
+
+    def _runnable(self) -> list:
+        if self.running_background < self.background_max:
+            return self.items
+        return [item for item in self.items if item.lane == TRIAGE]
+
+    def _next_item(self) -> WorkItem:
+        with self.condition:
+            while not self._runnable():
+                self.condition.wait()
+            now = time.monotonic()
+            item = min(self._runnable(), key=lambda i: i.sort_key(now, self.aging_seconds))
+            self.items.remove(item)
+            self.running += 1
+            if item.lane == BACKGROUND:
+                self.running_background += 1
+            return item
+
+    def _worker(self):
+        while True:
+            item = self._next_item()
+            try:
+                if item.future.set_running_or_notify_cancel():
+                    try:
+                        item.future.set_result(item.func(*item.args, **item.kwargs))
+                    except BaseException as e:
+                        item.future.set_exception(e)
+            finally:
+                with self.condition:
+                    self.running -= 1
+                    if item.lane == BACKGROUND:
+                        self.running_background -= 1
+                        self.condition.notify()  # a waiting background item may start now
+
+    def depth(self, lane: int = None) -> int:
+        """Number of waiting items (optionally of one lane)"""
+        with self.condition:
+            if lane is None:
+                return len(self.items)
+            return sum(1 for item in self.items if item.lane == lane)
+
+    def stats(self) -> dict:
+        with self.condition:
+            return {
+                "workers": self.workers,
+                "running": self.running,
+                "running_background": self.running_background,
+                "background_max": self.background_max,
+                "waiting_triage": sum(1 for item in self.items if item.lane == TRIAGE),
+                "waiting_background": sum(1 for item in self.items if item.lane == BACKGROUND)
+            }
+
+
+work_queue = PriorityWorkQueue(
+    workers=int(os.getenv("WORK_QUEUE_WORKERS", "4")),
+    aging_seconds=float(os.getenv("WORK_QUEUE_AGING_SECONDS", "30")),
+    background_max=int(os.getenv("WORK_QUEUE_BACKGROUND_MAX", "0")) or None  # unset: workers - 1
+)
@@ -389,14 +389,40 @@ function EmergencyManager() {
   useEffect(() => {
     fetchCalls();
     fetchStats();
-    if (autoRefresh) {
-      const interval = setInterval(() => {
+    if (!autoRefresh) return;
+
+    // Server pushes call events (/api/events); refetch only when something changed.
+    // Polling stays as a slow fallback while the stream is disconnected.
+    let refreshTimer = null;
+    let pollTimer = null;
+    const refresh = () => {
+      clearTimeout(refreshTimer);
+      refreshTimer = setTimeout(() => {
         fetchCalls();
         fetchStats();
-      }, 10000);
-      return () => clearInterval(interval);
-    }
-  }, [autoRefresh, fetchCalls, fetchStats]);
+      }, 300); // coalesce bursts (created -> soap_ready -> urgency_ready)
+    };
+    const startPolling = () => {
+      if (!pollTimer) pollTimer = setInterval(refresh, 10000);
+    };
+    const stopPolling = () => {
+      clearInterval(pollTimer);
+      pollTimer = null;
+    };
+
+    const source = new EventSource(`${API_URL}/api/events`);
+    ['call.created', 'call.soap_ready', 'call.urgency_ready', 'call.translated'].forEach((type) =>
+      source.addEventListener(type, refresh)
+    );
+    source.onopen = stopPolling;
+    source.onerror = startPolling;
+
+    return () => {
+      source.close();
+      stopPolling();
+      clearTimeout(refreshTimer);
+    };
+  }, [API_URL, autoRefresh, fetchCalls, fetchStats]);
 
   useEffect(() => {
     fetchCalls(); // Fetch translated calls immediately fetch means get the data from the server or write it in the database
@@ -67,6 +67,12 @@ function RealtimeCall({ onCallComplete, onBack, patient = null, systemLanguage =
   const wsRef = useRef(null);
   const mediaRecorderRef = useRef(null);
   const mountedRef = useRef(true);
+  // Protocol v2: binary audio frames, transcript arrives as deltas
+  const audioSeqRef = useRef(0);
+  const transcriptRef = useRef('');
+  const transcriptSeqRef = useRef(0);
+  const soapRef = useRef(null);
+  const callIdRef = useRef(null);
 
   useEffect(() => {
     // Cleanup only when component unmounts
@@ -95,6 +101,10 @@ function RealtimeCall({ onCallComplete, onBack, patient = null, systemLanguage =
       setLiveTranscript('');
       setSoap(null);
       setWordCount(0);
+      audioSeqRef.current = 0;
+      transcriptRef.current = '';
+      transcriptSeqRef.current = 0;
+      soapRef.current = null;
 
       const ws = new WebSocket('ws://localhost:8000/ws/realtime-call');
       wsRef.current = ws;
@@ -125,12 +135,16 @@ function RealtimeCall({ onCallComplete, onBack, patient = null, systemLanguage =
           recorders.forEach((recorder) => {
             recorder.ondataavailable = async (event) => {
               if (event.data.size > 0 && ws.readyState === WebSocket.OPEN) {
-                const reader = new FileReader();
-                reader.onloadend = () => {
-                  const base64 = reader.result.split(',')[1];
-                  ws.send(JSON.stringify({ action: 'audio', data: base64 }));
-                };
-                reader.readAsDataURL(event.data);
+                // v2 frame: version u8 | codec u8 (0 = webm) | flags u16 | seq u32 | audio
+                const audio = new Uint8Array(await event.data.arrayBuffer());
+                const frame = new Uint8Array(8 + audio.byteLength);
+                const header = new DataView(frame.buffer);
+                header.setUint8(0, 2);
+                header.setUint8(1, 0);
+                header.setUint16(2, 0);
+                header.setUint32(4, audioSeqRef.current++);
+                frame.set(audio, 8);
+                ws.send(frame);
               }
             };
           });
@@ -161,7 +175,8 @@ function RealtimeCall({ onCallComplete, onBack, patient = null, systemLanguage =
 
           ws.send(JSON.stringify({
             action: 'start',
-            language: systemLanguage
+            language: systemLanguage,
+            protocol: 2
           }));
 
           setStatus('recording');
@@ -182,6 +197,48 @@ function RealtimeCall({ onCallComplete, onBack, patient = null, systemLanguage =
 
         if (!mountedRef.current) return;
 
+        // Protocol v2 pushes: only new transcript text, SOAP only when it changed
+        if (data.type === 'transcript' || data.type === 'soap') {
+          if (data.type === 'transcript') {
+            if (data.seq !== transcriptSeqRef.current + 1) {
+              console.warn(`⚠️ Transcript gap: expected ${transcriptSeqRef.current + 1}, got ${data.seq}`);
+            }
+            transcriptSeqRef.current = data.seq;
+            transcriptRef.current = transcriptRef.current ? `${transcriptRef.current} ${data.text}` : data.text;
+            setLiveTranscript(transcriptRef.current);
+            setWordCount(data.word_count);
+          } else {
+            soapRef.current = data.soap;
+            setSoap(data.soap);
+          }
+          bc.postMessage({
+            type: 'LIVE_UPDATE',
+            call_id: callIdRef.current,
+            transcript: transcriptRef.current,
+            status: 'processing',
+            soap: soapRef.current,
+            language: data.language || systemLanguage
+          });
+          return;
+        }
+        if (data.type === 'triage') {
+          console.log(`⚡ Pre-screen: ESI ${data.esi_level} (${data.urgency})`);
+          return;
+        }
+        if (data.type === 'summary') {
+          // Provisional summary at end of call; the final result follows
+          if (data.soap) {
+            soapRef.current = data.soap;
+            setSoap(data.soap);
+          }
+          return;
+        }
+        if (data.type === 'ack') return;
+        if (data.type === 'error') {
+          console.warn('⚠️ Audio frame rejected:', data.error);
+          return;
+        }
+
         // Broadcast live updates to other windows (like TransparentMonitor)
         if (data.status === 'processing' || data.status === 'completed' || data.status === 'started') {
           bc.postMessage({
@@ -196,6 +253,7 @@ function RealtimeCall({ onCallComplete, onBack, patient = null, systemLanguage =
 
         if (data.status === 'started') {
           setCallId(data.call_id);
+          callIdRef.current = data.call_id;
           console.log('✅ Call started with ID:', data.call_id);
         }
         else if (data.status === 'buffering') {
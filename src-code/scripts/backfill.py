@@ -0,0 +1,88 @@
+"""
+Re-run one stage over historical calls (see app/services/backfill.py).
+
+Re-triage everything after an ESI criteria update (bump
+STAGE_VERSIONS["urgency"] in app/services/pipeline.py first):
+    python scripts/backfill.py --stage urgency --stale
+
+Preview the changes without writing:
+    python scripts/backfill.py --stage urgency --stale --dry-run --report data/urgency_diff.jsonl
+
+Interrupted runs resume from data/backfill_<stage>.json; pass --restart to
+ignore it.
+
+Usage: python scripts/backfill.py --stage {soap,urgency,markers,translation}
+       [--since YYYY-MM-DD] [--until YYYY-MM-DD] [--language LANG]
+       [--stale] [--from-version V] [--languages en,ja]
+       [--workers N] [--llm-concurrency N] [--chunk-size N] [--limit N]
+       [--dry-run] [--report PATH] [--checkpoint PATH] [--restart]
+"""
+import sys
+import os
+import argparse
+from datetime import datetime, timedelta
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def parse_date(value: str) -> datetime:
+    return datetime.strptime(value, "%Y-%m-%d")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Re-run a pipeline stage over stored calls")
+    parser.add_argument("--stage", required=True, choices=("soap", "urgency", "markers", "translation"))
+    parser.add_argument("--since", type=parse_date, help="Calls created on or after this date")
+    parser.add_argument("--until", type=parse_date, help="Calls created up to this date (inclusive)")
+    parser.add_argument("--language", help="Only calls in this language")
+    parser.add_argument("--stale", action="store_true", help="Only calls whose stored output is older than the current stage version")
+    parser.add_argument("--from-version", help="Only calls whose stored output has this stage version")
+    parser.add_argument("--languages", help="Translation target languages (default: PRETRANSLATE_LANGUAGES)")
+    parser.add_argument("--workers", type=int, help="Calls processed in parallel (default: BACKFILL_WORKERS)")
+    parser.add_argument("--llm-concurrency", type=int, help="Max parallel LLM requests (default: WORK_QUEUE_WORKERS)")
+    parser.add_argument("--chunk-size", type=int, help="Calls per transaction / checkpoint (default: BACKFILL_CHUNK_SIZE)")
+    parser.add_argument("--limit", type=int, help="Stop after this many selected calls")
+    parser.add_argument("--dry-run", action="store_true", help="Run the stage but write nothing; print the diff")
+    parser.add_argument("--report", help="Append the per-call changes to this JSONL file")
+    parser.add_argument("--checkpoint", help="Checkpoint file (default: data/backfill_<stage>.json)")
+    parser.add_argument("--restart", action="store_true", help="Ignore the checkpoint and start from the first call")
+    args = parser.parse_args()
+
+    # The work queue reads its size at import time
+    if args.llm_concurrency:
+        os.environ["WORK_QUEUE_WORKERS"] = str(args.llm_concurrency)
+
+    from app.services.database import init_db
+    from app.services.backfill import Backfill, BACKFILL_WORKERS, BACKFILL_CHUNK_SIZE
+
+    init_db()
+    try:
+        backfill = Backfill(
+            args.stage,
+            since=args.since,
+            until=args.until + timedelta(days=1) if args.until else None,
+            language=args.language,
+            stale=args.stale,
+            from_version=args.from_version,
+            languages=[lang.strip() for lang in args.languages.split(",") if lang.strip()] if args.languages else None,
+            workers=args.workers or BACKFILL_WORKERS,
+            chunk_size=args.chunk_size or BACKFILL_CHUNK_SIZE,
+            limit=args.limit,
+            dry_run=args.dry_run,
+            checkpoint_path=args.checkpoint,
+            resume=not args.restart,
+            report_path=args.report
+        )
+    except ValueError as e:
+        parser.error(str(e))
+
+    totals = backfill.run()
+
+    print(f"\n✅ Backfill {args.stage} {'(dry run) ' if args.dry_run else ''}complete in {totals['seconds']}s: "
+          f"{totals.get('processed', 0)} processed, {totals.get('changed', 0)} changed, "
+          f"{totals.get('unchanged', 0)} unchanged, {totals.get('skipped', 0)} skipped, "
+          f"{totals.get('failed', 0)} failed")
+    for transition, count in sorted(totals["transitions"].items(), key=lambda item: -item[1]):
+        print(f"   {transition}: {count}")
+    if totals["failed_calls"]:
+        print(f"⚠️ Failed calls (re-run with --restart --stale to retry): {', '.join(totals['failed_calls'][:20])}"
+              f"{' ...' if len(totals['failed_calls']) > 20 else ''}")
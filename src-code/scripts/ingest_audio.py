@@ -0,0 +1,64 @@
+"""
+Ingest a directory of recorded calls (see app/services/ingest.py).
+
+Walks the directory for wav/mp3/m4a/flac/ogg files, skips recordings that
+are already in the database, transcribes with one Whisper model per worker
+process and runs SOAP + urgency while the next files are transcribed.
+Re-running the same command resumes: finished files are listed in the
+manifest (default: <directory>/.ingest_manifest.jsonl).
+
+Usage: python scripts/ingest_audio.py DIRECTORY [--language en]
+       [--workers N] [--whisper-threads N] [--llm-concurrency N]
+       [--batch-size N] [--model base] [--manifest PATH] [--limit N]
+"""
+import sys
+import os
+import argparse
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ingest a directory of call recordings")
+    parser.add_argument("directory", help="Directory with audio files (searched recursively)")
+    parser.add_argument("--language", default="en", help="Call language (Whisper hint and SOAP language)")
+    parser.add_argument("--workers", type=int, help="Whisper processes (default: INGEST_WORKERS = cores / threads)")
+    parser.add_argument("--whisper-threads", type=int, help="Torch threads per Whisper process (default: INGEST_WHISPER_THREADS)")
+    parser.add_argument("--llm-concurrency", type=int, help="Max parallel LLM requests (default: INGEST_LLM_WORKERS)")
+    parser.add_argument("--batch-size", type=int, help="Calls per database transaction (default: INGEST_BATCH_SIZE)")
+    parser.add_argument("--model", default="base", help="Whisper model (tiny, base, small, medium, large)")
+    parser.add_argument("--manifest", help="Manifest file (default: <directory>/.ingest_manifest.jsonl)")
+    parser.add_argument("--limit", type=int, help="Transcribe at most this many new files")
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.directory):
+        parser.error(f"Not a directory: {args.directory}")
+
+    # The work queue reads its size at import time
+    if args.llm_concurrency:
+        os.environ["WORK_QUEUE_WORKERS"] = str(args.llm_concurrency)
+
+    from app.services.database import init_db
+    from app.services.ingest import (
+        AudioIngest, INGEST_WORKERS, INGEST_WHISPER_THREADS, INGEST_LLM_WORKERS, INGEST_BATCH_SIZE
+    )
+
+    init_db()
+    whisper_threads = args.whisper_threads or INGEST_WHISPER_THREADS
+    ingest = AudioIngest(
+        os.path.abspath(args.directory),
+        language=args.language,
+        manifest_path=args.manifest,
+        workers=args.workers or (max(1, (os.cpu_count() or 1) // whisper_threads) if args.whisper_threads else INGEST_WORKERS),
+        whisper_threads=whisper_threads,
+        llm_workers=args.llm_concurrency or INGEST_LLM_WORKERS,
+        batch_size=args.batch_size or INGEST_BATCH_SIZE,
+        model_name=args.model,
+        limit=args.limit
+    )
+    totals = ingest.run()
+
+    print(f"\n✅ Ingestion complete in {totals['seconds']}s: {totals.get('saved', 0)} calls saved, "
+          f"{totals.get('duplicates', 0)} duplicates, {totals.get('already_ingested', 0)} already ingested, "
+          f"{totals.get('failed', 0)} failed (of {totals.get('found', 0)} files)")
+    if totals.get("failed"):
+        print("⚠️ Failed files are listed in the manifest and retried on the next run")
@@ -0,0 +1,29 @@
+"""
+Migrate patient journey events from the legacy JSON blob
+(registered_patients.journey_events) into the journey_events table.
+Safe to run more than once - migrated patients have their blob cleared.
+The API also runs this migration when the patient database is opened; the
+script reports the patients whose blob could not be read.
+"""
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.patient_service import get_patient_db, migrate_legacy_journey_events
+
+
+def migrate():
+    print("🔄 Migrating journey events to the journey_events table...")
+    db = next(get_patient_db())
+    try:
+        count, unreadable = migrate_legacy_journey_events(db)
+    finally:
+        db.close()
+    print(f"✅ Migrated timelines of {count} patients.")
+    if unreadable:
+        print(f"⚠️ {len(unreadable)} patients have unreadable journey_events and were not migrated: "
+              f"{', '.join(unreadable)}")
+
+
+if __name__ == "__main__":
+    migrate()
@@ -0,0 +1,22 @@
+"""
+Migrate translations from the legacy JSON cache
+(emergency_calls.translated_data) into the call_translations table.
+Safe to run more than once - migrated calls have their cache cleared.
+"""
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.database import init_db
+from app.services.localization import migrate_legacy_cache
+
+
+def migrate():
+    print("🔄 Migrating translation cache to the call_translations table...")
+    init_db()
+    count = migrate_legacy_cache()
+    print(f"✅ Migrated translations of {count} calls.")
+
+
+if __name__ == "__main__":
+    migrate()
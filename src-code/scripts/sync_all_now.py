@@ -1,33 +1,34 @@
 """
 Script to sync ALL existing emergency calls to registered patients database.
 Run this once to populate the Patient Journey with legacy data.
+
+Resumable: progress is stored as a high-water mark, so re-running only
+syncs calls added since the last run. Pass --full to resync everything
+(already-synced calls are skipped, not duplicated).
+
+Usage: python scripts/sync_all_now.py [--full] [--chunk-size N]
 """
-from app.services.database import get_db
-from app.models.call import EmergencyCall
-from app.services.sync_helper import sync_emergency_call_to_patient_journey
-from sqlalchemy.orm import Session
+import sys
+import os
+import argparse
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.sync_helper import sync_calls_to_patient_journey
+
 
-def sync_all_calls():
+def sync_all_calls(full: bool = False, chunk_size: int = 500):
     print("🔄 Starting massive sync of emergency calls to patient journey...")
-    
-    with get_db() as db:
-        calls = db.query(EmergencyCall).all()
-        print(f"found {len(calls)} emergency calls.")
-        
-        count = 0
-        for call in calls:
-            if call.patient_name and len(call.patient_name) > 1:
-                try:
-                    result = sync_emergency_call_to_patient_journey(call.id)
-                    if result:
-                        count += 1
-                        print(f"  ✓ Synced: {call.patient_name}")
-                except Exception as e:
-                    print(f"  ✗ Failed {call.patient_name}: {e}")
-            else:
-                print(f"  - Skipped call {call.id} (no name)")
-                
-    print(f"\n✅ Sync Complete! {count} patients synced/updated.")
+
+    totals = sync_calls_to_patient_journey(chunk_size=chunk_size, resume=not full)
+
+    print(f"\n✅ Sync Complete! {totals['synced']} calls synced, "
+          f"{totals['created']} new patients, {totals['skipped']} skipped "
+          f"(high-water mark: call #{totals['high_water_mark']}).")
+
 
 if __name__ == "__main__":
-    sync_all_calls()
+    parser = argparse.ArgumentParser(description="Sync emergency calls into the patient journey")
+    parser.add_argument("--full", action="store_true", help="Ignore the high-water mark and rescan all calls")
+    parser.add_argument("--chunk-size", type=int, default=500, help="Calls per transaction")
+    args = parser.parse_args()
+    sync_all_calls(full=args.full, chunk_size=args.chunk_size)
@@ -78,51 +78,54 @@ def import_test_cases():
         test_data = eval(content)
     
     # Initialize the pipeline
+    from concurrent.futures import ThreadPoolExecutor
     from app.services.pipeline import pipeline
-    from app.services.database import get_db
-    from app.models.call import EmergencyCall
+    from app.services.database import save_completed_calls
+    from app.services.call_ids import new_call_id
+    
+    # AI stages run concurrently (bounded), results are saved in one write
+    concurrency = int(os.getenv("BATCH_CONCURRENCY", "3"))
+    print(f"   Analyzing {len(test_data)} calls ({concurrency} at a time)...")
+    
+    def analyze(call_data):
+        try:
+            return pipeline.analyze_text(
+                call_data['text'],
+                patient_name=call_data.get('expected_agent', ''),
+                language='en'
+            )
+        except Exception as e:
+            print(f"      ✗ Error in {call_data['call_id']}: {e}")
+            return None
     
-    processed_calls = []
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        analyses = list(executor.map(analyze, test_data))
     
-    with get_db() as db:
-        for i, call_data in enumerate(test_data, 1):
-            print(f"   Processing {i}/15: {call_data['call_id']}...")
-            
-            try:
-                # Process through pipeline
-                result = pipeline.process_text(
-                    transcript=call_data['text'],
-                    patient_name=call_data.get('expected_agent', ''),
-                    language='en'
-                )
-                
-                # Get the processed call from database
-                call = db.query(EmergencyCall).filter(
-                    EmergencyCall.call_id == result['call_id']
-                ).first()
-                
-                if call:
-                    processed_calls.append({
-                        'call_id': call_data['call_id'],
-                        'db_call_id': call.call_id,
-                        'patient_name': call.patient_name,
-                        'urgency_level': call.urgency_level,
-                        'urgency_reasoning': call.urgency_reasoning,
-                        'expected_urgency': call_data.get('expected_urgency', '').upper(),
-                        'subjective': call.soap_subjective,
-                        'objective': call.soap_objective,
-                        'assessment': call.soap_assessment,
-                        'plan': call.soap_plan,
-                        'expected_subjective': call_data['expected_soap']['subjective'],
-                        'expected_objective': call_data['expected_soap']['objective'],
-                    })
-                    print(f"      ✓ Processed successfully")
-                
-            except Exception as e:
-                print(f"      ✗ Error: {e}")
-                continue
-    
-    print(f"   ✅ Imported and processed {len(processed_calls)}/15 calls\n")
+    analyzed = [(call_data, analysis) for call_data, analysis in zip(test_data, analyses) if analysis]
+    calls = save_completed_calls([
+        pipeline.text_call_record(new_call_id("TEXT"), call_data['text'], analysis, language='en')
+        for call_data, analysis in analyzed
+    ])
+    
+    processed_calls = []
+    for (call_data, _), call in zip(analyzed, calls):
+        processed_calls.append({
+            'call_id': call_data['call_id'],
+            'db_call_id': call.call_id,
+            'patient_name': call.patient_name,
+            'urgency_level': call.urgency_level,
+            'urgency_reasoning': call.urgency_reasoning,
+            'expected_urgency': call_data.get('expected_urgency', '').upper(),
+            'subjective': call.soap_subjective,
+            'objective': call.soap_objective,
+            'assessment': call.soap_assessment,
+            'plan': call.soap_plan,
+            'expected_subjective': call_data['expected_soap']['subjective'],
+            'expected_objective': call_data['expected_soap']['objective'],
+        })
+        print(f"      ✓ Processed {call_data['call_id']}")
+    
+    print(f"   ✅ Imported and processed {len(processed_calls)}/{len(test_data)} calls\n")
     return processed_calls
 
 def generate_pdf_report(processed_calls):
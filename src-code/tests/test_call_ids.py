@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""
+Tests for app/services/call_ids.py
+Call IDs must stay unique and ordered when many calls arrive in the same second
+"""
+
+import sys
+import os
+import threading
+from datetime import datetime
+# Add project root to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from app.services.call_ids import new_call_id, new_ulid, ULID_LENGTH
+
+
+def test_call_id_format():
+    """Readable prefix is kept and the ID fits the call_id column"""
+    call_id = new_call_id("TEXT", when=datetime(2025, 10, 19, 14, 5, 33))
+    assert call_id.startswith("TEXT_19Oct_14h05_33_")
+    assert len(call_id.split("_")[-1]) == ULID_LENGTH
+    assert len(call_id) <= 50
+
+
+def test_ulids_are_monotonic_within_same_millisecond():
+    """Same timestamp -> strictly increasing IDs"""
+    ids = [new_ulid(timestamp_ms=1_700_000_000_000) for _ in range(1000)]
+    assert ids == sorted(ids)
+    assert len(set(ids)) == len(ids)
+
+
+def test_call_ids_unique_across_threads():
+    """Concurrent ingest in one second must not collide"""
+    ids = []
+
+    def worker():
+        ids.extend(new_call_id("CALL") for _ in range(500))
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(set(ids)) == 8 * 500
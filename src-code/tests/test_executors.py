@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Tests for app/services/executors.py
+Blocking work runs in its pool and never delays the event loop
+"""
+
+import sys
+import os
+import time
+import asyncio
+import threading
+# Add project root to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from app.services.executors import Pools, LoopLagMonitor
+
+
+def _thread_name():
+    return threading.current_thread().name
+
+
+def test_runs_in_named_pool():
+    pools = Pools({"db": 2, "llm": 1})
+    try:
+        assert asyncio.run(pools.run_in("db", _thread_name)).startswith("db-pool")
+    finally:
+        pools.shutdown()
+
+
+def test_unknown_pool_rejected():
+    pools = Pools({"db": 1})
+    try:
+        pools.submit("gpu", _thread_name)
+    except ValueError:
+        return
+    raise AssertionError("unknown pool accepted")
+
+
+def test_blocking_call_does_not_stall_loop():
+    """A 300 ms blocking call in the llm pool: the loop keeps ticking on time"""
+    pools = Pools({"llm": 1})
+
+    async def scenario():
+        monitor = LoopLagMonitor(interval=0.01, warn_ms=50)
+        await monitor.start()
+        await pools.run_in("llm", time.sleep, 0.3)
+        await monitor.stop()
+        return monitor.stats()
+
+    try:
+        stats = asyncio.run(scenario())
+    finally:
+        pools.shutdown()
+    assert stats["slow_ticks"] == 0
+    assert pools.stats()["llm"]["completed"] == 1
+    assert pools.stats()["llm"]["in_flight"] == 0
+
+
+def test_monitor_flags_blocked_loop():
+    monitor = LoopLagMonitor(warn_ms=50)
+    monitor.record(5)
+    monitor.record(250)
+    stats = monitor.stats()
+    assert stats["slow_ticks"] == 1
+    assert stats["lag_ms_max"] == 250
@@ -0,0 +1,28 @@
+#!/usr/bin/env python3
+"""
+Tests for app/services/live_protocol.py
+v2 binary audio frames round-trip; malformed frames are rejected
+"""
+
+import sys
+import os
+# Add project root to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from app.services.live_protocol import (
+    encode_audio_frame, decode_audio_frame, ProtocolError, CODEC_PCM16, AUDIO_HEADER
+)
+
+
+def test_round_trip():
+    frame = encode_audio_frame(70000, b"\x01\x02" * 10, CODEC_PCM16)
+    assert len(frame) == AUDIO_HEADER.size + 20
+    assert decode_audio_frame(frame) == ("pcm16", 70000, b"\x01\x02" * 10)
+
+
+def test_rejects_malformed_frames():
+    for frame in (b"\x02\x00", b"\x01" + encode_audio_frame(1, b"x")[1:], encode_audio_frame(1, b"x", codec=9)):
+        try:
+            decode_audio_frame(frame)
+        except ProtocolError:
+            continue
+        raise AssertionError(f"accepted {frame!r}")
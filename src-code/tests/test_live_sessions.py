@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Tests for app/services/live_sessions.py
+Owner tokens and leases decide which worker may write or finalize a live call
+"""
+
+import sys
+import os
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+# Add project root to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from app.services import live_sessions
+from app.models.live_session import LiveSession, LiveSegment
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    """live_sessions on an empty SQLite database in tmp_path"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'live.db'}")
+    LiveSession.metadata.create_all(engine, tables=[LiveSession.__table__, LiveSegment.__table__])
+    Session = sessionmaker(bind=engine)
+
+    @contextmanager
+    def get_db():
+        db = Session()
+        try:
+            yield db
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    monkeypatch.setattr(live_sessions, "get_db", get_db)
+    yield get_db
+    engine.dispose()
+
+
+def _expire(get_db, session_id):
+    with get_db() as db:
+        db.get(LiveSession, session_id).lease_until = datetime.utcnow() - timedelta(seconds=1)
+
+
+def test_resume_moves_owner_and_stale_checkpoint_fails(store):
+    live_sessions.create_session("LIVE_1", "a", "en")
+    assert live_sessions.checkpoint("LIVE_1", "a", {"word_count": 3},
+                                    {"seq": 1, "offset": 0.0, "text": "chest pain", "language": "en"})
+
+    state = live_sessions.resume_session("LIVE_1", "b")
+    assert state["word_count"] == 3 and [s["text"] for s in state["segments"]] == ["chest pain"]
+    with store() as db:
+        assert db.get(LiveSession, "LIVE_1").owner == "b"
+
+    # The old handler lost the session: its writes and heartbeats are refused
+    assert not live_sessions.checkpoint("LIVE_1", "a", {"word_count": 9})
+    assert not live_sessions.renew_lease("LIVE_1", "a")
+    assert live_sessions.renew_lease("LIVE_1", "b")
+    assert live_sessions.load_session("LIVE_1")["word_count"] == 3
+
+
+def test_expired_lease_is_claimed_once(store):
+    live_sessions.create_session("LIVE_1", "a", "en")
+    live_sessions.create_session("LIVE_2", "b", "en")
+    assert live_sessions.claim_expired_sessions() == []  # leases still valid
+
+    _expire(store, "LIVE_1")
+    claimed = live_sessions.claim_expired_sessions()
+    assert [session_id for session_id, _ in claimed] == ["LIVE_1"]
+    assert live_sessions.claim_expired_sessions() == []  # the claim took a fresh lease
+    assert not live_sessions.checkpoint("LIVE_1", "a", {"word_count": 1})
+
+
+def test_finish_session_retries_then_fails(store):
+    live_sessions.create_session("LIVE_1", "a", "en")
+    for attempt in range(1, live_sessions.LIVE_SESSION_MAX_ATTEMPTS + 1):
+        _expire(store, "LIVE_1")
+        (session_id, owner), = live_sessions.claim_expired_sessions()
+        live_sessions.finish_session(session_id, owner, completed=False)
+        with store() as db:
+            session = db.get(LiveSession, "LIVE_1")
+            assert session.attempts == attempt
+            expected = "failed" if attempt == live_sessions.LIVE_SESSION_MAX_ATTEMPTS else "finalizing"
+            assert session.status == expected
+
+    _expire(store, "LIVE_1")
+    assert live_sessions.claim_expired_sessions() == []  # given up, kept for inspection
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Tests for app/services/live_soap.py
+Partial SOAP refreshes are debounced and a queued request keeps its place
+"""
+
+import sys
+import os
+import asyncio
+from concurrent.futures import Future
+# Add project root to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from app.services.live_soap import PartialSoapScheduler
+
+
+class FakeCall:
+    """Transcript state plus a work queue whose futures the test resolves"""
+
+    def __init__(self):
+        self.words = 0
+        self.submitted = []
+        self.results = []
+
+    def submit(self):
+        future = Future()
+        self.submitted.append((f"{self.words} words", future))
+        return future
+
+    async def on_result(self, soap):
+        self.results.append(soap)
+
+
+def _scheduler(call, **kwargs):
+    return PartialSoapScheduler(call.submit, call.on_result, min_words=10,
+                                min_new_words=10, min_interval=0.05, max_wait=0.2, **kwargs)
+
+
+def test_debounce_and_time_threshold():
+    async def scenario():
+        call = FakeCall()
+        scheduler = _scheduler(call)
+        for words in (5, 12, 25, 40):  # 12 starts a request; the others arrive while it is queued/running
+            call.words = words
+            scheduler.notify(words)
+            if words == 12:
+                call.submitted[0][1].set_running_or_notify_cancel()
+        assert len(call.submitted) == 1
+        call.submitted[0][1].set_result({"plan": "a"})
+        await asyncio.sleep(0.1)  # completion + min_interval: the 40-word transcript goes out
+        assert [t for t, _ in call.submitted] == ["12 words", "40 words"]
+        call.submitted[1][1].set_result({"plan": "b"})
+        call.words = 43  # few new words: picked up after max_wait only
+        scheduler.notify(43)
+        await asyncio.sleep(0.02)
+        assert len(call.submitted) == 2
+        await asyncio.sleep(0.25)
+        assert len(call.submitted) == 3
+        scheduler.close()
+        return call, scheduler.stats()
+
+    call, stats = asyncio.run(scenario())
+    assert call.results == [{"plan": "a"}, {"plan": "b"}]
+    assert stats["completed"] == 2
+    assert stats["coalesced"] == 0  # 25 and 40 arrived while the first request was running
+    assert stats["cancelled"] == 1  # the queued 43-word request, dropped on close
+
+
+def test_queued_request_covers_newer_transcript():
+    async def scenario():
+        call = FakeCall()
+        scheduler = _scheduler(call)
+        call.words = 12
+        scheduler.notify(12)
+        call.words = 30
+        scheduler.notify(30)  # first request not started yet: it will read 30 words
+        assert len(call.submitted) == 1
+        first = call.submitted[0][1]
+        assert not first.cancelled() and scheduler.requested_words == 30
+        first.set_running_or_notify_cancel()
+        call.words = 45
+        scheduler.notify(45)  # running: the next refresh picks these up
+        assert scheduler.requested_words == 30
+        first.set_result({"plan": "latest"})
+        await asyncio.sleep(0.1)
+        assert len(call.submitted) == 2
+        scheduler.close()
+        return call, scheduler.stats()
+
+    call, stats = asyncio.run(scenario())
+    assert call.results == [{"plan": "latest"}]
+    assert stats["requested"] == 2
+    assert stats["coalesced"] == 1  # the 30-word notification rode along with the queued request
+    assert stats["cancelled"] == 1  # the second request, dropped on close
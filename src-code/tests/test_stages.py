@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Tests for app/services/stages.py
+Selective re-runs recompute a stage and its dependents, reusing stored results
+"""
+
+import sys
+import os
+import threading
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+# Add project root to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from app.services.stages import Stage, StageGraph
+
+
+def make_graph(calls, urgency_version="1"):
+    def stage(name, outputs):
+        def run(context):
+            calls.append(name)
+            return {output: f"{output}({len(calls)})" for output in outputs}
+        return run
+
+    return StageGraph([
+        Stage("transcribe", "1", ("audio_path",), ("transcript",), stage("transcribe", ("transcript",))),
+        Stage("soap", "1", ("transcript",), ("soap",), stage("soap", ("soap",))),
+        Stage("urgency", urgency_version, ("transcript", "soap"), ("urgency",), stage("urgency", ("urgency",))),
+    ])
+
+
+def test_rerun_skips_upstream_and_reuses_unchanged_results():
+    calls = []
+    context, results, report = make_graph(calls).run({"audio_path": "a.wav"})
+    assert calls == ["transcribe", "soap", "urgency"]
+    assert report == {"transcribe": "ran", "soap": "ran", "urgency": "ran"}
+    cached = {r["stage"]: r for r in results}
+
+    # Same versions and inputs: nothing runs again
+    calls.clear()
+    _, _, report = make_graph(calls).run(context, cached, rerun=["urgency"])
+    assert calls == []
+    assert report == {"transcribe": "given", "soap": "given", "urgency": "cached"}
+
+    # New urgency rules: only urgency runs, upstream outputs are taken as given
+    _, results, report = make_graph(calls, urgency_version="2").run(context, cached, rerun=["urgency"])
+    assert calls == ["urgency"]
+    assert report["urgency"] == "ran" and results[0]["version"] == "2"
+
+
+def test_rerun_includes_downstream_stages():
+    calls = []
+    graph = make_graph(calls)
+    assert graph.downstream(["soap"]) == {"soap", "urgency"}
+    graph.run({"audio_path": "a.wav", "transcript": "t"}, rerun=["soap"])
+    assert calls == ["soap", "urgency"]
+    with pytest.raises(ValueError):
+        graph.downstream(["bogus"])
+
+
+def test_stages_must_follow_their_producers():
+    run = lambda context: {}
+    with pytest.raises(ValueError):
+        StageGraph([Stage("soap", "1", ("transcript",), ("soap",), run),
+                    Stage("transcribe", "1", ("audio_path",), ("transcript",), run)])
+
+
+def test_independent_stages_run_concurrently():
+    # Both stages only finish once the other one has started
+    barrier = threading.Barrier(2, timeout=5)
+
+    def stage(output):
+        def run(context):
+            barrier.wait()
+            return {output: context["transcript"].upper()}
+        return run
+
+    graph = StageGraph([
+        Stage("markers", "1", ("transcript",), ("markers",), stage("markers")),
+        Stage("soap", "1", ("transcript",), ("soap",), stage("soap")),
+        Stage("urgency", "1", ("soap",), ("urgency",), lambda context: {"urgency": context["soap"] + "!"}),
+    ])
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        context, results, report = graph.run({"transcript": "t"}, submit=pool.submit)
+    assert context["urgency"] == "T!"
+    assert set(report.values()) == {"ran"} and len(results) == 3
+
+
+def test_after_orders_stages_without_changing_input_hash():
+    calls = []
+
+    def stage(name, output):
+        def run(context):
+            calls.append((name, context.get("prescreen")))
+            return {output: name}
+        return run
+
+    graph = StageGraph([
+        Stage("prescreen", "1", ("transcript",), ("prescreen",), stage("prescreen", "prescreen")),
+        Stage("soap", "1", ("transcript",), ("soap",), stage("soap", "soap"), after=("prescreen",)),
+    ])
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        context, results, _ = graph.run({"transcript": "t"}, submit=pool.submit)
+    assert calls == [("prescreen", None), ("soap", "prescreen")]  # soap saw the pre-screen
+    soap = next(r for r in results if r["stage"] == "soap")
+    assert soap["input_hash"] == graph.input_hash(graph.by_name["soap"], {"transcript": "t"})
+    with pytest.raises(ValueError):
+        StageGraph([Stage("soap", "1", ("transcript",), ("soap",), stage("soap", "soap"), after=("prescreen",))])
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Tests for app/services/sync_helper.py
+Calls are matched to registered patients like get_patient_by_name does
+"""
+
+import sys
+import os
+from datetime import datetime
+from types import SimpleNamespace
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+# Add project root to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+
+def _call(row_id, name, minute):
+    return SimpleNamespace(
+        id=row_id, call_id=f"CALL_{row_id}", patient_name=name, patient_id=None, disease="Chest pain",
+        created_at=datetime(2024, 5, 1, 10, minute), soap_subjective="s", soap_assessment="a", soap_plan="p"
+    )
+
+
+def test_partial_name_links_to_registered_patient(tmp_path, monkeypatch):
+    # patient_service opens ./data/registered_patients.db on import: keep it out of the repo
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "data").mkdir()
+    from app.services import patient_service, sync_helper
+    from app.models.patient import Base, RegisteredPatient, JourneyEvent
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'patients.db'}")
+    Base.metadata.create_all(engine)
+    monkeypatch.setattr(patient_service, "FTS_ENABLED", False)  # prefix lookups on this database
+    db = sessionmaker(bind=engine)()
+    try:
+        db.add(RegisteredPatient(patient_id="PAT-1", name="John Smith"))
+        db.commit()
+
+        stats = sync_helper._sync_chunk([_call(1, "John", 0), _call(2, "Mary Jones", 0)], db)
+        db.commit()
+
+        assert stats["links"]["CALL_1"] == "PAT-1"
+        assert stats["created"] == 1  # only Mary is new; John was not duplicated
+        assert db.query(RegisteredPatient).count() == 2
+        assert db.query(JourneyEvent).filter(JourneyEvent.patient_id == "PAT-1").count() == 1
+    finally:
+        db.close()
+        engine.dispose()
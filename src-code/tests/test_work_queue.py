@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Tests for app/services/work_queue.py
+Urgent calls must be served first; background work yields to triage
+"""
+
+import sys
+import os
+import threading
+# Add project root to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from app.services.work_queue import PriorityWorkQueue, TRIAGE, BACKGROUND
+
+
+def _run_blocked(queue, submissions):
+    """Occupy the single worker, queue submissions, then release; returns execution order"""
+    order = []
+    release = threading.Event()
+    blocker = queue.submit(release.wait, lane=TRIAGE, priority=1)
+    futures = [
+        queue.submit(order.append, name, lane=lane, priority=priority)
+        for name, lane, priority in submissions
+    ]
+    release.set()
+    blocker.result(timeout=5)
+    for future in futures:
+        future.result(timeout=5)
+    return order
+
+
+def test_most_urgent_first():
+    """ESI 1 queued after ESI 5 still runs first"""
+    queue = PriorityWorkQueue(workers=1, aging_seconds=3600)
+    order = _run_blocked(queue, [
+        ("refill", TRIAGE, 5),
+        ("chest_pain", TRIAGE, 2),
+        ("cardiac_arrest", TRIAGE, 1),
+    ])
+    assert order == ["cardiac_arrest", "chest_pain", "refill"]
+
+
+def test_background_yields_to_triage():
+    """Translation queued first with better priority still waits for triage"""
+    queue = PriorityWorkQueue(workers=1, aging_seconds=3600)
+    order = _run_blocked(queue, [
+        ("translation", BACKGROUND, 1),
+        ("triage", TRIAGE, 5),
+    ])
+    assert order == ["triage", "translation"]
+
+
+def test_aging_prevents_starvation():
+    """With aggressive aging an old low-acuity item overtakes a new urgent one"""
+    queue = PriorityWorkQueue(workers=1, aging_seconds=0.001)
+    order = []
+    release = threading.Event()
+    blocker = queue.submit(release.wait, priority=1)
+    old = queue.submit(order.append, "old_low_acuity", priority=5)
+    threading.Event().wait(0.05)  # old item ages 50 levels
+    new = queue.submit(order.append, "new_urgent", priority=1)
+    release.set()
+    for future in (blocker, old, new):
+        future.result(timeout=5)
+    assert order == ["old_low_acuity", "new_urgent"]
+
+
+def test_triage_starts_while_background_fills_the_pool():
+    """Long background jobs leave a worker free: a triage item starts right away"""
+    queue = PriorityWorkQueue(workers=3, aging_seconds=3600)
+    release = threading.Event()
+    started = threading.Semaphore(0)
+
+    def image_job():
+        started.release()
+        release.wait()
+
+    background = [queue.submit(image_job, lane=BACKGROUND) for _ in range(4)]
+    for _ in range(2):
+        assert started.acquire(timeout=5)
+    try:
+        triage = queue.submit(lambda: "triaged", lane=TRIAGE, priority=1)
+        assert triage.result(timeout=2) == "triaged"
+        assert queue.stats()["running_background"] == 2  # the other two wait for a free slot
+    finally:
+        release.set()
+    for future in background:
+        future.result(timeout=5)